@@ -1,47 +1,85 @@
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from datetime import datetime, date
-from app.db.database import get_db
-from app.db import crud
-from app.schemas.analytics import DailySummary
+from datetime import date, datetime, timedelta, timezone
+from typing import Optional
+from app.db.database import get_async_read_db, get_read_db
+from app.db import async_crud
+from app.schemas.analytics import DailySummary, RangeUsage
+from app.services import summary_service
+from app.services.range_service import GRANULARITIES, get_range_usage
+from app.utils.http_cache import cached_json_response
 
 router = APIRouter()
 
 @router.get("/daily-summary", response_model=DailySummary)
-def get_daily_summary(
-    day: date = Query(default=date.today(), description="Date to retrieve summary for"),
-    db: Session = Depends(get_db)
+async def get_daily_summary(
+    request: Request,
+    day: Optional[date] = Query(default=None, description="Date to retrieve summary for (defaults to today)"),
+    db: AsyncSession = Depends(get_async_read_db)
 ):
-    # Convert date to datetime
-    dt = datetime.combine(day, datetime.min.time())
-    
-    device_stats = crud.get_daily_usage(db, dt)
+    day = day or date.today()
+    device_stats = await summary_service.get_day_usage_async(db, day)
     total_energy = sum(d["total_energy"] for d in device_stats)
     
-    # Calculate power trend (percentage)
-    power_trend = crud.get_power_trend(db)
+    # Power trend (percentage) describes the last few minutes, so it only applies to today
+    power_trend = await async_crud.get_power_trend(db) if day == date.today() else 0.0
     
-    return {
+    return cached_json_response(request, {
         "date": day.isoformat(),
         "total_energy": round(total_energy, 6),
         "power_trend": power_trend,
         "device_breakdown": device_stats
-    }
+    }, max_age=summary_service.max_age_for(day))
 
 @router.get("/highest-consumer")
-def get_highest_consumer(
-    day: date = Query(default=date.today(), description="Date to check"),
-    db: Session = Depends(get_db)
+async def get_highest_consumer(
+    request: Request,
+    day: Optional[date] = Query(default=None, description="Date to check (defaults to today)"),
+    db: AsyncSession = Depends(get_async_read_db)
 ):
-    dt = datetime.combine(day, datetime.min.time())
-    device_stats = crud.get_daily_usage(db, dt)
+    day = day or date.today()
+    device_stats = await summary_service.get_day_usage_async(db, day)
     
     if not device_stats:
         return {"message": "No data for this date"}
         
     highest = max(device_stats, key=lambda x: x["total_energy"])
     
-    return {
+    return cached_json_response(request, {
         "date": day.isoformat(),
         "highest_consumer": highest
-    }
+    }, max_age=summary_service.max_age_for(day))
+
+@router.get("/range", response_model=RangeUsage)
+def get_usage_range(
+    request: Request,
+    start: datetime = Query(..., description="Range start (aligned down to the granularity)"),
+    end: Optional[datetime] = Query(default=None, description="Range end (default: now)"),
+    granularity: str = Query(default="day", description="hour, day or week"),
+    device: Optional[str] = Query(default=None, description="Only this device"),
+    limit: int = Query(default=1000, ge=1, le=10000, description="Maximum buckets per page"),
+    cursor: Optional[str] = Query(default=None, description="next_cursor of the previous page"),
+    db: Session = Depends(get_read_db)
+):
+    """Per-device energy, average voltage/current, peak power and cost per hour, day or week of a range."""
+    if granularity not in GRANULARITIES:
+        raise HTTPException(status_code=422, detail=f"granularity must be one of {', '.join(GRANULARITIES)}")
+
+    # Readings are stored as naive UTC; accept offset-aware query values too
+    start, end = (
+        dt.astimezone(timezone.utc).replace(tzinfo=None) if dt and dt.tzinfo else dt
+        for dt in (start, end)
+    )
+    now = datetime.utcnow()
+    end = end or now
+    if start >= end:
+        raise HTTPException(status_code=422, detail="start must be before end")
+    try:
+        usage = get_range_usage(db, start, end, granularity, device=device, limit=limit, cursor=cursor)
+    except ValueError:
+        raise HTTPException(status_code=422, detail="Invalid cursor")
+
+    # Ranges that ended a while ago only change if late data arrives
+    closed = end <= now - timedelta(minutes=5)
+    return cached_json_response(request, usage, max_age=3600 if closed else 5)
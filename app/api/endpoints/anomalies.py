@@ -1,41 +1,62 @@
-from fastapi import APIRouter, Depends, HTTPException
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from typing import List
-from app.db.database import get_db
-from app.db import crud
+from typing import Dict, List, Literal, Optional
+from app.db.database import get_async_db, get_write_db
+from app.db import async_crud, crud
 from app.schemas.device import Device, DeviceCreate
-from app.schemas.anomaly import AnomalyResponse
+from app.schemas.anomaly import AnomalyEvent, AnomalyResponse, DeviceBaseline
+from app.services.anomaly_service import detector
+from app.services.dashboard_service import dashboard_snapshots
 
 router = APIRouter()
 
 @router.get("/devices", response_model=List[Device])
-def read_all_devices(db: Session = Depends(get_db)):
+async def read_all_devices(db: AsyncSession = Depends(get_async_db)):
     """Get all registered devices and their thresholds."""
-    return crud.get_all_devices(db)
+    return await async_crud.get_all_devices(db)
 
 @router.post("/devices/{device_id}/threshold", response_model=Device)
 
-def set_device_threshold(device_id: str, device_in: DeviceCreate, db: Session = Depends(get_db)):
+def set_device_threshold(device_id: str, device_in: DeviceCreate, db: Session = Depends(get_write_db)):
     """Set or update the threshold for a specific device."""
-    return crud.create_or_update_device(db, device_id=device_id, threshold=device_in.threshold)
+    device = crud.create_or_update_device(db, device_id=device_id, threshold=device_in.threshold)
+    dashboard_snapshots.notify()
+    return device
 
 @router.get("/devices/{device_id}/threshold", response_model=Device)
-def read_device_threshold(device_id: str, db: Session = Depends(get_db)):
+async def read_device_threshold(device_id: str, db: AsyncSession = Depends(get_async_db)):
     """Get the current threshold for a specific device."""
-    db_device = crud.get_device(db, device_id=device_id)
+    db_device = await async_crud.get_device(db, device_id=device_id)
     if not db_device:
         return {"id": device_id, "threshold": 2500.0}
     return db_device
 
+@router.get("/events", response_model=List[AnomalyEvent])
+async def read_anomaly_events(
+    device: Optional[str] = None,
+    kind: Optional[Literal["spike", "step"]] = None,
+    since: Optional[datetime] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Spikes and step changes flagged by the streaming detector at ingest, newest first."""
+    return await async_crud.get_anomaly_events(db, device=device, kind=kind, since=since, limit=limit)
+
+@router.get("/baselines", response_model=Dict[str, DeviceBaseline])
+def read_anomaly_baselines():
+    """The detector's current per-device baselines (in this process)."""
+    return detector.baselines()
 
 @router.get("/{device_id}", response_model=AnomalyResponse)
-def get_device_anomalies(device_id: str, limit: int = 100, db: Session = Depends(get_db)):
+async def get_device_anomalies(device_id: str, limit: int = 100, db: AsyncSession = Depends(get_async_db)):
     """Get recent readings that exceed the device's threshold."""
-    db_device = crud.get_device(db, device_id=device_id)
+    db_device = await async_crud.get_device(db, device_id=device_id)
     if not db_device:
         raise HTTPException(status_code=404, detail="Device not found or no threshold set")
     
-    anomalies = crud.get_anomalies(db, device_id=device_id, limit=limit)
+    anomalies = await async_crud.get_anomalies(db, device_id=device_id, limit=limit)
     return {
         "device_id": device_id,
         "threshold": db_device.threshold,
@@ -0,0 +1,37 @@
+import time
+from fastapi import APIRouter, Depends, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.db.database import get_db
+from app.schemas.dashboard import DashboardSnapshot
+from app.services.dashboard_service import dashboard_snapshots
+from app.utils.http_cache import cached_json_response, etag_matches
+
+router = APIRouter()
+
+def _current_snapshot(db: Session):
+    try:
+        return dashboard_snapshots.get(db)
+    finally:
+        # Give the connection back to the pool while a long-poll waits
+        db.close()
+
+@router.get("/snapshot", response_model=DashboardSnapshot)
+async def get_dashboard_snapshot(
+    request: Request,
+    wait: float = Query(default=0, ge=0, le=settings.DASHBOARD_MAX_WAIT,
+                        description="With If-None-Match: seconds to wait for a change before answering 304"),
+    db: Session = Depends(get_db)
+):
+    """
+    Latest readings, devices, relay states, today's summary and active anomalies in one
+    response. Send the previous ETag as If-None-Match to get 304 when nothing changed;
+    add `wait` to hold the request open until something does (long-polling).
+    """
+    snapshot, etag = await run_in_threadpool(_current_snapshot, db)
+    deadline = time.monotonic() + wait
+    while etag_matches(request, etag) and (remaining := deadline - time.monotonic()) > 0:
+        await dashboard_snapshots.wait(min(remaining, dashboard_snapshots.refresh_seconds))
+        snapshot, etag = await run_in_threadpool(_current_snapshot, db)
+    return cached_json_response(request, snapshot, max_age=0, etag=etag)
@@ -1,5 +1,7 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
+from app.services.dashboard_service import dashboard_snapshots
+from app.services.relay_service import RELAYS, read_relay_states, remember_relay_state
 from app.utils.firebase_init import db_ref
 
 router = APIRouter()
@@ -18,13 +20,7 @@ def get_device_states():
         # We'll fetch the entire root for now or specific keys if preferred.
         # Let's fetch one by one to ensure we get exactly what we need if root is messy.
         
-        relays = ["relay1", "relay2", "relay3", "relay4"]
-        states = {}
-        for r in relays:
-            val = db_ref.reference(r).get()
-            states[r] = val if val is not None else False # Default to false if not set
-            
-        return states
+        return read_relay_states()
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -34,10 +30,12 @@ def update_device_state(relay_id: str, device_state: DeviceState):
         if not db_ref:
             raise HTTPException(status_code=500, detail="Firebase not initialized")
         
-        if relay_id not in ["relay1", "relay2", "relay3", "relay4"]:
+        if relay_id not in RELAYS:
             raise HTTPException(status_code=400, detail="Invalid relay ID")
             
         db_ref.reference(relay_id).set(device_state.state)
+        remember_relay_state(relay_id, device_state.state)
+        dashboard_snapshots.notify()
         return {"relay_id": relay_id, "state": device_state.state}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
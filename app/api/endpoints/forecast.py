@@ -1,20 +1,36 @@
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
-from app.db.database import get_db
-from app.services.forecast_service import generate_forecast
-from app.schemas.forecast import ForecastResponse
+from app.db import crud
+from app.db.database import get_read_db
+from app.services.forecast_service import HOUSE, NO_FORECAST, get_stored_forecast
+from app.schemas.forecast import DeviceForecastResponse, ForecastResponse
 
 router = APIRouter()
 
 @router.post("/", response_model=ForecastResponse)
 def get_energy_forecast(
     days: int = Query(default=7, ge=1, le=30),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
-    forecast_data = generate_forecast(db, days)
-    
-    if isinstance(forecast_data, dict) and "message" in forecast_data:
-        # Handle error case (not enough data)
-        return {"forecast": [], "outlook": "Not enough data for outlook.", "tip": "Keep the system running!"}
+    """Forecast for all devices together, as last computed by the forecast job."""
+    forecast_data = get_stored_forecast(db, HOUSE, days)
+    if forecast_data is None:
+        # The first forecast run hasn't finished
+        return NO_FORECAST
 
     return forecast_data
+
+@router.get("/{device_id}", response_model=DeviceForecastResponse)
+def get_device_forecast(
+    device_id: str,
+    days: int = Query(default=7, ge=1, le=30),
+    db: Session = Depends(get_read_db)
+):
+    """Forecast for one device, as last computed by the forecast job."""
+    forecast_data = get_stored_forecast(db, device_id, days)
+    if forecast_data is None:
+        if crud.get_device(db, device_id) is None:
+            raise HTTPException(status_code=404, detail="Device not found")
+        return {"device": device_id, **NO_FORECAST}
+
+    return {"device": device_id, **forecast_data}
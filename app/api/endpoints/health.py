@@ -1,7 +1,22 @@
 from fastapi import APIRouter
+from app.db.database import replica_monitor
+from app.services.ingest_service import ingest_pipeline
+from app.services.leader_service import leader_elector
 
 router = APIRouter()
 
 @router.get("/")
 def health_check():
-    return {"status": "ok"}
+    """
+    Liveness, plus this worker's role (only the leader runs MQTT ingest and background
+    jobs) and, when a read replica is configured, whether reads currently use it.
+    """
+    health = {"status": "ok", **leader_elector.status()}
+    if replica_monitor:
+        health["replica"] = replica_monitor.status()
+    return health
+
+@router.get("/ingest")
+def ingest_health():
+    """Queue depths, counters and per-stage latency of the MQTT ingest pipeline."""
+    return ingest_pipeline.stats()
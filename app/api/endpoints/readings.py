@@ -1,23 +1,110 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from typing import List
-from app.db.database import get_db
-from app.db import crud
-from app.schemas.reading import Reading
+from typing import List, Optional
+from datetime import datetime, timedelta, timezone
+from app.db.database import get_async_db, get_db, get_write_db
+from app.db import async_crud, crud
+from app.config import settings
+from app.schemas.reading import Reading, BatchIngestResult
+from app.schemas.series import SeriesResponse
+from app.services.ingest_service import ingest_batch
+from app.services.series_service import get_device_series, AGGREGATIONS
+from app.utils.batch_decoder import BatchDecodeError, decode_batch
+from app.utils.fast_json import readings_response
+from app.utils.http_cache import cached_json_response
+from app.utils.ttl_cache import TTLCache
 
 router = APIRouter()
 
+# Ranges ending this long ago are treated as closed: late readings are not expected anymore
+CLOSED_RANGE_GRACE = timedelta(minutes=5)
+
+LAYOUTS = ("rows", "columns")
+
+# Closed-range series are reused across clients; the TTL bounds how long a late reading stays invisible
+closed_series_cache = TTLCache(maxsize=512, ttl=600)
+
 @router.get("/latest", response_model=List[Reading])
-def read_latest_readings(db: Session = Depends(get_db)):
-    return crud.get_latest_readings(db)
+async def read_latest_readings(db: AsyncSession = Depends(get_async_db)):
+    return await async_crud.get_latest_readings(db)
 
 @router.get("/device/{device_id}", response_model=List[Reading])
-def read_device_readings(device_id: str, skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    readings = crud.get_readings_by_device(db, device=device_id, limit=limit)
+async def read_device_readings(
+    device_id: str,
+    skip: int = 0,
+    limit: int = 100,
+    layout: str = Query(default="rows", description="rows (list of readings) or columns (one array per field)"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    if layout not in LAYOUTS:
+        raise HTTPException(status_code=422, detail=f"layout must be one of {', '.join(LAYOUTS)}")
+    readings = await async_crud.get_reading_rows(db, device=device_id, skip=skip, limit=limit)
     if not readings:
         raise HTTPException(status_code=404, detail="Device not found or no readings")
-    return readings
+    return readings_response(readings, layout)
+
+@router.get("/device/{device_id}/series", response_model=SeriesResponse)
+def read_device_series(
+    request: Request,
+    device_id: str,
+    start: Optional[datetime] = Query(default=None, description="Range start (default: one hour before end)"),
+    end: Optional[datetime] = Query(default=None, description="Range end (default: now)"),
+    points: int = Query(default=500, ge=2, le=5000, description="Target number of points"),
+    agg: str = Query(default="avg", description="avg, minmax or lttb"),
+    db: Session = Depends(get_db)
+):
+    """Downsampled power/current/voltage series for charts, bucketed server-side."""
+    if agg not in AGGREGATIONS:
+        raise HTTPException(status_code=422, detail=f"agg must be one of {', '.join(AGGREGATIONS)}")
+
+    # Readings are stored as naive UTC; accept offset-aware query values too
+    start, end = (
+        dt.astimezone(timezone.utc).replace(tzinfo=None) if dt and dt.tzinfo else dt
+        for dt in (start, end)
+    )
+    now = datetime.utcnow()
+    end = end or now
+    start = start or end - timedelta(hours=1)
+    if start >= end:
+        raise HTTPException(status_code=422, detail="start must be before end")
+
+    # A closed range can't change anymore, so it is cached here and by browsers and proxies
+    closed = end <= now - CLOSED_RANGE_GRACE
+    key = (device_id, start, end, points, agg)
+    series = closed_series_cache.get(key) if closed else None
+    if series is None:
+        series = get_device_series(db, device_id, start, end, points=points, agg=agg)
+        if closed:
+            closed_series_cache.set(key, series)
+    return cached_json_response(request, series, max_age=86400 if closed else 5)
 
 @router.get("/all", response_model=List[Reading])
-def read_all_readings(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    return crud.get_readings(db, skip=skip, limit=limit)
+async def read_all_readings(
+    skip: int = 0,
+    limit: int = 100,
+    layout: str = Query(default="rows", description="rows (list of readings) or columns (one array per field)"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    if layout not in LAYOUTS:
+        raise HTTPException(status_code=422, detail=f"layout must be one of {', '.join(LAYOUTS)}")
+    return readings_response(await async_crud.get_reading_rows(db, skip=skip, limit=limit), layout)
+
+@router.post("/batch", response_model=BatchIngestResult)
+async def ingest_readings_batch(request: Request, db: Session = Depends(get_write_db)):
+    """
+    Bulk ingest for gateways and backfills. The body is a JSON array of readings, NDJSON
+    (`application/x-ndjson`), a columnar object (`{"device": "...", "timestamp": [...],
+    "current": [...], "voltage": [...]}`) or any of these as MessagePack
+    (`application/msgpack`). Valid rows are stored in one transaction; the response
+    gives every row's status so clients only resend what was rejected.
+    """
+    body = await request.body()
+    try:
+        columns = decode_batch(body, request.headers.get("content-type"))
+    except BatchDecodeError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if len(columns["device"]) > settings.BATCH_MAX_ROWS:
+        raise HTTPException(status_code=413, detail=f"Batches are limited to {settings.BATCH_MAX_ROWS} readings")
+    return await run_in_threadpool(ingest_batch, db, columns)
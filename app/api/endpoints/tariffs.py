@@ -0,0 +1,32 @@
+from datetime import timezone
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+from typing import List
+from app.db import crud
+from app.db.database import get_read_db, get_write_db
+from app.schemas.tariff import Tariff, TariffCreate
+from app.services import tariff_service
+
+router = APIRouter()
+
+@router.get("/", response_model=List[Tariff])
+def read_tariffs(db: Session = Depends(get_read_db)):
+    """Every configured tariff, oldest first."""
+    return crud.get_tariffs(db)
+
+@router.get("/active", response_model=Tariff)
+def read_active_tariff(db: Session = Depends(get_read_db)):
+    """The tariff in force now (the flat ENERGY_RATE_GHC_PER_KWH until one is configured)."""
+    return tariff_service.get_active_tariff(db)
+
+@router.post("/", response_model=Tariff)
+def create_tariff(tariff_in: TariffCreate, db: Session = Depends(get_write_db)):
+    """Add a flat, tiered or time-of-use tariff. Costs from the start of its first month are repriced."""
+    effective_from = tariff_in.effective_from
+    if effective_from and effective_from.tzinfo:
+        # Readings are stored as naive UTC
+        effective_from = effective_from.astimezone(timezone.utc).replace(tzinfo=None)
+    try:
+        return tariff_service.create_tariff(db, tariff_in.name, tariff_in.kind, tariff_in.rates, effective_from)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
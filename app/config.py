@@ -3,11 +3,74 @@ from pydantic_settings import BaseSettings
 class Settings(BaseSettings):
     PROJECT_NAME: str = "Smart Energy Meter Backend"
     DATABASE_URL: str = "sqlite:///./energy_meter.db"
+    DATABASE_READ_URL: str = ""  # Optional read replica for analytics, forecast and chatbot queries
+    REPLICA_MAX_LAG_SECONDS: float = 30.0  # Further behind than this, reads go to the primary
+    REPLICA_CHECK_SECONDS: float = 10.0
     MQTT_BROKER: str = "broker.hivemq.com"  # Public broker for testing, or localhost
     MQTT_PORT: int = 1883
     MQTT_TOPIC: str = "sensor/energy"
+    MQTT_SHARED_GROUP: str = ""  # Set to consume through `$share/<group>/<topic>`: every worker ingests a share of the messages
+    INGEST_WORKERS: int = 4  # Worker threads doing parsing, persistence and protection
+    INGEST_QUEUE_SIZE: int = 10000  # Per-queue bound; messages beyond it are dropped and counted
+    BATCH_MAX_ROWS: int = 50000  # Largest body POST /readings/batch accepts
+    RELAY_CACHE_TTL: float = 5.0  # Seconds relay states read from Firebase are reused
+    DASHBOARD_REFRESH_SECONDS: float = 2.0  # Oldest a dashboard snapshot gets (changes made in this process show up immediately)
+    DASHBOARD_MAX_WAIT: float = 60.0  # Longest a long-poll on /dashboard/snapshot may wait
+    # Streaming anomaly detection at ingest (per-device EWMA baselines of power)
+    ANOMALY_ALPHA: float = 0.02  # Weight of each reading in the baseline mean and variance
+    ANOMALY_FAST_ALPHA: float = 0.3  # Weight in the fast-moving level used to spot step changes
+    ANOMALY_Z_THRESHOLD: float = 4.0  # Standard deviations from the baseline that make a reading a spike
+    ANOMALY_STEP_SIGMAS: float = 3.0  # Standard deviations the level must move to count as a step change
+    ANOMALY_WARMUP: int = 30  # Readings per device before anything is flagged
+    ANOMALY_MIN_DELTA: float = 25.0  # Watts; smaller deviations are never flagged
+    SPOOL_DIR: str = "spool"  # Readings the database can't take right now are kept here (one subdirectory per process)
+    SPOOL_SEGMENT_MB: int = 16
+    SPOOL_MAX_MB: int = 1024  # Disk budget per process; readings beyond it are lost and counted
+    SPOOL_FSYNC: bool = False  # fsync every append (survives power loss, not just process crashes)
+    SPOOL_REPLAY_BATCH: int = 1000
+    SPOOL_RETRY_SECONDS: float = 5.0
+    ARCHIVE_DIR: str = "archive"  # Columnar per-device, per-month files for readings moved out of the database
+    ARCHIVE_AFTER_DAYS: int = 0  # Readings older than this many days move to ARCHIVE_DIR nightly (0 disables the archiver)
+    # Archived readings are only visible to hosts that can read ARCHIVE_DIR. The archiver runs on a
+    # SQLite file database (one host), or elsewhere only once ARCHIVE_DIR is storage shared by every host
+    ARCHIVE_SHARED: bool = False
+    # SQLite connection tuning (ignored for Postgres)
+    SQLITE_JOURNAL_MODE: str = "WAL"  # WAL lets the API read while ingest writes
+    SQLITE_SYNCHRONOUS: str = "NORMAL"  # Safe with WAL; only the last commits can be lost on power failure
+    SQLITE_MMAP_MB: int = 256
+    SQLITE_CACHE_MB: int = 64
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000  # How long a writer waits for another process's lock
+    SQLITE_SINGLE_WRITER: bool = True  # Writers in this process queue for one dedicated connection
+    # Postgres connection pool (ignored for SQLite)
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT: float = 30.0
+    DB_POOL_RECYCLE: int = 1800  # Seconds; replaces connections before proxies and load balancers drop them
+    DB_POOL_PRE_PING: bool = True
+    DB_STATEMENT_TIMEOUT_MS: int = 30000  # Server-side limit per statement (0 disables)
+    SLOW_QUERY_MS: float = 0  # Log queries slower than this many milliseconds (0 disables)
+    LOG_LEVEL: str = "INFO"
+    LOG_LEVELS: str = ""  # Per-module overrides, e.g. "app.services.ingest_service=DEBUG,app.services.chat_service=WARNING"
+    LOG_FORMAT: str = "text"  # "text" or "json"
+    LOG_SAMPLE_EVERY: int = 1000  # Per-message log lines are emitted once every N messages...
+    LOG_SAMPLE_SECONDS: float = 60.0  # ...or at least this often
+    TODAY_SUMMARY_TTL: float = 30.0  # Seconds today's (still changing) daily summary is cached for
+    ENERGY_RATE_GHC_PER_KWH: float = 2.20  # Flat electricity price until a tariff is configured (POST /tariffs/)
+    COST_REFRESH_SECONDS: float = 60.0  # How often the pricing job costs hours with new readings
+    LEADER_LOCK_FILE: str = ""  # SQLite deployments: lock file for leader election (default: next to the database)
+    LEADER_CHECK_SECONDS: float = 5.0  # How often followers try to take over and the leader checks its lock
+    FORECAST_REFRESH_MINUTES: float = 60.0  # How often the forecast job refits devices with new data
+    FORECAST_WORKERS: int = 0  # Processes fitting forecasts in parallel (0: one per CPU core)
+    FORECAST_HORIZON_DAYS: int = 30  # How far ahead stored forecasts go (the most /forecast/ serves)
     GROQ_API_KEY: str = ""
+    CHAT_MAX_TOOL_ROUNDS: int = 3  # Rounds of chatbot tool calls per question before it must answer
+    CHAT_MAX_USAGE_DAYS: int = 366  # Longest range the chatbot's usage and anomaly tools look at
+    CHAT_CACHE_SIZE: int = 512  # Chatbot answers kept for repeated questions (0 disables the cache)
+    CHAT_CACHE_TTL: float = 300.0  # Seconds a cached answer is reused while the data hasn't changed
     START_SIMULATOR: bool = True
+    # Firebase bridge (the simulator): readings are published when Firebase values change, and on a heartbeat
+    FIREBASE_HEARTBEAT_SECONDS: float = 10.0  # Publish at least this often while nothing changes
+    FIREBASE_MIN_PUBLISH_SECONDS: float = 10.0  # ...and at most this often. Energy totals count each reading as 10 s
     FIREBASE_SERVICE_ACCOUNT: str = "app/utils/smart-energy-meter-4a732-firebase-adminsdk-fbsvc-dbd5bd6660.json"
     FIREBASE_SERVICE_ACCOUNT_JSON: str = "" # Full JSON string for production
     FIREBASE_DATABASE_URL: str = "https://smart-energy-meter-4a732-default-rtdb.firebaseio.com/"
@@ -0,0 +1,66 @@
+import logging
+from datetime import date, datetime
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db import crud
+from app.db.models import Reading, Device, DailySummary
+
+logger = logging.getLogger(__name__)
+
+# Async versions of the crud reads behind the busiest endpoints. They run the same
+# statements as their counterparts in crud.
+
+async def get_reading_rows(db: AsyncSession, device: str = None, skip: int = 0, limit: int = 100):
+    return [tuple(row) for row in (await db.execute(crud.reading_rows_stmt(device, skip, limit))).all()]
+
+async def get_latest_readings(db: AsyncSession):
+    """See crud.get_latest_readings."""
+    try:
+        registered = (await db.execute(select(Device).where(Device.last_seen.isnot(None)))).scalars().all()
+
+        if not registered:
+            return (await db.execute(select(Reading).order_by(Reading.timestamp.desc()).limit(10))).scalars().all()
+
+        latest = {}
+        for reading in (await db.execute(crud.latest_readings_stmt())).scalars():
+            latest[reading.device] = reading
+
+        for device in registered:
+            if device.id not in latest:
+                reading = (await db.execute(
+                    select(Reading).where(Reading.device == device.id).order_by(Reading.timestamp.desc()).limit(1)
+                )).scalars().first()
+                if reading:
+                    latest[device.id] = reading
+        return list(latest.values())
+    except Exception as e:
+        logger.warning("⚠️ Error in get_latest_readings: %s", e)
+        return []
+
+async def get_daily_usage(db: AsyncSession, date_val: datetime | date):
+    return crud.usage_stats((await db.execute(crud.daily_usage_stmt(crud.start_of(date_val)))).all())
+
+async def get_daily_summary_record(db: AsyncSession, day: date):
+    return (await db.execute(select(DailySummary).where(DailySummary.day == day))).scalars().first()
+
+async def get_device(db: AsyncSession, device_id: str):
+    return (await db.execute(select(Device).where(Device.id == device_id))).scalars().first()
+
+async def get_all_devices(db: AsyncSession):
+    devices = (await db.execute(select(Device).order_by(Device.id))).scalars().all()
+    return devices or crud.placeholder_devices()
+
+async def get_anomalies(db: AsyncSession, device_id: str, limit: int = 100):
+    device = await get_device(db, device_id)
+    if not device or device.threshold <= 0:
+        return []
+    return (await db.execute(crud.anomalies_stmt(device_id, device.threshold, limit))).scalars().all()
+
+async def get_anomaly_events(db: AsyncSession, device: str = None, kind: str = None, since: datetime = None, limit: int = 100):
+    return (await db.execute(crud.anomaly_events_stmt(device, kind, since, limit))).scalars().all()
+
+async def get_power_trend(db: AsyncSession, window_minutes: int = 5):
+    previous_window_start, window_start, now = crud.power_trend_windows(window_minutes)
+    current_avg = (await db.execute(crud.average_power_stmt(window_start, now))).scalar()
+    previous_avg = (await db.execute(crud.average_power_stmt(previous_window_start, window_start))).scalar()
+    return crud.power_trend(current_avg, previous_avg)
@@ -1,32 +1,156 @@
+import logging
 from sqlalchemy.orm import Session
-from sqlalchemy import func, desc
-from app.db.models import Reading, Device
+from sqlalchemy import func, desc, cast, DateTime, Integer, literal, select, insert, update
+from sqlalchemy.dialects import postgresql, sqlite
+from app.db.models import Reading, Device, ReadingRollup, HourlyRollup, DailySummary, AnomalyEvent, Forecast, Tariff, HourlyCost, Backfill
 from datetime import datetime, timedelta, date
 
+logger = logging.getLogger(__name__)
+
+# Power threshold (W) given to devices that register themselves by sending readings
+DEFAULT_THRESHOLD = 2500.0
+
 def get_readings(db: Session, skip: int = 0, limit: int = 100):
     return db.query(Reading).offset(skip).limit(limit).all()
 
+def insert_readings(db: Session, rows: list):
+    """
+    Inserts {"device", "timestamp", "current", "voltage"} rows, skipping any whose
+    (device, timestamp) is already stored. Returns the (id, device, timestamp, current,
+    voltage) tuples actually inserted. The caller commits.
+    """
+    if not rows:
+        return []
+    table = Reading.__table__
+    stmt = dialect_insert(db, table).on_conflict_do_nothing(
+        index_elements=[table.c.device, table.c.timestamp]
+    ).returning(table.c.id, table.c.device, table.c.timestamp, table.c.current, table.c.voltage)
+    return [tuple(row) for row in db.execute(stmt, rows).all()]
+
+def get_reading_rows(db: Session, device: str = None, skip: int = 0, limit: int = 100):
+    """
+    (id, device, timestamp, current, voltage) tuples without building ORM objects.
+    Per device newest first (like get_readings_by_device), otherwise in table order (like get_readings).
+    """
+    return [tuple(row) for row in db.execute(reading_rows_stmt(device, skip, limit)).all()]
+
+# Statements shared by the sync functions here and their async counterparts in async_crud
+
+def reading_rows_stmt(device: str = None, skip: int = 0, limit: int = 100):
+    stmt = select(Reading.id, Reading.device, Reading.timestamp, Reading.current, Reading.voltage)
+    if device is not None:
+        stmt = stmt.where(Reading.device == device).order_by(Reading.timestamp.desc())
+    return stmt.offset(skip).limit(limit)
+
+def latest_readings_stmt():
+    """Each registered device's reading at its last_seen."""
+    # Driven from devices, so each reading is one (device, timestamp) index lookup;
+    # ordering by Reading.id would make SQLite scan the whole readings table instead
+    return select(Reading).select_from(Device).join(
+        Reading, (Reading.device == Device.id) & (Reading.timestamp == Device.last_seen)
+    ).order_by(Device.id)
+
+def daily_usage_stmt(start_of_day: datetime):
+    return select(
+        Reading.device,
+        func.sum(Reading.voltage * Reading.current),
+        func.avg(Reading.voltage),
+        func.avg(Reading.current),
+    ).where(
+        Reading.timestamp >= start_of_day,
+        Reading.timestamp < start_of_day + timedelta(days=1)
+    ).group_by(Reading.device).order_by(Reading.device)
+
+def usage_totals_stmt(start: datetime, end: datetime):
+    """Per-device (device, samples, power sum, voltage sum, current sum) in [start, end), for merging with archived readings."""
+    return select(
+        Reading.device,
+        func.count(),
+        func.sum(Reading.voltage * Reading.current),
+        func.sum(Reading.voltage),
+        func.sum(Reading.current),
+    ).where(Reading.timestamp >= start, Reading.timestamp < end).group_by(Reading.device).order_by(Reading.device)
+
+def anomalies_stmt(device_id: str, threshold: float, limit: int = 100):
+    return select(Reading).where(
+        Reading.device == device_id,
+        (Reading.current * Reading.voltage) > threshold
+    ).order_by(Reading.timestamp.desc()).limit(limit)
+
+def anomaly_events_stmt(device: str = None, kind: str = None, since: datetime = None, limit: int = 100):
+    stmt = select(AnomalyEvent)
+    if device is not None:
+        stmt = stmt.where(AnomalyEvent.device == device)
+    if kind is not None:
+        stmt = stmt.where(AnomalyEvent.kind == kind)
+    if since is not None:
+        stmt = stmt.where(AnomalyEvent.timestamp >= since)
+    return stmt.order_by(AnomalyEvent.timestamp.desc(), AnomalyEvent.id.desc()).limit(limit)
+
+def average_power_stmt(start: datetime, end: datetime):
+    return select(func.avg(Reading.voltage * Reading.current)).where(Reading.timestamp >= start, Reading.timestamp < end)
+
+def power_trend_windows(window_minutes: int = 5):
+    """(previous window start, current window start, now) for get_power_trend."""
+    now = datetime.now()
+    return now - timedelta(minutes=window_minutes * 2), now - timedelta(minutes=window_minutes), now
+
+def power_trend(current_avg, previous_avg) -> float:
+    if not previous_avg:
+        return 0.0 # No trend possible without historical data
+    return round(((current_avg or 0.0) - previous_avg) / previous_avg * 100, 1)
+
+def start_of(date_val: datetime | date) -> datetime:
+    if isinstance(date_val, datetime):
+        return date_val.replace(hour=0, minute=0, second=0, microsecond=0)
+    return datetime.combine(date_val, datetime.min.time())
+
+def usage_stats(rows):
+    """Per-device usage dicts from daily_usage_stmt rows."""
+    results = []
+    for device, total_power, avg_voltage, avg_current in rows:
+        # Energy in kWh: Total Power (W) * 10s / 3,600,000
+        energy_kwh = (total_power * 10) / 3600000
+        
+        results.append({
+            "device": device,
+            "total_energy": round(energy_kwh, 6),
+            "avg_voltage": round(avg_voltage, 2),
+            "avg_current": round(avg_current, 2)
+        })
+    return results
+
 def get_readings_by_device(db: Session, device: str, limit: int = 100):
     return db.query(Reading).filter(Reading.device == device).order_by(Reading.timestamp.desc()).limit(limit).all()
 
 def get_latest_readings(db: Session):
-    """Get the latest reading for each device with a fallback for empty states."""
+    """
+    Get the latest reading for each device with a fallback for empty states.
+
+    The registry's last_seen is the newest timestamp per device, so the readings are
+    fetched with a single (device, timestamp) index lookup per device.
+    """
     try:
-        # 1. Try to get unique devices
-        device_names = [r[0] for r in db.query(Reading.device).distinct().all()]
-        
-        if not device_names:
-            # Fallback: if no distinct devices found, just get the last few readings to see if anything exists
+        registered = db.query(Device).filter(Device.last_seen.isnot(None)).all()
+
+        if not registered:
+            # Fallback: registry not populated yet, just get the last few readings to see if anything exists
             return db.query(Reading).order_by(Reading.timestamp.desc()).limit(10).all()
-        
-        latest_readings = []
-        for device in device_names:
-            latest = db.query(Reading).filter(Reading.device == device).order_by(Reading.timestamp.desc()).first()
-            if latest:
-                latest_readings.append(latest)
-        return latest_readings
+
+        latest = {}
+        rows = db.execute(latest_readings_stmt()).scalars().all()
+        for reading in rows:
+            latest[reading.device] = reading
+
+        # A device whose newest reading is gone (e.g. deleted) still gets its most recent one
+        for device in registered:
+            if device.id not in latest:
+                reading = db.query(Reading).filter(Reading.device == device.id).order_by(Reading.timestamp.desc()).first()
+                if reading:
+                    latest[device.id] = reading
+        return list(latest.values())
     except Exception as e:
-        print(f"⚠️ Error in get_latest_readings: {e}")
+        logger.exception("⚠️ Error in get_latest_readings: %s", e)
         return []
 
 def get_daily_usage(db: Session, date_val: datetime | date):
@@ -40,44 +164,353 @@ def get_daily_usage(db: Session, date_val: datetime | date):
     # Energy (Ws) = Power (W) * 10 (s)
     # Energy (kWh) = Power (W) * 10 (s) / (3600 * 1000)
     
-    if isinstance(date_val, datetime):
-        start_of_day = date_val.replace(hour=0, minute=0, second=0, microsecond=0)
-    else:
-        start_of_day = datetime.combine(date_val, datetime.min.time())
-        
-    end_of_day = start_of_day + timedelta(days=1)
+    # One grouped query instead of loading every reading of the day
+    return usage_stats(db.execute(daily_usage_stmt(start_of(date_val))).all())
 
-    readings = db.query(Reading).filter(
-        Reading.timestamp >= start_of_day,
-        Reading.timestamp < end_of_day
-    ).all()
+def get_daily_summary_record(db: Session, day: date):
+    return db.query(DailySummary).filter(DailySummary.day == day).first()
 
-    device_stats = {}
-    for r in readings:
-        if r.device not in device_stats:
-            device_stats[r.device] = {"total_power": 0, "count": 0, "total_voltage": 0, "total_current": 0}
-        
-        power = r.voltage * r.current
-        device_stats[r.device]["total_power"] += power
-        device_stats[r.device]["total_voltage"] += r.voltage
-        device_stats[r.device]["total_current"] += r.current
-        device_stats[r.device]["count"] += 1
+def save_daily_summary(db: Session, day: date, device_stats: list):
+    """Stores (or replaces) the summary of a finished day."""
+    record = get_daily_summary_record(db, day) or DailySummary(day=day)
+    record.total_energy = round(sum(d["total_energy"] for d in device_stats), 6)
+    record.device_breakdown = device_stats
+    record.computed_at = datetime.utcnow()
+    db.merge(record)
+    db.commit()
+    return record
 
-    results = []
-    for device, stats in device_stats.items():
-        # Energy in kWh: Total Power (W) * 10s / 3,600,000
-        energy_kwh = (stats["total_power"] * 10) / 3600000
-        avg_voltage = stats["total_voltage"] / stats["count"]
-        avg_current = stats["total_current"] / stats["count"]
-        
-        results.append({
-            "device": device,
-            "total_energy": round(energy_kwh, 6),
-            "avg_voltage": round(avg_voltage, 2),
-            "avg_current": round(avg_current, 2)
-        })
-    
-    return results
+def invalidate_daily_summaries(db: Session, days=None):
+    """Drops stored summaries for `days` (all of them when None) so they are recomputed. The caller commits."""
+    query = db.query(DailySummary)
+    if days is not None:
+        query = query.filter(DailySummary.day.in_(list(days)))
+    query.delete(synchronize_session=False)
+
+def seconds_since(db: Session, column, origin: datetime):
+    """SQL expression for the (fractional) number of seconds between `origin` and `column`."""
+    if db.get_bind().dialect.name == 'postgresql':
+        return func.extract('epoch', column - literal(origin))
+    # SQLite stores timestamps as ISO strings; julianday() parses them. Rounded to the
+    # millisecond, or float error puts e.g. 01:00 at 3599.9999 s and in the previous hour
+    return func.round((func.julianday(column) - func.julianday(literal(origin.isoformat(sep=' ')))) * 86400.0, 3)
+
+def get_bucketed_series(db: Session, device: str, start: datetime, end: datetime, bucket_seconds: int):
+    """
+    Aggregates one device's readings into fixed-width time buckets in a single grouped query.
+
+    Returns rows of (bucket, count, avg/min/max power, avg/min/max current, avg/min/max voltage)
+    ordered by bucket, where bucket N starts at start + N * bucket_seconds.
+    """
+    power = Reading.voltage * Reading.current
+    bucket = cast(func.floor(seconds_since(db, Reading.timestamp, start) / bucket_seconds), Integer).label("bucket")
+    return db.query(
+        bucket,
+        func.count().label("count"),
+        func.avg(power).label("power_avg"),
+        func.min(power).label("power_min"),
+        func.max(power).label("power_max"),
+        func.avg(Reading.current).label("current_avg"),
+        func.min(Reading.current).label("current_min"),
+        func.max(Reading.current).label("current_max"),
+        func.avg(Reading.voltage).label("voltage_avg"),
+        func.min(Reading.voltage).label("voltage_min"),
+        func.max(Reading.voltage).label("voltage_max"),
+    ).filter(
+        Reading.device == device,
+        Reading.timestamp >= start,
+        Reading.timestamp < end
+    ).group_by(bucket).order_by(bucket).all()
+
+def dialect_insert(db: Session, table):
+    """INSERT construct supporting ON CONFLICT for the session's dialect (PostgreSQL or SQLite)."""
+    if db.get_bind().dialect.name == 'postgresql':
+        return postgresql.insert(table)
+    return sqlite.insert(table)
+
+ROLLUP_STATS = ("samples", "power_sum", "power_min", "power_max", "current_sum", "current_min", "current_max",
+                "voltage_sum", "voltage_min", "voltage_max")
+
+# Rollup tiers and the timestamp column each one is keyed by
+ROLLUP_TIERS = {"minute": ReadingRollup, "hour": HourlyRollup}
+
+def time_floor(db: Session, column, unit: str = "minute"):
+    """SQL expression truncating a timestamp column to the minute or hour, in the column's storage format."""
+    if db.get_bind().dialect.name == 'postgresql':
+        return func.date_trunc(unit, column)
+    pattern = '%Y-%m-%d %H:%M:00.000000' if unit == "minute" else '%Y-%m-%d %H:00:00.000000'
+    return func.strftime(pattern, column)
+
+def time_floor_value(value: datetime, unit: str = "minute") -> datetime:
+    """Python counterpart of time_floor."""
+    value = value.replace(second=0, microsecond=0)
+    return value.replace(minute=0) if unit == "hour" else value
+
+def time_ceil_value(value: datetime, unit: str = "minute") -> datetime:
+    floor = time_floor_value(value, unit)
+    if floor == value:
+        return value
+    return floor + (timedelta(hours=1) if unit == "hour" else timedelta(minutes=1))
+
+def upsert_rollups(db: Session, rows: list, unit: str = "minute"):
+    """Merges aggregates (see rollup_service.aggregate_readings) into the rollup tier for `unit`. The caller commits."""
+    if not rows:
+        return
+    table = ROLLUP_TIERS[unit].__table__
+    least, greatest = (func.least, func.greatest) if db.get_bind().dialect.name == 'postgresql' else (func.min, func.max)
+    stmt = dialect_insert(db, table)
+    excluded = stmt.excluded
+    set_ = {}
+    if "updated_at" in table.c:
+        now = datetime.utcnow()
+        rows = [{**row, "updated_at": now} for row in rows]
+        set_["updated_at"] = excluded["updated_at"]
+    for name in ROLLUP_STATS:
+        if name.endswith("_min"):
+            set_[name] = least(table.c[name], excluded[name])
+        elif name.endswith("_max"):
+            set_[name] = greatest(table.c[name], excluded[name])
+        else:
+            set_[name] = table.c[name] + excluded[name]
+    stmt = stmt.on_conflict_do_update(index_elements=[table.c.device, table.c[unit]], set_=set_)
+    db.execute(stmt, rows)
+
+def get_completed_backfills(db: Session):
+    """Names of the backfills that have completed."""
+    return set(db.execute(select(Backfill.name)).scalars().all())
+
+def mark_backfilled(db: Session, name: str):
+    """Records a completed backfill. The caller commits."""
+    db.merge(Backfill(name=name, completed_at=datetime.utcnow()))
+
+def rebuild_rollups(db: Session, start: datetime = None, end: datetime = None, units=tuple(ROLLUP_TIERS)):
+    """
+    Recomputes the rollup tiers in `units` from raw readings, optionally limited to [start, end).
+    The limits are widened to whole minutes/hours so no period is rebuilt from partial data.
+    """
+    power = Reading.voltage * Reading.current
+    for unit in units:
+        table = ROLLUP_TIERS[unit].__table__
+        period = time_floor(db, Reading.timestamp, unit)
+        columns, touched = ["device", unit, *ROLLUP_STATS], []
+        if "updated_at" in table.c:
+            columns.append("updated_at")
+            touched.append(literal(datetime.utcnow(), DateTime))
+
+        delete = table.delete()
+        source = db.query(
+            Reading.device, period, func.count(),
+            func.sum(power), func.min(power), func.max(power),
+            func.sum(Reading.current), func.min(Reading.current), func.max(Reading.current),
+            func.sum(Reading.voltage), func.min(Reading.voltage), func.max(Reading.voltage),
+            *touched,
+        )
+        if start is not None:
+            delete = delete.where(table.c[unit] >= time_floor_value(start, unit))
+            source = source.filter(Reading.timestamp >= time_floor_value(start, unit))
+        if end is not None:
+            delete = delete.where(table.c[unit] < time_ceil_value(end, unit))
+            source = source.filter(Reading.timestamp < time_ceil_value(end, unit))
+        source = source.group_by(Reading.device, period)
+
+        db.execute(delete)
+        db.execute(table.insert().from_select(columns, source.statement))
+    db.commit()
+
+def get_bucketed_rollup_series(db: Session, device: str, start: datetime, end: datetime, bucket_seconds: int):
+    """Same shape as get_bucketed_series, computed from per-minute rollups (`start` must be minute-aligned)."""
+    r = ReadingRollup
+    bucket = cast(func.floor(seconds_since(db, r.minute, start) / bucket_seconds), Integer).label("bucket")
+    samples = func.sum(r.samples)
+    return db.query(
+        bucket,
+        samples.label("count"),
+        (func.sum(r.power_sum) / samples).label("power_avg"),
+        func.min(r.power_min).label("power_min"),
+        func.max(r.power_max).label("power_max"),
+        (func.sum(r.current_sum) / samples).label("current_avg"),
+        func.min(r.current_min).label("current_min"),
+        func.max(r.current_max).label("current_max"),
+        (func.sum(r.voltage_sum) / samples).label("voltage_avg"),
+        func.min(r.voltage_min).label("voltage_min"),
+        func.max(r.voltage_max).label("voltage_max"),
+    ).filter(
+        r.device == device,
+        r.minute >= start,
+        r.minute < end
+    ).group_by(bucket).order_by(bucket).all()
+
+def get_range_usage(db: Session, origin: datetime, end: datetime, bucket_seconds: int,
+                    device: str = None, after: tuple = None, limit: int = None, fallback_rate: float = 0.0):
+    """
+    Per-device usage totals in fixed-width buckets from `origin` to `end`, from the hourly
+    rollups (`origin` and `bucket_seconds` must be whole hours).
+
+    Rows carry (bucket, device, samples, power_sum, peak_power, voltage_sum, current_sum, cost),
+    ordered by bucket then device, where bucket N starts at origin + N * bucket_seconds.
+    Cost is each hour's energy at its priced rate from hourly_costs, or `fallback_rate`
+    for hours the pricing job hasn't reached yet.
+    `after` is the (bucket, device) of the last row already returned, for keyset paging.
+    """
+    r = HourlyRollup
+    c = HourlyCost
+    bucket_expr = cast(func.floor(seconds_since(db, r.hour, origin) / bucket_seconds), Integer)
+    bucket = bucket_expr.label("bucket")
+    query = db.query(
+        bucket,
+        r.device.label("device"),
+        func.sum(r.samples).label("samples"),
+        func.sum(r.power_sum).label("power_sum"),
+        func.max(r.power_max).label("peak_power"),
+        func.sum(r.voltage_sum).label("voltage_sum"),
+        func.sum(r.current_sum).label("current_sum"),
+        # Same convention as get_daily_usage: each reading stands for 10 seconds
+        (func.sum(r.power_sum * func.coalesce(c.rate, fallback_rate)) * 10 / 3600000).label("cost"),
+    ).outerjoin(c, (c.device == r.device) & (c.hour == r.hour)).filter(r.hour >= origin, r.hour < end)
+    if device is not None:
+        query = query.filter(r.device == device)
+    if after is not None:
+        after_bucket, after_device = after
+        query = query.filter(
+            r.hour >= origin + timedelta(seconds=after_bucket * bucket_seconds),
+            (bucket_expr > after_bucket) | (r.device > after_device)
+        )
+    query = query.group_by(bucket, r.device).order_by(bucket, r.device)
+    if limit is not None:
+        query = query.limit(limit)
+    return query.all()
+
+def get_hourly_energy(db: Session, device: str = None, end: datetime = None):
+    """(hour, kWh) for every hour before `end` with readings, from the hourly rollups; all devices summed unless `device` is given."""
+    # Same convention as get_daily_usage: each reading stands for 10 seconds
+    stmt = select(HourlyRollup.hour, func.sum(HourlyRollup.power_sum) * 10 / 3600000).group_by(HourlyRollup.hour).order_by(HourlyRollup.hour)
+    if device is not None:
+        stmt = stmt.where(HourlyRollup.device == device)
+    if end is not None:
+        stmt = stmt.where(HourlyRollup.hour < end)
+    return [tuple(row) for row in db.execute(stmt).all()]
+
+def get_month_energy(db: Session, start: datetime, end: datetime) -> float:
+    """kWh used by all devices in [start, end), from the hourly rollups (whole hours)."""
+    total = db.execute(select(func.sum(HourlyRollup.power_sum)).where(HourlyRollup.hour >= start, HourlyRollup.hour < end)).scalar()
+    return (total or 0.0) * 10 / 3600000
+
+def get_hourly_rollup_energy(db: Session, start: datetime, end: datetime):
+    """(device, hour, samples, kWh) rows of the hourly rollups in [start, end), ordered by hour."""
+    r = HourlyRollup
+    stmt = select(r.device, r.hour, r.samples, r.power_sum * 10 / 3600000).where(r.hour >= start, r.hour < end).order_by(r.hour, r.device)
+    return db.execute(stmt).all()
+
+def get_unpriced_hours(db: Session, since: datetime = None):
+    """
+    Hours with a rollup that has no hourly_costs row, or one priced before more readings
+    arrived. With `since`, only rollups updated from then on are looked at.
+    """
+    r, c = HourlyRollup, HourlyCost
+    stmt = select(r.hour).outerjoin(c, (c.device == r.device) & (c.hour == r.hour)).where(
+        c.hour.is_(None) | (c.samples != r.samples)
+    ).distinct()
+    if since is not None:
+        stmt = stmt.where(r.updated_at >= since)
+    return db.execute(stmt).scalars().all()
+
+def replace_hourly_costs(db: Session, start: datetime, end: datetime, rows: list):
+    """Replaces the hourly_costs rows in [start, end) with `rows`. The caller commits."""
+    db.execute(HourlyCost.__table__.delete().where(HourlyCost.hour >= start, HourlyCost.hour < end))
+    if rows:
+        db.execute(insert(HourlyCost), rows)
+
+def get_tariffs(db: Session):
+    """Every tariff, oldest effective_from first."""
+    return db.execute(select(Tariff).order_by(Tariff.effective_from, Tariff.id)).scalars().all()
+
+def create_tariff(db: Session, name: str, kind: str, rates: dict, effective_from: datetime, reprice_from: datetime):
+    """Stores a tariff and drops the costs priced from `reprice_from` on, so the pricing job reprices them."""
+    tariff = Tariff(name=name, kind=kind, rates=rates, effective_from=effective_from)
+    db.add(tariff)
+    db.execute(HourlyCost.__table__.delete().where(HourlyCost.hour >= reprice_from))
+    # Touched, so the pricing job's incremental scan finds them
+    db.execute(update(HourlyRollup).where(HourlyRollup.hour >= reprice_from).values(updated_at=datetime.utcnow()))
+    db.commit()
+    db.refresh(tariff)
+    return tariff
+
+def get_forecast_record(db: Session, device: str):
+    return db.get(Forecast, device)
+
+def get_forecast_watermarks(db: Session):
+    """{device: data_through} of the stored forecasts."""
+    return dict(db.execute(select(Forecast.device, Forecast.data_through)).all())
+
+def save_forecasts(db: Session, rows: list):
+    """Inserts or replaces forecast rows (see models.Forecast). The caller commits."""
+    if not rows:
+        return
+    table = Forecast.__table__
+    stmt = dialect_insert(db, table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.device],
+        set_={column: stmt.excluded[column] for column in ("generated_at", "data_through", "points", "outlook", "tip")},
+    )
+    db.execute(stmt, rows)
+
+def get_raw_series(db: Session, device: str, start: datetime, end: datetime):
+    """(timestamp, current, voltage) tuples for one device in a time range, oldest first."""
+    return db.query(Reading.timestamp, Reading.current, Reading.voltage).filter(
+        Reading.device == device,
+        Reading.timestamp >= start,
+        Reading.timestamp < end
+    ).order_by(Reading.timestamp).all()
+
+def get_oldest_reading_time(db: Session, device: str, before: datetime):
+    """Timestamp of a device's oldest reading before `before`, or None."""
+    return db.execute(select(func.min(Reading.timestamp)).where(Reading.device == device, Reading.timestamp < before)).scalar()
+
+def delete_readings(db: Session, device: str, start: datetime, end: datetime):
+    """Deletes a device's readings in [start, end) and returns them as (timestamp, current, voltage) rows. The caller commits."""
+    table = Reading.__table__
+    return db.execute(table.delete().where(
+        table.c.device == device, table.c.timestamp >= start, table.c.timestamp < end
+    ).returning(table.c.timestamp, table.c.current, table.c.voltage)).all()
+
+def register_devices(db: Session, rows: list):
+    """
+    Merges {"id", "first_seen", "last_seen", "sample_count"} rows into the device registry.
+
+    Unknown devices are inserted with DEFAULT_THRESHOLD; known ones keep their threshold
+    and have their seen range widened and sample count increased. The caller commits.
+    """
+    if not rows:
+        return
+    table = Device.__table__
+    least, greatest = (func.least, func.greatest) if db.get_bind().dialect.name == 'postgresql' else (func.min, func.max)
+    stmt = dialect_insert(db, table)
+    excluded = stmt.excluded
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.id],
+        set_={
+            "first_seen": least(func.coalesce(table.c.first_seen, excluded.first_seen), excluded.first_seen),
+            "last_seen": greatest(func.coalesce(table.c.last_seen, excluded.last_seen), excluded.last_seen),
+            "sample_count": func.coalesce(table.c.sample_count, 0) + excluded.sample_count,
+        }
+    )
+    db.execute(stmt, [{"threshold": DEFAULT_THRESHOLD, **row} for row in rows])
+
+def rebuild_device_registry(db: Session):
+    """Recomputes the registry's seen range and sample counts from raw readings, keeping thresholds."""
+    db.query(Device).update({Device.first_seen: None, Device.last_seen: None, Device.sample_count: 0})
+    stats = db.query(
+        Reading.device, func.min(Reading.timestamp), func.max(Reading.timestamp), func.count()
+    ).group_by(Reading.device).all()
+    register_devices(db, [
+        {"id": device, "first_seen": first, "last_seen": last, "sample_count": count}
+        for device, first, last, count in stats
+    ])
+    db.commit()
+
+def get_last_seen(db: Session):
+    """{device: last_seen} for every device that has sent readings."""
+    return dict(db.execute(select(Device.id, Device.last_seen).where(Device.last_seen.isnot(None))).all())
 
 def get_device(db: Session, device_id: str):
     return db.query(Device).filter(Device.id == device_id).first()
@@ -87,7 +520,7 @@ def create_or_update_device(db: Session, device_id: str, threshold: float):
     if db_device:
         db_device.threshold = threshold
     else:
-        db_device = Device(id=device_id, threshold=threshold)
+        db_device = Device(id=device_id, threshold=threshold, sample_count=0)
         db.add(db_device)
     db.commit()
     db.refresh(db_device)
@@ -104,87 +537,64 @@ def get_anomalies(db: Session, device_id: str, limit: int = 100):
         return []
 
     # Filtering for readings where power (current * voltage) > threshold
-    return db.query(Reading).filter(
-        Reading.device == device_id,
-        (Reading.current * Reading.voltage) > device.threshold
-    ).order_by(Reading.timestamp.desc()).limit(limit).all()
+    return db.execute(anomalies_stmt(device_id, device.threshold, limit)).scalars().all()
+
+def insert_anomaly_events(db: Session, events: list):
+    """Stores events from the streaming detector. The caller commits."""
+    if events:
+        db.execute(insert(AnomalyEvent), events)
+
+def get_anomaly_events(db: Session, device: str = None, kind: str = None, since: datetime = None, limit: int = 100):
+    """Anomaly events flagged at ingest, newest first."""
+    return db.execute(anomaly_events_stmt(device, kind, since, limit)).scalars().all()
+
+def get_data_version(db: Session):
+    """
+    A value that changes when the data behind the chatbot's answers does: a new minute of
+    readings (the rollup watermark), a device added or re-thresholded, or a new tariff.
+    """
+    last_seen, devices, thresholds = db.execute(
+        select(func.max(Device.last_seen), func.count(Device.id), func.sum(Device.threshold))).one()
+    tariff = db.execute(select(func.max(Tariff.id))).scalar()
+    return (time_floor_value(last_seen) if last_seen else None, devices, thresholds, tariff)
 
 def get_all_devices(db: Session):
-    """Get all devices and their thresholds, combining existing device records with unique names from readings."""
-    # 1. Get all unique device names from the database
-    device_names_from_readings = [r[0] for r in db.query(Reading.device).distinct().all()]
-    
-    # 2. Get all defined devices from the devices table
-    defined_devices = {d.id: d.threshold for d in db.query(Device).all()}
-    
-    # 3. Combine them
-    all_names = set(device_names_from_readings).union(defined_devices.keys())
-    
+    """Get all devices and their thresholds from the device registry, which ingest keeps up to date."""
+    devices = db.execute(select(Device).order_by(Device.id)).scalars().all()
+
     # If no data at all, return dummy devices for initial UI state
-    if not all_names:
-        return [
-            Device(id="bulb_1", threshold=2500.0),
-            Device(id="bulb_2", threshold=2500.0),
-            Device(id="socket_1", threshold=2500.0),
-            Device(id="socket_2", threshold=2500.0),
-        ]
+    return devices or placeholder_devices()
 
-    results = []
-    for name in all_names:
-        results.append(Device(
-            id=name,
-            threshold=defined_devices.get(name, 2500.0)
-        ))
-    return results
+def placeholder_devices():
+    return [
+        Device(id="bulb_1", threshold=DEFAULT_THRESHOLD),
+        Device(id="bulb_2", threshold=DEFAULT_THRESHOLD),
+        Device(id="socket_1", threshold=DEFAULT_THRESHOLD),
+        Device(id="socket_2", threshold=DEFAULT_THRESHOLD),
+    ]
 
 def get_recent_anomalies(db: Session, hours: int = 24):
-    """Summarize anomalous activity across all devices in the last N hours."""
+    """Summarize anomalous activity across all devices in the last N hours: {device: readings over its threshold}."""
     since = datetime.now() - timedelta(hours=hours)
-    
-    # Get all devices to know their thresholds
-    devices = db.query(Device).all()
-    device_map = {d.id: d.threshold for d in devices}
-    
-    anomalies_summary = {}
-    
-    # We query readings since the time window
-    readings = db.query(Reading).filter(Reading.timestamp >= since).all()
-    
-    for r in readings:
-        threshold = device_map.get(r.device, 2500.0)
-        power = r.voltage * r.current
-        if power > threshold:
-            if r.device not in anomalies_summary:
-                anomalies_summary[r.device] = 0
-            anomalies_summary[r.device] += 1
-            
-    return anomalies_summary
+    rows = db.query(Reading.device, func.count()).outerjoin(Device, Device.id == Reading.device).filter(
+        Reading.timestamp >= since,
+        (Reading.voltage * Reading.current) > func.coalesce(Device.threshold, DEFAULT_THRESHOLD),
+    ).group_by(Reading.device).all()
+    return {device: count for device, count in rows}
 
 def get_power_trend(db: Session, window_minutes: int = 5):
     """Calculates the trend for power draw.
     Compares the average power of the last 'window' minutes with the average power of the 'window' minutes before that.
     """
-    now = datetime.now()
-    window_start = now - timedelta(minutes=window_minutes)
-    previous_window_start = now - timedelta(minutes=window_minutes * 2)
+    previous_window_start, window_start, now = power_trend_windows(window_minutes)
 
     # Current window average power
-    current_avg = db.query(func.avg(Reading.voltage * Reading.current)).filter(
-        Reading.timestamp >= window_start,
-        Reading.timestamp < now
-    ).scalar() or 0.0
+    current_avg = db.execute(average_power_stmt(window_start, now)).scalar()
 
     # Previous window average power
-    previous_avg = db.query(func.avg(Reading.voltage * Reading.current)).filter(
-        Reading.timestamp >= previous_window_start,
-        Reading.timestamp < window_start
-    ).scalar() or 0.0
+    previous_avg = db.execute(average_power_stmt(previous_window_start, window_start)).scalar()
 
-    if previous_avg == 0:
-        return 0.0 # No trend possible without historical data
-    
-    trend_percentage = ((current_avg - previous_avg) / previous_avg) * 100
-    return round(trend_percentage, 1)
+    return power_trend(current_avg, previous_avg)
 
 
 
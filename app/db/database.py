@@ -1,25 +1,222 @@
-from sqlalchemy import create_engine
+import logging
+from sqlalchemy import create_engine, event, inspect, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
 from app.config import settings
+from app.db.pool import WriterPool
+from app.db.replica import ReplicaMonitor, RoutingSession, register_metrics
+from app.utils.instrumentation import instrument_engine
 
-engine_args = {}
-if settings.DATABASE_URL.startswith("sqlite"):
-    engine_args["connect_args"] = {"check_same_thread": False}
+logger = logging.getLogger(__name__)
 
-# Fix for Render's PostgreSQL URL which often starts with postgres:// instead of postgresql://
-db_url = settings.DATABASE_URL
-if db_url.startswith("postgres://"):
-    db_url = db_url.replace("postgres://", "postgresql://", 1)
+def sqlite_pragmas():
+    return (
+        f"journal_mode={settings.SQLITE_JOURNAL_MODE}",
+        f"synchronous={settings.SQLITE_SYNCHRONOUS}",
+        f"mmap_size={settings.SQLITE_MMAP_MB * 1024 * 1024}",
+        f"cache_size={-settings.SQLITE_CACHE_MB * 1024}",  # negative: KiB rather than pages
+        f"busy_timeout={settings.SQLITE_BUSY_TIMEOUT_MS}",
+    )
 
-engine = create_engine(db_url, **engine_args)
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    for pragma in sqlite_pragmas():
+        cursor.execute(f"PRAGMA {pragma}")
+    cursor.close()
+
+def engine_options(url, for_async: bool = False) -> dict:
+    """
+    create_engine arguments for the database behind `url`. Postgres gets a sized pool
+    with pre-ping, recycling and a server-side statement timeout. SQLite is tuned with
+    pragmas on every new connection instead (see tune_engine).
+    """
+    backend = make_url(url).get_backend_name()
+    if backend == "sqlite":
+        return {} if for_async else {"connect_args": {"check_same_thread": False}}
+    if backend != "postgresql":
+        return {}
+
+    options = {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+    if settings.DB_STATEMENT_TIMEOUT_MS:
+        timeout = str(settings.DB_STATEMENT_TIMEOUT_MS)
+        options["connect_args"] = (
+            {"server_settings": {"statement_timeout": timeout}} if for_async
+            else {"options": f"-c statement_timeout={timeout}"}
+        )
+    return options
+
+def tune_engine(engine):
+    """Applies the SQLite pragmas to every connection `engine` opens, and instruments it."""
+    if engine.dialect.name == "sqlite":
+        event.listen(engine, "connect", _apply_sqlite_pragmas)
+    return instrument_engine(engine)
+
+def is_sqlite_file(url) -> bool:
+    url = make_url(url)
+    return url.get_backend_name() == "sqlite" and url.database not in (None, "", ":memory:")
+
+def normalize_url(url: str) -> str:
+    # Fix for Render's PostgreSQL URL which often starts with postgres:// instead of postgresql://
+    if url.startswith("postgres://"):
+        url = url.replace("postgres://", "postgresql://", 1)
+    return url
+
+db_url = normalize_url(settings.DATABASE_URL)
+
+engine = tune_engine(create_engine(db_url, **engine_options(db_url)))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+if settings.SQLITE_SINGLE_WRITER and is_sqlite_file(db_url):
+    # SQLite takes one writer at a time. Queueing this process's writers for a single
+    # connection is cheaper than having them collide on the file lock and back off.
+    write_engine = tune_engine(create_engine(db_url, poolclass=WriterPool, pool_timeout=60, **engine_options(db_url)))
+else:
+    write_engine = engine
+# Ingest, jobs and endpoints that write use these sessions. With the single-writer pool,
+# never nest them in one thread, and close them before slow work (see WriterPool)
+WriteSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=write_engine)
+
+ASYNC_DRIVERS = {"sqlite": "sqlite+aiosqlite", "postgresql": "postgresql+asyncpg"}
+
+def async_url(url):
+    """The same database as `url`, through its async driver (aiosqlite or asyncpg)."""
+    url = make_url(url)
+    backend = url.get_backend_name()
+    url = url.set(drivername=ASYNC_DRIVERS[backend])
+    if backend == "postgresql" and "sslmode" in url.query:
+        # asyncpg takes `ssl` where libpq takes `sslmode`
+        url = url.update_query_dict({"ssl": url.query["sslmode"]}).difference_update_query(["sslmode"])
+    return url
+
+# Async endpoints read through this engine, so waiting on the database doesn't hold a
+# threadpool thread. Ingest, jobs and writes stay on the sync engine above.
+async_engine = create_async_engine(async_url(db_url), **engine_options(db_url, for_async=True))
+tune_engine(async_engine.sync_engine)
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+# Optional read replica: heavy analytical reads go there while it is reachable and current,
+# so they don't compete with ingest for the primary
+read_url = normalize_url(settings.DATABASE_READ_URL) if settings.DATABASE_READ_URL else None
+if read_url:
+    read_engine = tune_engine(create_engine(read_url, **engine_options(read_url)))
+    async_read_engine = create_async_engine(async_url(read_url), **engine_options(read_url, for_async=True))
+    tune_engine(async_read_engine.sync_engine)
+    replica_monitor = ReplicaMonitor(engine, read_engine, settings.REPLICA_MAX_LAG_SECONDS, settings.REPLICA_CHECK_SECONDS)
+    register_metrics(replica_monitor)
+else:
+    read_engine = async_read_engine = replica_monitor = None
+
+ReadSessionLocal = sessionmaker(
+    class_=RoutingSession, autocommit=False, autoflush=False,
+    primary=engine, replica=read_engine, monitor=replica_monitor)
+AsyncReadSessionLocal = async_sessionmaker(
+    sync_session_class=RoutingSession, autoflush=False, expire_on_commit=False,
+    primary=async_engine.sync_engine, replica=async_read_engine and async_read_engine.sync_engine,
+    monitor=replica_monitor)
+
 Base = declarative_base()
 
+def on_commit(db, callback):
+    """Runs `callback` once `db` commits its current transaction. A rollback discards it."""
+    db.info.setdefault("on_commit", []).append(callback)
+
+@event.listens_for(Session, "after_commit")
+def _run_commit_callbacks(session):
+    for callback in session.info.pop("on_commit", []):
+        callback()
+
+@event.listens_for(Session, "after_soft_rollback")
+def _drop_commit_callbacks(session, previous_transaction):
+    session.info.pop("on_commit", None)
+
+def init_db():
+    """
+    Creates missing tables, then brings existing ones up to date: columns and indexes
+    added to a model after its table was created are added too (create_all skips those).
+    New columns must be nullable. Rows that would violate a newly added unique index are
+    dropped first (keeping the oldest), and the aggregates derived from them rebuilt.
+    """
+    from app.db import models  # noqa: F401 - registers the models on Base
+
+    Base.metadata.create_all(bind=engine)
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            existing = {c["name"] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    column_type = column.type.compile(dialect=engine.dialect)
+                    conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+    removed = 0
+    for table in Base.metadata.sorted_tables:
+        existing = {ix["name"] for ix in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name in existing:
+                continue
+            if index.unique:
+                removed += _drop_duplicates(table, [c.name for c in index.columns])
+            index.create(bind=engine)
+    with engine.begin() as conn:
+        # Superseded by the unique uq_readings_device_timestamp
+        conn.execute(text("DROP INDEX IF EXISTS ix_readings_device_timestamp"))
+
+    if removed:
+        from app.db import crud
+        db = WriteSessionLocal()
+        try:
+            crud.rebuild_rollups(db)
+            crud.rebuild_device_registry(db)
+            crud.invalidate_daily_summaries(db)
+            db.commit()
+        finally:
+            db.close()
+
+def _drop_duplicates(table, columns) -> int:
+    """Deletes all but the lowest-keyed row of every group sharing `columns`. Returns the number deleted."""
+    key = list(table.primary_key.columns)[0].name
+    cols = ", ".join(columns)
+    with engine.begin() as conn:
+        result = conn.execute(text(
+            f"DELETE FROM {table.name} WHERE {key} NOT IN (SELECT MIN({key}) FROM {table.name} GROUP BY {cols})"
+        ))
+    if result.rowcount:
+        logger.warning("🧹 Removed %d duplicate row(s) from %s before adding a unique index on (%s).", result.rowcount, table.name, cols)
+    return result.rowcount or 0
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+def get_write_db():
+    db = WriteSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+def get_read_db():
+    """Session for read-only endpoints: served by the read replica when one is configured and healthy."""
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+async def get_async_read_db():
+    async with AsyncReadSessionLocal() as db:
+        yield db
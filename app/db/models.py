@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime
+from sqlalchemy import Column, Integer, String, Float, Date, DateTime, Index, JSON
 from app.db.database import Base
 from datetime import datetime
 
@@ -11,9 +11,134 @@ class Reading(Base):
     current = Column(Float)
     voltage = Column(Float)
 
+    __table_args__ = (
+        # Natural key, so QoS redelivery, reconnects or replays can't store a reading twice.
+        # Also serves per-device time-range scans (history, series, latest reading)
+        Index("uq_readings_device_timestamp", "device", "timestamp", unique=True),
+        Index("ix_readings_timestamp", "timestamp"),
+    )
+
+class ReadingRollup(Base):
+    """Per-device, per-minute aggregates of readings, maintained at ingest for long-range charts."""
+    __tablename__ = "reading_rollups"
+
+    device = Column(String, primary_key=True)
+    minute = Column(DateTime, primary_key=True)
+    samples = Column(Integer, default=0)
+    power_sum = Column(Float, default=0.0)
+    power_min = Column(Float)
+    power_max = Column(Float)
+    current_sum = Column(Float, default=0.0)
+    current_min = Column(Float)
+    current_max = Column(Float)
+    voltage_sum = Column(Float, default=0.0)
+    voltage_min = Column(Float)
+    voltage_max = Column(Float)
+
+class HourlyRollup(Base):
+    """Per-device, per-hour aggregates of readings, maintained at ingest for multi-day analytics."""
+    __tablename__ = "reading_rollups_hourly"
+
+    device = Column(String, primary_key=True)
+    hour = Column(DateTime, primary_key=True)
+    samples = Column(Integer, default=0)
+    power_sum = Column(Float, default=0.0)
+    power_min = Column(Float)
+    power_max = Column(Float)
+    current_sum = Column(Float, default=0.0)
+    current_min = Column(Float)
+    current_max = Column(Float)
+    voltage_sum = Column(Float, default=0.0)
+    voltage_min = Column(Float)
+    voltage_max = Column(Float)
+    updated_at = Column(DateTime, nullable=True)  # Last ingest, rebuild or tariff change touching the hour; the pricing job scans from here
+
+    __table_args__ = (
+        Index("ix_reading_rollups_hourly_updated_at", "updated_at"),
+    )
+
+class DailySummary(Base):
+    """Usage of a finished day, computed once and reused until late data lands in that day."""
+    __tablename__ = "daily_summaries"
+
+    day = Column(Date, primary_key=True)
+    total_energy = Column(Float, default=0.0)
+    device_breakdown = Column(JSON)  # Rows as returned by crud.get_daily_usage
+    computed_at = Column(DateTime, default=datetime.utcnow)
+
+class Forecast(Base):
+    """A precomputed forecast per device ("*" for the whole house), refreshed by the forecast job."""
+    __tablename__ = "forecasts"
+
+    device = Column(String, primary_key=True)
+    generated_at = Column(DateTime, default=datetime.utcnow)
+    data_through = Column(DateTime)  # Watermark: the fit used every complete hour before this
+    points = Column(JSON)  # Hourly [{"date", "predicted_energy"}], FORECAST_HORIZON_DAYS ahead
+    outlook = Column(String)
+    tip = Column(String)
+
+class Tariff(Base):
+    """An electricity price schedule; the one with the latest effective_from before an hour prices it (see tariff_service)."""
+    __tablename__ = "tariffs"
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String, nullable=False)
+    kind = Column(String, nullable=False)  # "flat", "tiered" or "tou"
+    rates = Column(JSON, nullable=False)  # Kind-specific, validated by tariff_service.validate_rates
+    effective_from = Column(DateTime, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_tariffs_effective_from", "effective_from"),
+    )
+
+class HourlyCost(Base):
+    """Per-device, per-hour cost of the energy in reading_rollups_hourly, maintained by the pricing job."""
+    __tablename__ = "hourly_costs"
+
+    device = Column(String, primary_key=True)
+    hour = Column(DateTime, primary_key=True)
+    samples = Column(Integer)  # The rollup's sample count when priced; a mismatch marks the hour for repricing
+    energy_kwh = Column(Float)
+    rate = Column(Float)  # Effective GHC/kWh for the hour; tiered rates depend on the month's consumption so far
+    cost = Column(Float)
+    tariff_id = Column(Integer, nullable=True)  # None: the ENERGY_RATE_GHC_PER_KWH default
+
+    __table_args__ = (
+        Index("ix_hourly_costs_hour", "hour"),
+    )
+
+class AnomalyEvent(Base):
+    """A statistical anomaly flagged by the streaming detector (anomaly_service) at ingest."""
+    __tablename__ = "anomaly_events"
+
+    id = Column(Integer, primary_key=True)
+    device = Column(String, nullable=False)
+    timestamp = Column(DateTime, nullable=False)  # Of the reading that raised it
+    kind = Column(String, nullable=False)  # "spike" or "step"
+    power = Column(Float)
+    baseline = Column(Float)  # The device's mean power before the reading
+    score = Column(Float)  # Deviation in standard deviations, signed
+    detected_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_anomaly_events_device_timestamp", "device", "timestamp"),
+        Index("ix_anomaly_events_timestamp", "timestamp"),
+    )
+
 class Device(Base):
     __tablename__ = "devices"
 
     id = Column(String, primary_key=True, index=True) # Device name acts as ID
     threshold = Column(Float, default=0.0)
+    # Registry fields, maintained by ingest on every saved reading
+    first_seen = Column(DateTime, nullable=True)
+    last_seen = Column(DateTime, nullable=True)
+    sample_count = Column(Integer, default=0)
+
+class Backfill(Base):
+    """A one-off rebuild of derived data from existing readings that has completed, so it isn't repeated or skipped."""
+    __tablename__ = "backfills"
 
+    name = Column(String, primary_key=True)
+    completed_at = Column(DateTime, default=datetime.utcnow)
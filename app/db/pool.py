@@ -0,0 +1,69 @@
+import threading
+from collections import deque
+from sqlalchemy import exc
+from sqlalchemy.pool import QueuePool
+
+class FairGate:
+    """
+    FIFO mutex. `release` hands ownership straight to the longest waiter, so a thread
+    that releases and immediately acquires again can't jump the queue (plain locks and
+    conditions let it, which starves the other threads under load).
+    """
+
+    def __init__(self):
+        self._mutex = threading.Lock()
+        self._waiters = deque()
+        self._held = False
+
+    def acquire(self, timeout: float = None) -> bool:
+        with self._mutex:
+            if not self._held:
+                self._held = True
+                return True
+            waiter = threading.Lock()
+            waiter.acquire()
+            self._waiters.append(waiter)
+        if waiter.acquire(timeout=-1 if timeout is None else timeout):
+            return True
+        with self._mutex:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+                return False
+        return True  # ownership was handed over just as the wait timed out
+
+    def release(self):
+        with self._mutex:
+            if self._waiters:
+                self._waiters.popleft().release()  # still held: it passes to that waiter
+            else:
+                self._held = False
+
+class WriterPool(QueuePool):
+    """
+    A single-connection pool that serves waiting threads first come, first served.
+
+    The gate is not reentrant: a thread holding a session on this pool must not open a
+    second one (nested WriteSessionLocal() calls), or it waits on itself until
+    pool_timeout. Commit and close writer sessions before slow work such as network
+    calls, which would otherwise stall every other writer in the process.
+    """
+
+    def __init__(self, creator, **kw):
+        kw.update(pool_size=1, max_overflow=0)
+        super().__init__(creator, **kw)
+        self._gate = FairGate()
+
+    def _do_get(self):
+        if not self._gate.acquire(self._timeout):
+            raise exc.TimeoutError(f"Writer connection not available after {self._timeout:.2f}s", code="3o7r")
+        try:
+            return super()._do_get()
+        except BaseException:
+            self._gate.release()
+            raise
+
+    def _do_return_conn(self, record):
+        try:
+            super()._do_return_conn(record)
+        finally:
+            self._gate.release()
@@ -0,0 +1,118 @@
+import logging
+import threading
+import time
+from sqlalchemy import DateTime, column, func, select, table
+from sqlalchemy.orm import Session
+from app.utils.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+_readings = table("readings", column("timestamp", DateTime))
+NEWEST_READING = select(func.max(_readings.c.timestamp))
+
+class ReplicaMonitor:
+    """
+    Tracks whether the read replica is usable: reachable, and no more than `max_lag`
+    seconds behind the primary.
+
+    Lag is measured on the data itself, as the gap between the newest reading on the
+    primary and on the replica. That works for any pair of databases (a Postgres
+    standby, or two local instances kept in sync by hand), and an idle primary doesn't
+    look like a lagging replica. A background thread re-checks every `interval`
+    seconds, so requests only ever read a flag.
+    """
+
+    def __init__(self, primary, replica, max_lag: float, interval: float):
+        self.primary = primary
+        self.replica = replica
+        self.max_lag = max_lag
+        self.interval = interval
+        self.healthy = False
+        self.lag_seconds = None
+        self.error = None
+        self.checked_at = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def lag(self) -> float:
+        with self.primary.connect() as conn:
+            newest = conn.execute(NEWEST_READING).scalar()
+        with self.replica.connect() as conn:
+            replicated = conn.execute(NEWEST_READING).scalar()
+        if newest is None or (replicated is not None and replicated >= newest):
+            return 0.0
+        if replicated is None:
+            return float("inf")
+        return (newest - replicated).total_seconds()
+
+    def check(self) -> bool:
+        try:
+            self.lag_seconds = self.lag()
+            self.error = None
+            healthy = self.lag_seconds <= self.max_lag
+        except Exception as e:
+            self.lag_seconds, self.error = None, str(e)
+            healthy = False
+        if healthy != self.healthy:
+            if healthy:
+                logger.info("📗 Read replica in use (lag %.1fs).", self.lag_seconds)
+            else:
+                logger.warning("📕 Read replica unusable (%s); reading from the primary.",
+                               self.error or f"lag {self.lag_seconds:.1f}s")
+        self.healthy = healthy
+        self.checked_at = time.time()
+        return healthy
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self.check()
+        self._thread = threading.Thread(target=self._run, name="replica-monitor", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.check()
+
+    def status(self):
+        return {
+            "healthy": self.healthy,
+            "lag_seconds": None if self.lag_seconds is None else round(self.lag_seconds, 3),
+            "max_lag_seconds": self.max_lag,
+            "checked_at": self.checked_at,
+            "error": self.error,
+        }
+
+def register_metrics(monitor: ReplicaMonitor):
+    registry.gauge("energy_db_replica_healthy", "1 while analytical reads are served by the read replica.").set_function(
+        lambda: int(monitor.healthy))
+    registry.gauge("energy_db_replica_lag_seconds", "How far the read replica's newest reading trails the primary's.").set_function(
+        lambda: monitor.lag_seconds if monitor.lag_seconds is not None else -1)
+
+class RoutingSession(Session):
+    """
+    Session for read-mostly work: queries go to the replica while `monitor` reports it
+    healthy, and to the primary otherwise. Flushes and INSERT/UPDATE/DELETE statements
+    always go to the primary, so the odd write (e.g. storing a computed daily summary)
+    still works.
+    """
+
+    def __init__(self, primary=None, replica=None, monitor=None, **kw):
+        super().__init__(**kw)
+        self.primary = primary
+        self.replica = replica
+        self.monitor = monitor
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if self.replica is None or self._flushing or getattr(clause, "is_dml", False):
+            return self.primary
+        if self.monitor is not None and not self.monitor.healthy:
+            return self.primary
+        return self.replica
@@ -1,34 +1,78 @@
+import logging
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from contextlib import asynccontextmanager
 from app.config import settings
-from app.api.endpoints import readings, analytics, forecast, chatbot, health, anomalies, devices
+from app.api.endpoints import readings, analytics, forecast, chatbot, health, anomalies, devices, metrics, dashboard, tariffs
 from app.services.mqtt_service import start_mqtt_listener, stop_mqtt_listener
-from app.db.database import engine, Base
+from app.services.rollup_service import start_rollup_backfill
+from app.services.registry_service import start_registry_backfill
+from app.services.scheduler import start_scheduler, stop_scheduler
+from app.services.leader_service import leader_elector, startup_lock
+from app.services.summary_service import schedule_daily_summaries
+from app.services.forecast_service import schedule_forecasts
+from app.services.archive_service import schedule_archiver
+from app.services.tariff_service import schedule_costs
+from app.db.database import async_engine, init_db, replica_monitor
+from app.utils.instrumentation import MetricsMiddleware
+from app.utils.logging_config import setup_logging
+
+setup_logging()
+logger = logging.getLogger(__name__)
+
+def start_leader_services():
+    start_rollup_backfill()
+    start_registry_backfill()
+    schedule_daily_summaries()
+    schedule_forecasts()
+    schedule_archiver()
+    schedule_costs()
+    start_scheduler()
+    if not settings.MQTT_SHARED_GROUP:
+        start_mqtt_listener()
+
+    # Start simulator if enabled
+    if settings.START_SIMULATOR:
+        from app.utils.mqtt_simulator import start_simulator
+        logger.info("🚀 Starting MQTT Simulator...")
+        start_simulator()
+
+def stop_leader_services():
+    if settings.START_SIMULATOR:
+        from app.utils.mqtt_simulator import stop_simulator
+        stop_simulator()
+    if not settings.MQTT_SHARED_GROUP:
+        stop_mqtt_listener()
+    stop_scheduler()
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
-    Base.metadata.create_all(bind=engine)
-    start_mqtt_listener()
+    with startup_lock():
+        init_db()
+    if replica_monitor:
+        replica_monitor.start()
+    # Every worker serves HTTP; only the elected leader ingests and runs background jobs
+    leader_elector.start(start_leader_services, stop_leader_services)
+    if settings.MQTT_SHARED_GROUP:
+        # The broker splits the topic across the group, so every worker can ingest
+        start_mqtt_listener()
 
     # # Trigger auto-migration if SQLite file is found
     # from app.utils.migration_logic import run_auto_migration, sync_postgres_sequences
     # run_auto_migration()
     # sync_postgres_sequences()
 
-    # Start simulator if enabled
-    if settings.START_SIMULATOR:
-        from app.utils.mqtt_simulator import run_simulator
-        import threading
-        print("🚀 Starting MQTT Simulator...")
-        simulator_thread = threading.Thread(target=run_simulator, daemon=True)
-        simulator_thread.start()
-
     yield
     # Shutdown
-    print("Shutting down...")
-    stop_mqtt_listener()
+    logger.info("Shutting down...")
+    leader_elector.stop()
+    if settings.MQTT_SHARED_GROUP:
+        stop_mqtt_listener()
+    if replica_monitor:
+        replica_monitor.stop()
+    await async_engine.dispose()
 
 app = FastAPI(title=settings.PROJECT_NAME, lifespan=lifespan)
 
@@ -40,8 +84,15 @@ app.add_middleware(
     allow_credentials=False,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag"],  # The dashboard long-poll sends it back as If-None-Match
 )
 
+# Compress larger responses (bulk readings, series) for clients that accept gzip
+app.add_middleware(GZipMiddleware, minimum_size=1024)
+
+# Per-route latency and DB query counts, exposed on /metrics
+app.add_middleware(MetricsMiddleware)
+
 
 
 
@@ -53,6 +104,9 @@ app.include_router(chatbot.router, prefix="/chatbot", tags=["Chatbot"])
 app.include_router(health.router, prefix="/health", tags=["Health"])
 app.include_router(anomalies.router, prefix="/anomalies", tags=["Anomalies"])
 app.include_router(devices.router, prefix="/devices", tags=["Devices"])
+app.include_router(dashboard.router, prefix="/dashboard", tags=["Dashboard"])
+app.include_router(tariffs.router, prefix="/tariffs", tags=["Tariffs"])
+app.include_router(metrics.router, tags=["Metrics"])
 
 @app.get("/")
 def root():
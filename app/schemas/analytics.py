@@ -13,3 +13,22 @@ class DailySummary(BaseModel):
     total_energy: float
     power_trend: float = 0.0
     device_breakdown: List[DeviceStats]
+
+class RangeBucket(BaseModel):
+    start: datetime
+    device: str
+    samples: int
+    total_energy: float
+    avg_voltage: float
+    avg_current: float
+    peak_power: float
+    cost: float
+
+class RangeUsage(BaseModel):
+    start: datetime
+    end: datetime
+    granularity: str
+    tariff: str = ""  # Name of the tariff in force now
+    rate_per_kwh: float  # Its current rate; bucket costs use each hour's own rate
+    buckets: List[RangeBucket]
+    next_cursor: Optional[str] = None
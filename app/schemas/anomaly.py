@@ -1,4 +1,5 @@
 from pydantic import BaseModel
+from datetime import datetime
 from typing import List
 from app.schemas.reading import Reading
 
@@ -6,3 +7,24 @@ class AnomalyResponse(BaseModel):
     device_id: str
     threshold: float
     anomalies: List[Reading]
+
+class AnomalyEvent(BaseModel):
+    id: int
+    device: str
+    timestamp: datetime
+    kind: str  # "spike" or "step"
+    power: float
+    baseline: float
+    score: float
+    detected_at: datetime
+
+    class Config:
+        from_attributes = True
+
+class DeviceBaseline(BaseModel):
+    samples: int
+    mean: float
+    std: float
+    level: float
+    shifted: bool
+    last_seen: datetime
@@ -0,0 +1,18 @@
+from pydantic import BaseModel
+from typing import Dict, List, Optional
+from app.schemas.analytics import DailySummary
+from app.schemas.device import Device
+from app.schemas.reading import Reading
+
+class ActiveAnomaly(BaseModel):
+    device: str
+    power: float
+    threshold: float
+
+class DashboardSnapshot(BaseModel):
+    version: int
+    readings: List[Reading]
+    devices: List[Device]
+    relays: Optional[Dict[str, bool]] = None  # None when Firebase is not available
+    daily_summary: DailySummary
+    anomalies: List[ActiveAnomaly]
@@ -1,4 +1,6 @@
 from pydantic import BaseModel
+from datetime import datetime
+from typing import Optional
 
 class DeviceBase(BaseModel):
     id: str
@@ -8,5 +10,9 @@ class DeviceCreate(BaseModel):
     threshold: float
 
 class Device(DeviceBase):
+    first_seen: Optional[datetime] = None
+    last_seen: Optional[datetime] = None
+    sample_count: Optional[int] = None
+
     class Config:
         from_attributes = True
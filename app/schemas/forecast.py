@@ -1,5 +1,6 @@
 from pydantic import BaseModel
-from typing import List
+from datetime import datetime
+from typing import List, Optional
 
 class ForecastPoint(BaseModel):
     date: str
@@ -9,4 +10,8 @@ class ForecastResponse(BaseModel):
     forecast: List[ForecastPoint]
     outlook: str = ""
     tip: str = ""
+    generated_at: Optional[datetime] = None  # When the stored forecast was fitted
+    data_through: Optional[datetime] = None  # Readings before this were in the fit
 
+class DeviceForecastResponse(ForecastResponse):
+    device: str
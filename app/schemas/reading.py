@@ -1,5 +1,6 @@
 from pydantic import BaseModel
 from datetime import datetime
+from typing import Dict, List
 
 class ReadingBase(BaseModel):
     device: str
@@ -15,3 +16,13 @@ class Reading(ReadingBase):
 
     class Config:
         from_attributes = True
+
+class BatchIngestResult(BaseModel):
+    received: int
+    inserted: int
+    duplicate: int
+    invalid: int
+    spooled: int
+    dropped: int
+    status: List[str]  # Per input row: inserted, duplicate, invalid, spooled or dropped
+    errors: Dict[int, str]  # Row index -> what was wrong with it
@@ -0,0 +1,24 @@
+from pydantic import BaseModel
+from datetime import datetime
+from typing import List, Optional
+
+class SeriesPoint(BaseModel):
+    timestamp: datetime
+    power: float
+    current: float
+    voltage: float
+    samples: int
+    power_min: Optional[float] = None
+    power_max: Optional[float] = None
+    current_min: Optional[float] = None
+    current_max: Optional[float] = None
+    voltage_min: Optional[float] = None
+    voltage_max: Optional[float] = None
+
+class SeriesResponse(BaseModel):
+    device: str
+    start: datetime
+    end: datetime
+    bucket_seconds: int
+    agg: str
+    points: List[SeriesPoint]
@@ -0,0 +1,20 @@
+from pydantic import BaseModel
+from datetime import datetime
+from typing import Any, Dict, Literal, Optional
+
+class TariffCreate(BaseModel):
+    name: str
+    kind: Literal["flat", "tiered", "tou"]
+    rates: Dict[str, Any]  # See tariff_service.validate_rates
+    effective_from: Optional[datetime] = None  # Rounded down to the hour; default: the current hour
+
+class Tariff(BaseModel):
+    id: Optional[int] = None  # None for the built-in flat rate
+    name: str
+    kind: str
+    rates: Dict[str, Any]
+    effective_from: datetime
+    created_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
@@ -0,0 +1,152 @@
+import copy
+import logging
+import math
+import threading
+from app.config import settings
+from app.utils.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+ANOMALY_EVENTS = registry.counter(
+    "energy_anomaly_events_total", "Statistical anomalies flagged by the streaming detector.", ("kind",))
+
+class DeviceBaseline:
+    """A device's running statistics: slow EWMA mean/variance of power, and a fast EWMA of its level."""
+
+    __slots__ = ("samples", "mean", "var", "level", "last_seen", "shifted", "direction")
+
+    def __init__(self, timestamp, power: float):
+        self.samples = 1
+        self.mean = power
+        self.var = 0.0
+        self.level = power
+        self.last_seen = timestamp
+        self.shifted = False
+        self.direction = 0  # Sign of the last reading's deviation, if it was beyond step_sigmas
+
+class StreamingDetector:
+    """
+    Flags statistical outliers in each device's power draw as readings are ingested.
+
+    Per device it keeps an exponentially weighted mean and variance (weight `alpha`),
+    so state and work per reading are constant. Two kinds of events come out:
+
+    - "spike": a reading more than `z_threshold` standard deviations from the mean
+    - "step": two readings in a row more than `step_sigmas` standard deviations off the
+      mean in the same direction, with the fast-moving level (weight `fast_alpha`) moved
+      as far, i.e. the draw changed and stayed changed. Reported once per shift; nothing
+      else is reported for the device until the mean has caught up with the new level.
+
+    The deviation has to exceed `min_delta` watts as well, so a device with a perfectly
+    steady draw doesn't alert on a few watts. Nothing is flagged during the first
+    `warmup` readings of a device. Readings at or before the last one seen for a device
+    (late data, spool replays) are ignored rather than rewinding the baseline. State
+    lives in this process and starts over on restart.
+
+    Ingest uses `evaluate` and `apply` so baselines only move for readings that were
+    actually committed: a batch that is rolled back (and perhaps spooled for replay)
+    would otherwise be counted twice.
+    """
+
+    def __init__(self, alpha: float = None, fast_alpha: float = None, z_threshold: float = None,
+                 step_sigmas: float = None, warmup: int = None, min_delta: float = None):
+        self.alpha = alpha or settings.ANOMALY_ALPHA
+        self.fast_alpha = fast_alpha or settings.ANOMALY_FAST_ALPHA
+        self.z_threshold = z_threshold or settings.ANOMALY_Z_THRESHOLD
+        self.step_sigmas = step_sigmas or settings.ANOMALY_STEP_SIGMAS
+        self.warmup = settings.ANOMALY_WARMUP if warmup is None else warmup
+        self.min_delta = settings.ANOMALY_MIN_DELTA if min_delta is None else min_delta
+        self._baselines = {}
+        self._lock = threading.Lock()
+
+    def observe(self, device: str, timestamp, power: float):
+        """Updates the device's baseline with one reading. Returns an event dict, or None."""
+        return self._observe(self._baselines, device, timestamp, power)
+
+    def _observe(self, baselines: dict, device: str, timestamp, power: float):
+        state = baselines.get(device)
+        if state is None:
+            baselines[device] = DeviceBaseline(timestamp, power)
+            return None
+        if timestamp <= state.last_seen:
+            return None
+        state.last_seen = timestamp
+        state.samples += 1
+
+        # A floor under sigma, so every flagged deviation is at least min_delta watts
+        sigma = max(math.sqrt(state.var), self.min_delta / self.z_threshold)
+        baseline = state.mean
+        deviation = power - baseline
+        direction = int(math.copysign(1, deviation)) if abs(deviation) > self.step_sigmas * sigma else 0
+
+        state.mean += self.alpha * deviation
+        state.var = (1 - self.alpha) * (state.var + self.alpha * deviation * deviation)
+        state.level += self.fast_alpha * (power - state.level)
+        gap = state.level - state.mean
+
+        event = None
+        if state.samples > self.warmup and not state.shifted:
+            if direction and direction == state.direction and abs(gap) > self.step_sigmas * sigma:
+                # Off the baseline the same way twice running: the draw has changed
+                state.shifted = True
+                event = ("step", gap / sigma)
+            elif abs(deviation) > self.z_threshold * sigma:
+                event = ("spike", deviation / sigma)
+        elif state.shifted and abs(gap) < self.step_sigmas * sigma / 2:
+            state.shifted = False
+        state.direction = direction
+
+        if event is None:
+            return None
+        kind, score = event
+        return {"device": device, "timestamp": timestamp, "kind": kind, "power": power,
+                "baseline": round(baseline, 3), "score": round(score, 2)}
+
+    def evaluate(self, readings):
+        """
+        Runs (device, timestamp, current, voltage) tuples through `observe` in order,
+        against copies of the baselines. Returns (events, updated baselines); nothing
+        changes until the baselines are passed to `apply`.
+        """
+        events, updated = [], {}
+        with self._lock:
+            for device, timestamp, current, voltage in readings:
+                if device not in updated:
+                    updated[device] = copy.copy(self._baselines.get(device))
+                event = self._observe(updated, device, timestamp, current * voltage)
+                if event is not None:
+                    events.append(event)
+        return events, updated
+
+    def apply(self, updated: dict, events=()):
+        """Keeps baselines from `evaluate` and reports its events."""
+        with self._lock:
+            for device, state in updated.items():
+                current = self._baselines.get(device)
+                # Another batch for the device may have been applied since; the newer one wins
+                if current is None or state.last_seen >= current.last_seen:
+                    self._baselines[device] = state
+        for event in events:
+            ANOMALY_EVENTS.inc(kind=event["kind"])
+            logger.warning("⚡ %s on %s at %s: %.1f W against a baseline of %.1f W (score %.1f)",
+                           event["kind"].capitalize(), event["device"], event["timestamp"],
+                           event["power"], event["baseline"], event["score"], extra={"device": event["device"]})
+
+    def observe_readings(self, readings):
+        """`evaluate` and `apply` in one go. Returns the events."""
+        events, updated = self.evaluate(readings)
+        self.apply(updated, events)
+        return events
+
+    def baselines(self):
+        """Current per-device state, for inspection."""
+        with self._lock:
+            return {device: {"samples": s.samples, "mean": round(s.mean, 3), "std": round(math.sqrt(s.var), 3),
+                             "level": round(s.level, 3), "shifted": s.shifted, "last_seen": s.last_seen}
+                    for device, s in self._baselines.items()}
+
+    def reset(self):
+        with self._lock:
+            self._baselines.clear()
+
+detector = StreamingDetector()
@@ -0,0 +1,201 @@
+import logging
+import threading
+from collections import namedtuple
+from datetime import date, datetime, timedelta
+import numpy as np
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.db import crud
+from app.db.database import WriteSessionLocal, db_url, is_sqlite_file
+from app.services.scheduler import scheduler
+from app.utils.archive import ReadingArchive, month_of, to_datetimes, to_micros
+from app.utils.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+ARCHIVED = registry.counter("energy_archive_readings_total", "Readings moved from the database to the archive.")
+
+EPOCH = datetime(1970, 1, 1)
+UNIT_SECONDS = {"minute": 60, "hour": 3600}
+
+# Same fields, in the same order, as the rows of crud.get_bucketed_series
+SeriesBucket = namedtuple("SeriesBucket", (
+    "bucket", "count", "power_avg", "power_min", "power_max",
+    "current_avg", "current_min", "current_max", "voltage_avg", "voltage_min", "voltage_max"))
+
+_archive = None
+_archive_lock = threading.Lock()
+
+def get_archive() -> ReadingArchive:
+    global _archive
+    with _archive_lock:
+        if _archive is None:
+            _archive = ReadingArchive(settings.ARCHIVE_DIR)
+        return _archive
+
+def archive_cutoff(today: date = None) -> datetime:
+    """Readings before this are cold. Today and yesterday never are, so daily summaries are finalised first."""
+    today = today or date.today()
+    return crud.start_of(today - timedelta(days=max(settings.ARCHIVE_AFTER_DAYS, 1)))
+
+def archive_device(db: Session, device: str, cutoff: datetime) -> int:
+    """
+    Moves one device's readings before `cutoff` into the archive, a day per transaction.
+
+    Each day's rows are deleted with RETURNING and written to the archive before the
+    delete commits, so a reading is never lost: a crash in between leaves it in both
+    places until the next run, which merges it into the archive again and deletes it.
+    """
+    moved = 0
+    oldest = crud.get_oldest_reading_time(db, device, cutoff)
+    while oldest is not None:
+        day = crud.start_of(oldest)
+        end = min(day + timedelta(days=1), cutoff)
+        rows = crud.delete_readings(db, device, day, end)
+        if rows:
+            timestamps = np.array([r[0] for r in rows], dtype="datetime64[us]").astype(np.int64)
+            get_archive().write(device, month_of(day),
+                                timestamps,
+                                np.fromiter((r[1] for r in rows), dtype=np.float64, count=len(rows)),
+                                np.fromiter((r[2] for r in rows), dtype=np.float64, count=len(rows)))
+        db.commit()
+        moved += len(rows)
+        oldest = crud.get_oldest_reading_time(db, device, cutoff)
+    return moved
+
+def archive_cold_readings(today: date = None) -> int:
+    """Archiver job: moves every device's readings older than ARCHIVE_AFTER_DAYS days out of the database."""
+    cutoff = archive_cutoff(today)
+    moved = 0
+    db = WriteSessionLocal()
+    try:
+        for device in sorted(crud.get_last_seen(db)):
+            count = archive_device(db, device, cutoff)
+            ARCHIVED.inc(count)
+            moved += count
+        if moved:
+            logger.info("🗄️ Archived %d readings from before %s.", moved, cutoff.date())
+    except Exception as e:
+        db.rollback()
+        logger.error("❌ Archiving readings failed: %s", e)
+    finally:
+        db.close()
+    return moved
+
+def archive_visible_everywhere(database_url: str = db_url) -> bool:
+    """
+    Whether every host serving this database can read ARCHIVE_DIR. The archiver deletes
+    what it archives, so otherwise those readings vanish from every other host's answers.
+    """
+    return settings.ARCHIVE_SHARED or is_sqlite_file(database_url)
+
+def schedule_archiver() -> bool:
+    if settings.ARCHIVE_AFTER_DAYS <= 0:
+        return False
+    if not archive_visible_everywhere():
+        logger.error("❌ Archiver not started: ARCHIVE_DIR must be storage shared by every host (set ARCHIVE_SHARED) "
+                     "unless the database is a local SQLite file.")
+        return False
+    # After the 00:05 daily summary job, so the day that turns cold is already summarised
+    scheduler.add_job(archive_cold_readings, "cron", hour=1, minute=0, id="archive_readings", replace_existing=True)
+    scheduler.add_job(archive_cold_readings, id="archive_readings_startup", replace_existing=True)
+    return True
+
+def reduce_columns(timestamps, current, voltage, origin: datetime, width_seconds: int):
+    """
+    Groups sorted archive columns into `width_seconds` buckets counted from `origin`.
+    Returns (bucket keys, sample counts, {"power"/"current"/"voltage": (sums, mins, maxes)}).
+    """
+    keys = (timestamps - to_micros(origin)) // (width_seconds * 1_000_000)
+    starts = np.flatnonzero(np.concatenate(([True], keys[1:] != keys[:-1])))
+    counts = np.diff(np.append(starts, len(keys)))
+    current = current.astype(np.float64)
+    voltage = voltage.astype(np.float64)
+    stats = {
+        name: (np.add.reduceat(values, starts), np.minimum.reduceat(values, starts), np.maximum.reduceat(values, starts))
+        for name, values in (("power", current * voltage), ("current", current), ("voltage", voltage))
+    }
+    return keys[starts], counts, stats
+
+# Query layer: the functions below answer like their crud counterparts, with archived readings merged in
+
+def get_raw_series(db: Session, device: str, start: datetime, end: datetime):
+    """crud.get_raw_series including archived readings. A timestamp in both places is returned once."""
+    rows = crud.get_raw_series(db, device, start, end)
+    timestamps, current, voltage = get_archive().query(device, start, end)
+    if not len(timestamps):
+        return rows
+    merged = {row[0]: row for row in zip(to_datetimes(timestamps), current.tolist(), voltage.tolist())}
+    merged.update((row[0], tuple(row)) for row in rows)
+    return [merged[timestamp] for timestamp in sorted(merged)]
+
+def get_bucketed_series(db: Session, device: str, start: datetime, end: datetime, bucket_seconds: int):
+    """crud.get_bucketed_series including archived readings."""
+    rows = crud.get_bucketed_series(db, device, start, end, bucket_seconds)
+    timestamps, current, voltage = get_archive().query(device, start, end)
+    if not len(timestamps):
+        return rows
+
+    keys, counts, stats = reduce_columns(timestamps, current, voltage, start, bucket_seconds)
+    buckets = {row.bucket: SeriesBucket(*row) for row in rows}
+    for i, key in enumerate(keys.tolist()):
+        n = int(counts[i])
+        values = [key, n]
+        for name in ("power", "current", "voltage"):
+            sums, mins, maxes = stats[name]
+            values += [float(sums[i]) / n, float(mins[i]), float(maxes[i])]
+        archived = SeriesBucket(*values)
+        live = buckets.get(key)
+        buckets[key] = archived if live is None else merge_buckets(live, archived)
+    return [buckets[key] for key in sorted(buckets)]
+
+def merge_buckets(a: SeriesBucket, b: SeriesBucket) -> SeriesBucket:
+    n = a.count + b.count
+    values = [a.bucket, n]
+    for name in ("power", "current", "voltage"):
+        avg = (getattr(a, name + "_avg") * a.count + getattr(b, name + "_avg") * b.count) / n
+        values += [avg, min(getattr(a, name + "_min"), getattr(b, name + "_min")), max(getattr(a, name + "_max"), getattr(b, name + "_max"))]
+    return SeriesBucket(*values)
+
+def get_daily_usage(db: Session, day: date):
+    """crud.get_daily_usage including archived readings."""
+    start = crud.start_of(day)
+    end = start + timedelta(days=1)
+    archive = get_archive()
+    totals = {}
+    for device in archive.devices():
+        timestamps, current, voltage = archive.query(device, start, end)
+        if len(timestamps):
+            current = current.astype(np.float64)
+            voltage = voltage.astype(np.float64)
+            totals[device] = (len(timestamps), float(current @ voltage), float(voltage.sum()), float(current.sum()))
+    if not totals:
+        return crud.get_daily_usage(db, day)
+
+    for device, samples, power, voltage, current in db.execute(crud.usage_totals_stmt(start, end)).all():
+        archived = totals.get(device, (0, 0.0, 0.0, 0.0))
+        totals[device] = (archived[0] + samples, archived[1] + power, archived[2] + voltage, archived[3] + current)
+    return crud.usage_stats(
+        (device, power, voltage / samples, current / samples)
+        for device, (samples, power, voltage, current) in sorted(totals.items())
+    )
+
+def add_archived_rollups(db: Session, units=tuple(crud.ROLLUP_TIERS)):
+    """Adds archived readings to the rollup tiers in `units`, after crud.rebuild_rollups rebuilt them from the database. The caller commits."""
+    archive = get_archive()
+    for device in archive.devices():
+        for month in archive.months(device):
+            columns = archive.read(device, month)
+            if not len(columns[0]):
+                continue
+            for unit in units:
+                width = UNIT_SECONDS[unit]
+                keys, counts, stats = reduce_columns(*columns, EPOCH, width)
+                rows = []
+                for i, key in enumerate(keys.tolist()):
+                    row = {"device": device, unit: EPOCH + timedelta(seconds=key * width), "samples": int(counts[i])}
+                    for name in ("power", "current", "voltage"):
+                        sums, mins, maxes = stats[name]
+                        row.update({f"{name}_sum": float(sums[i]), f"{name}_min": float(mins[i]), f"{name}_max": float(maxes[i])})
+                    rows.append(row)
+                crud.upsert_rollups(db, rows, unit)
@@ -1,87 +1,238 @@
 from typing import Dict, List
+import logging
 import os
+import re
+import time
 from groq import Groq
 from sqlalchemy.orm import Session
 from app.config import settings
 from app.db import crud
+from app.db.database import WriteSessionLocal
+from app.utils.metrics import registry
+from app.utils.ttl_cache import TTLCache
 from datetime import datetime, date, timedelta
 
+logger = logging.getLogger(__name__)
+
 # Initialize Groq client
 # Ensure GROQ_API_KEY is set in .env
 client = Groq(api_key=settings.GROQ_API_KEY.strip())
 
+MODEL = "llama-3.1-8b-instant"
+
 # In-memory store for chat sessions
 # Format: {session_id: [{"role": "user", "content": "..."}, ...]}
 chat_sessions: Dict[str, List[Dict]] = {}
 
-from app.services.forecast_service import generate_forecast
+CHAT_TOOL_CALLS = registry.counter(
+    "energy_chat_tool_calls_total", "Chatbot tool calls by tool and outcome.", ("tool", "outcome"))
+CHAT_ANSWER_SECONDS = registry.histogram(
+    "energy_chat_answer_seconds", "Time to answer a chatbot question (LLM round trips and tools), by cache result.", ("cache",))
+CHAT_CACHE_SAVED = registry.counter(
+    "energy_chat_cache_saved_seconds_total", "Answer time saved by cache hits: what each answer took when it was computed.")
+
+# Answers to repeated questions, keyed by the conversation's questions and the data version
+answer_cache = TTLCache(maxsize=max(settings.CHAT_CACHE_SIZE, 1), ttl=settings.CHAT_CACHE_TTL)
+registry.gauge("energy_chat_cache_hit_ratio", "Share of cacheable chatbot questions answered from the cache.").set_function(
+    lambda: answer_cache.hits / max(answer_cache.hits + answer_cache.misses, 1))
+
+from app.services.forecast_service import HOUSE, get_stored_forecast
+from app.services.range_service import get_range_usage
+from app.services.relay_service import get_relay_states
+from app.services import tariff_service
+from app.services.dashboard_service import dashboard_snapshots
 import json
 
-def get_context(db: Session):
-    """Fetches comprehensive context from the database for the chatbot."""
+# Read tools: the model calls these for the data a question needs, instead of every
+# prompt carrying all of it. Each takes the session plus the model's arguments and
+# returns something JSON-serializable.
+
+def get_current_status(db: Session):
+    """Live power per device against its threshold, plus relay states."""
+    thresholds = {d.id: d.threshold for d in crud.get_all_devices(db)}
+    devices = []
+    for r in crud.get_latest_readings(db):
+        power = (r.voltage or 0) * (r.current or 0)
+        threshold = thresholds.get(r.device, crud.DEFAULT_THRESHOLD)
+        devices.append({
+            "device": r.device,
+            "power_w": round(power, 1),
+            "voltage_v": r.voltage,
+            "current_a": r.current,
+            "threshold_w": threshold,
+            "status": "ANOMALY" if power > threshold else "NORMAL",
+            "last_reading": r.timestamp,
+        })
+    return {"as_of": datetime.now().replace(microsecond=0), "devices": devices, "relays": get_relay_states()}
+
+def parse_day(value, default: date) -> date:
+    return date.fromisoformat(value) if value else default
+
+def get_usage(db: Session, start_date: str = None, end_date: str = None, device: str = None):
+    """Energy and cost between two dates (inclusive), per device, and per day for ranges up to a month."""
+    end_day = parse_day(end_date, date.today())
+    start_day = parse_day(start_date, end_day)
+    if start_day > end_day:
+        start_day, end_day = end_day, start_day
+    start_day = max(start_day, end_day - timedelta(days=settings.CHAT_MAX_USAGE_DAYS - 1))
+    usage = get_range_usage(db, crud.start_of(start_day), crud.start_of(end_day + timedelta(days=1)),
+                            granularity="day", device=device, limit=100000)
+
+    by_device, by_day, cost_by_device = {}, {}, {}
+    for b in usage["buckets"]:
+        by_device[b["device"]] = by_device.get(b["device"], 0.0) + b["total_energy"]
+        cost_by_device[b["device"]] = cost_by_device.get(b["device"], 0.0) + b["cost"]
+        day = b["start"].date().isoformat()
+        by_day[day] = by_day.get(day, 0.0) + b["total_energy"]
+    result = {
+        "start_date": start_day,
+        "end_date": end_day,
+        "total_energy_kwh": round(sum(by_device.values()), 3),
+        "cost_ghc": round(sum(cost_by_device.values()), 2),
+        "by_device_kwh": {d: round(kwh, 3) for d, kwh in sorted(by_device.items())},
+        "by_device_cost_ghc": {d: round(cost, 2) for d, cost in sorted(cost_by_device.items())},
+    }
+    if (end_day - start_day).days < 31:
+        result["by_day_kwh"] = {d: round(kwh, 3) for d, kwh in sorted(by_day.items())}
+    return result
+
+def get_anomalies(db: Session, hours: int = 24, device: str = None):
+    """Threshold crossings and detector events (spikes, step changes) in the last N hours."""
+    hours = min(max(int(hours), 1), settings.CHAT_MAX_USAGE_DAYS * 24)
+    crossings = crud.get_recent_anomalies(db, hours=hours)
+    if device:
+        crossings = {d: n for d, n in crossings.items() if d == device}
+    since = datetime.now() - timedelta(hours=hours)
+    events = crud.get_anomaly_events(db, device=device, since=since, limit=20)
+    return {
+        "hours": hours,
+        "threshold_crossings": crossings,
+        "events": [{"device": e.device, "timestamp": e.timestamp, "kind": e.kind,
+                    "power_w": round(e.power, 1), "baseline_w": round(e.baseline, 1)} for e in events],
+    }
+
+def get_forecast(db: Session, days: int = 3):
+    """Predicted energy and cost per day for the next N days."""
+    days = min(max(int(days), 1), 14)
+    forecast = get_stored_forecast(db, HOUSE, days)
+    if forecast is None:
+        return {"message": "No forecast available yet."}
+    per_day = {}
+    for point in forecast["forecast"]:
+        per_day[point["date"][:10]] = per_day.get(point["date"][:10], 0.0) + point["predicted_energy"]
+    hourly = [(datetime.strptime(point["date"], "%Y-%m-%d %H:%M"), point["predicted_energy"]) for point in forecast["forecast"]]
+    return {
+        "predicted_kwh_by_day": {d: round(kwh, 3) for d, kwh in per_day.items()},
+        "predicted_total_kwh": round(sum(per_day.values()), 3),
+        "predicted_cost_ghc": round(tariff_service.estimate_cost(db, hourly), 2),
+        "outlook": forecast["outlook"],
+        "tip": forecast["tip"],
+    }
+
+def set_device_threshold(db: Session, device_id: str, threshold: float):
+    # Questions are answered on a read session; the change goes through the writer
+    write_db = WriteSessionLocal()
     try:
-        print("DEBUG: Fetching chatbot context...")
-        # 1. Real-time Status
-        latest = crud.get_latest_readings(db)
-        devices = crud.get_all_devices(db)
-        device_map = {d.id: d.threshold for d in devices}
-        print(f"DEBUG: Found {len(latest)} latest readings and {len(devices)} devices")
-        
-        # 2. Daily Summary (Today & Yesterday)
-        today = date.today()
-        yesterday = today - timedelta(days=1)
-        today_stats = crud.get_daily_usage(db, today)
-        yesterday_stats = crud.get_daily_usage(db, yesterday)
-        print(f"DEBUG: Usage stats fetched for today and yesterday")
-        
-        # 3. Recent Anomalies (Last 24 hours)
-        anomaly_summary = crud.get_recent_anomalies(db, hours=24)
-        print(f"DEBUG: Anomaly summary count: {len(anomaly_summary)}")
-        
-        # 4. Forecasts (Next 3 days)
-        print("DEBUG: Generating forecast...")
-        forecast_data = generate_forecast(db, days=3)
-        if isinstance(forecast_data, list):
-            # Summarize forecast for the LLM
-            forecast_summary = sum(item['predicted_energy'] for item in forecast_data)
-            print(f"DEBUG: Forecast total: {forecast_summary}")
-        else:
-            forecast_summary = "No forecast available."
-            print(f"DEBUG: Forecast not available: {forecast_data}")
-
-        context = f"CURRENT STATUS (as of {datetime.now()}):\n"
-        for r in latest:
-            power = (r.voltage or 0) * (r.current or 0)
-            threshold = device_map.get(r.device, 2500.0)
-            status = "ANOMALY" if power > threshold else "NORMAL"
-            context += f"- {r.device}: {round(power, 1)}W ({status}, Limit: {threshold}W)\n"
-            
-        context += f"\nDAILY TOTALS:\n"
-        context += f"- Today ({today}): {sum(d['total_energy'] for d in today_stats):.3f} kWh\n"
-        context += f"- Yesterday ({yesterday}): {sum(d['total_energy'] for d in yesterday_stats):.3f} kWh\n"
-        
-        if anomaly_summary:
-            context += f"\nRECENT ANOMALIES (Last 24h):\n"
-            for dev, count in anomaly_summary.items():
-                context += f"- {dev}: {count} detections\n"
-        else:
-            context += "\nNO ANOMALIES in the last 24 hours.\n"
-            
-        context += f"\nFORECAST (Next 3 days):\n"
-        context += f"- Predicted Total: {forecast_summary if isinstance(forecast_summary, str) else f'{forecast_summary:.3f} kWh'}\n"
-        
-        context += "\nCURRENCY NOTE: All financial figures are in Ghana Cedis (GHC). Rate: 2.20 GHC/kWh.\n"
-        
-        return context
-    except Exception as e:
-        print(f"CRITICAL: Context generation failed: {e}")
-        import traceback
-        print(traceback.format_exc())
-        return "Energy context is currently unavailable."
+        result = crud.create_or_update_device(write_db, device_id=device_id, threshold=float(threshold))
+        dashboard_snapshots.notify()
+        return f"Successfully updated {result.id} threshold to {result.threshold}W."
+    finally:
+        write_db.close()
+
+# Tools that change state: an answer that used one is never cached
+SIDE_EFFECT_TOOLS = {"set_device_threshold"}
 
+TOOL_FUNCTIONS = {
+    "get_current_status": get_current_status,
+    "get_usage": get_usage,
+    "get_anomalies": get_anomalies,
+    "get_forecast": get_forecast,
+    "set_device_threshold": set_device_threshold,
+}
+
+def normalize_question(question: str) -> str:
+    """Lowercase words only, so "How much did I use today?" and "how much did i use today" match."""
+    return " ".join(re.findall(r"\w+(?:[.']\w+)*", question.lower()))
+
+def cache_key(session: List[Dict], db: Session):
+    """
+    The questions asked so far in the conversation (an answer depends on what came
+    before it) with today's date, the data version and the relay states. New readings,
+    a threshold change or a relay switching make a new key, so a cached answer never
+    outlives the data it was built from.
+    """
+    questions = tuple(normalize_question(m["content"]) for m in session if m["role"] == "user")
+    relays = get_relay_states()  # the relay cache, so at most one Firebase read per RELAY_CACHE_TTL
+    return questions, date.today(), crud.get_data_version(db), tuple(sorted(relays.items())) if relays else None
+
+def run_tool(name: str, arguments: str, db: Session) -> str:
+    """Runs a tool call from the model. Errors go back to the model as text rather than failing the answer."""
+    function = TOOL_FUNCTIONS.get(name)
+    if function is None:
+        CHAT_TOOL_CALLS.inc(tool="unknown", outcome="error")
+        return "Error: Unknown tool."
+    try:
+        result = function(db, **json.loads(arguments or "{}"))
+    except Exception as e:
+        logger.warning("⚠️ Chat tool %s failed: %s", name, e)
+        db.rollback()
+        CHAT_TOOL_CALLS.inc(tool=name, outcome="error")
+        return f"Error: {e}"
+    CHAT_TOOL_CALLS.inc(tool=name, outcome="ok")
+    return result if isinstance(result, str) else json.dumps(result, default=str)
 
 # Tool definition for Groq
 tools = [
+    {
+        "type": "function",
+        "function": {
+            "name": "get_current_status",
+            "description": "Live power draw, voltage and current of every device, whether it is over its threshold, and relay (on/off) states.",
+            "parameters": {"type": "object", "properties": {}}
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "get_usage",
+            "description": "Energy used (kWh) and its cost (GHC) between two dates, in total, per device and per day. Defaults to today.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "start_date": {"type": "string", "description": "First day, YYYY-MM-DD"},
+                    "end_date": {"type": "string", "description": "Last day (inclusive), YYYY-MM-DD"},
+                    "device": {"type": "string", "description": "Only this device"}
+                }
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "get_anomalies",
+            "description": "Readings over a device's threshold, plus sudden spikes and step changes in power draw, over the last N hours.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "hours": {"type": "integer", "description": "How far back to look (default 24)"},
+                    "device": {"type": "string", "description": "Only this device"}
+                }
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "get_forecast",
+            "description": "Predicted energy use and cost for the next N days, with an outlook and a saving tip.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "days": {"type": "integer", "description": "Days ahead, 1-14 (default 3)"}
+                }
+            }
+        }
+    },
     {
         "type": "function",
         "function": {
@@ -106,88 +257,89 @@ tools = [
 ]
 
 def ask_chatbot(question: str, session_id: str, db: Session):
-    """Queries the Groq LLaMA-3 model with context, history, and tools."""
-    
+    """Queries the Groq LLaMA-3 model with history and tools; the model fetches the data it needs through the tools."""
+
     if not settings.GROQ_API_KEY:
         return "I'm sorry, but the Groq API key is not configured."
 
-    context = get_context(db)
-    
+    device_ids = ", ".join(d.id for d in crud.get_all_devices(db))
+    tariff = tariff_service.describe(tariff_service.get_active_tariff(db))
+
     system_prompt = f"""You are "Energy Boss", a smart, witty, and slightly authoritative energy meter assistant.
     Your goal is to help users understand their energy consumption and save money.
-    
-    ENVIRONMENT CONTEXT:
-    {context}
-    
+
+    It is now {datetime.now():%A %Y-%m-%d %H:%M}. Devices: {device_ids}.
+
     Guidelines:
     1. **Personality**: Be confident, helpful, and a bit playful. Use emojis occasionally ⚡💡.
-    2. **Data Usage**: Use the ENVIRONMENT CONTEXT to answer questions. If asked about status, trends, or costs, refer to this data.
+    2. **Data Usage**: Never guess figures. Call `get_current_status` for live power and relays, `get_usage` for consumption and cost over dates, `get_anomalies` for unusual activity and `get_forecast` for predictions. Only fetch what the question needs.
     3. **Actionable**: If a user asks to CHANGE a limit or threshold, use the `set_device_threshold` tool.
-    4. **Educational**: If asked about physics (V, I, P) or ML, provide clear, student-friendly explanations.
-    5. **Currency**: Always use Ghana Cedis (GHC).
-    
-    Answer the user's question concisely based on the data provided.
+    4. **Educational**: If asked about physics (V, I, P) or ML, provide clear, student-friendly explanations without calling tools.
+    5. **Currency**: Always use Ghana Cedis (GHC). Tariff: {tariff}. Costs from the tools already apply it.
+
+    Answer the user's question concisely.
     """
-    
+
     if session_id not in chat_sessions:
         chat_sessions[session_id] = []
-    
+
     chat_sessions[session_id].append({"role": "user", "content": question})
-    
+
+    started = time.perf_counter()
+    key = cache_key(chat_sessions[session_id], db) if settings.CHAT_CACHE_SIZE > 0 else None
+    cached = answer_cache.get(key) if key is not None else None
+    if cached is not None:
+        answer, seconds = cached
+        CHAT_CACHE_SAVED.inc(seconds)
+        CHAT_ANSWER_SECONDS.observe(time.perf_counter() - started, cache="hit")
+        chat_sessions[session_id].append({"role": "assistant", "content": answer})
+        return answer
+
     messages = [{"role": "system", "content": system_prompt}] + chat_sessions[session_id]
-    
+
     try:
-        response = client.chat.completions.create(
-            messages=messages,
-            model="llama-3.1-8b-instant",
-            tools=tools,
-            tool_choice="auto"
-        )
-        
-        response_message = response.choices[0].message
-        
-        # Handle Tool Calls
-        if response_message.tool_calls:
+        answer = None
+        side_effects = False
+        for _ in range(settings.CHAT_MAX_TOOL_ROUNDS):
+            response = client.chat.completions.create(
+                messages=messages,
+                model=MODEL,
+                tools=tools,
+                tool_choice="auto"
+            )
+            response_message = response.choices[0].message
+            if not response_message.tool_calls:
+                answer = response_message.content
+                break
+
+            # Handle Tool Calls, then let the model continue (it may ask for more)
             messages.append(response_message)
-            
             for tool_call in response_message.tool_calls:
                 function_name = tool_call.function.name
-                function_args = json.loads(tool_call.function.arguments)
-                print(f"DEBUG: Tool Call: {function_name} with args {function_args}")
-                
-                if function_name == "set_device_threshold":
-                    result = crud.create_or_update_device(
-                        db, 
-                        device_id=function_args.get("device_id"),
-                        threshold=float(function_args.get("threshold"))
-                    )
-                    tool_response = f"Successfully updated {result.id} threshold to {result.threshold}W."
-                else:
-                    tool_response = "Error: Unknown tool."
-                    
+                side_effects = side_effects or function_name in SIDE_EFFECT_TOOLS
+                logger.debug("Tool Call: %s with args %s", function_name, tool_call.function.arguments)
                 messages.append({
                     "tool_call_id": tool_call.id,
                     "role": "tool",
                     "name": function_name,
-                    "content": tool_response,
+                    "content": run_tool(function_name, tool_call.function.arguments, db),
                 })
-            
-            # Get final response from LLM after tool execution
-            second_response = client.chat.completions.create(
+
+        if answer is None:
+            # Out of tool rounds: answer with what has been fetched
+            final_response = client.chat.completions.create(
                 messages=messages,
-                model="llama-3.1-8b-instant"
+                model=MODEL
             )
-            answer = second_response.choices[0].message.content
-        else:
-            answer = response_message.content
-            
+            answer = final_response.choices[0].message.content
+
+        seconds = time.perf_counter() - started
+        if key is not None and not side_effects and answer:
+            answer_cache.set(key, (answer, seconds))
+        CHAT_ANSWER_SECONDS.observe(seconds, cache="bypass" if key is None or side_effects else "miss")
         chat_sessions[session_id].append({"role": "assistant", "content": answer})
         return answer
-        
+
     except Exception as e:
-        import traceback
-        error_detail = traceback.format_exc()
-        print(f"CRITICAL: Chatbot error: {e}")
-        print(f"FULL TRACEBACK:\n{error_detail}")
+        logger.exception("Chatbot error: %s", e)
         return "I'm sorry, I'm having trouble connecting to my brain right now. 🤯"
-
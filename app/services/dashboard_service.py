@@ -0,0 +1,110 @@
+import asyncio
+import threading
+import time
+from datetime import date
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.db import crud
+from app.db.crud import DEFAULT_THRESHOLD
+from app.schemas.device import Device
+from app.schemas.reading import Reading
+from app.services import summary_service
+from app.services.relay_service import get_relay_states
+from app.utils.fast_json import dumps
+from app.utils.http_cache import etag_for
+
+def build_snapshot(db: Session) -> dict:
+    """Everything the dashboard shows: latest readings, devices, relays, today's summary and active anomalies."""
+    today = date.today()
+    readings = [Reading.model_validate(r).model_dump() for r in crud.get_latest_readings(db)]
+    devices = [Device.model_validate(d).model_dump() for d in crud.get_all_devices(db)]
+    thresholds = {d["id"]: d["threshold"] for d in devices}
+
+    anomalies = []
+    for r in readings:
+        power = r["current"] * r["voltage"]
+        threshold = thresholds.get(r["device"], DEFAULT_THRESHOLD)
+        if power > threshold:
+            anomalies.append({"device": r["device"], "power": round(power, 2), "threshold": threshold})
+
+    device_stats = summary_service.get_day_usage(db, today)
+    return {
+        "readings": readings,
+        "devices": devices,
+        "relays": get_relay_states(),
+        "daily_summary": {
+            "date": today.isoformat(),
+            "total_energy": round(sum(d["total_energy"] for d in device_stats), 6),
+            "power_trend": crud.get_power_trend(db),
+            "device_breakdown": device_stats,
+        },
+        "anomalies": anomalies,
+    }
+
+def _wake(future: asyncio.Future):
+    if not future.done():
+        future.set_result(None)
+
+class DashboardSnapshots:
+    """
+    The dashboard snapshot, rebuilt when something changes and shared by every client.
+
+    Ingest, threshold updates and relay writes call `notify`, which marks the snapshot
+    stale and wakes long-polls waiting in `wait`. Changes made by other processes are
+    picked up when a snapshot older than `refresh_seconds` is requested. `version` goes
+    up whenever a rebuild finds different content; the ETag is a hash of the content,
+    so it is the same in every worker.
+    """
+
+    def __init__(self, builder=build_snapshot, refresh_seconds: float = None):
+        self.builder = builder
+        self.refresh_seconds = refresh_seconds or settings.DASHBOARD_REFRESH_SECONDS
+        self.version = 0
+        self._snapshot = None
+        self._etag = None
+        self._built_at = 0.0
+        self._dirty = True
+        self._waiters = []
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+
+    def notify(self):
+        """Marks the snapshot stale and wakes long-polls. Safe to call from any thread."""
+        with self._lock:
+            self._dirty = True
+            waiters, self._waiters = self._waiters, []
+        for loop, future in waiters:
+            loop.call_soon_threadsafe(_wake, future)
+
+    def get(self, db: Session):
+        """Returns (snapshot, etag), rebuilding it first if it is stale."""
+        with self._build_lock:
+            if self._dirty or time.monotonic() - self._built_at >= self.refresh_seconds:
+                with self._lock:
+                    # Cleared before building, so a notify during the build is not lost
+                    self._dirty = False
+                content = jsonable_encoder(self.builder(db))
+                etag = etag_for(dumps(content))
+                if etag != self._etag:
+                    self.version += 1
+                    self._snapshot, self._etag = {"version": self.version, **content}, etag
+                self._built_at = time.monotonic()
+            return self._snapshot, self._etag
+
+    async def wait(self, timeout: float):
+        """Waits until the next `notify` or for `timeout` seconds, whichever comes first."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        with self._lock:
+            if self._dirty:
+                return
+            self._waiters.append((loop, future))
+        try:
+            await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            with self._lock:
+                if (loop, future) in self._waiters:
+                    self._waiters.remove((loop, future))
+
+dashboard_snapshots = DashboardSnapshots()
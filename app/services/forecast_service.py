@@ -1,43 +1,49 @@
-from sqlalchemy import func
-from datetime import datetime, timedelta
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timedelta
+import logging
+import multiprocessing
+import os
+import time
 import pandas as pd
 from prophet import Prophet
 from sqlalchemy.orm import Session
-from app.db.models import Reading
+from app.config import settings
+from app.db import crud
+from app.db.database import WriteSessionLocal
+from app.services import tariff_service
+from app.services.scheduler import scheduler
+from app.utils.metrics import registry
 
-def generate_forecast(db: Session, days: int = 7):
-    """Generates energy usage forecast for the next N days using hourly aggregation."""
-    
-    # Efficiently aggregate energy by hour in SQL
-    # Power (W) = V * I. Energy (Wh) = W * (hours). 
-    # Since readings are roughly every 10s (1/360 hours), weight is 1/360.
-    # To get kWh, divide by 1000. Total factor: 1/360000.
-    
-    # Handle different database dialects for hourly grouping
-    if db.bind.dialect.name == 'postgresql':
-        group_col = func.to_char(Reading.timestamp, 'YYYY-MM-DD"T"HH24:00:00')
-    else:  # Default to SQLite
-        group_col = func.strftime('%Y-%m-%dT%H:00:00', Reading.timestamp)
-
-    hourly_readings = db.query(
-        group_col.label('hour'),
-        func.sum(Reading.voltage * Reading.current * 10 / 3600000).label('energy_kwh')
-    ).group_by('hour').all()
-    
-    if not hourly_readings or len(hourly_readings) < 5:
-        return {"message": "Not enough data points for reliable forecast"}
+logger = logging.getLogger(__name__)
+
+FORECAST_SECONDS = registry.histogram(
+    "energy_forecast_stage_seconds", "Forecast generation time per stage.", ("stage",),
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0))
+
+HOUSE = "*"  # Forecast key for all devices together
+MIN_HISTORY_HOURS = 5
+NO_FORECAST = {"forecast": [], "outlook": "Not enough data for outlook.", "tip": "Keep the system running!"}
 
-    data = [{"ds": r.hour, "y": r.energy_kwh} for r in hourly_readings]
-    df = pd.DataFrame(data)
+def fit_forecast(history, days: int = 7, rates=None):
+    """
+    Fits Prophet to (hour, kWh) pairs and predicts the next `days` days hourly, with an
+    outlook and a tip. `rates` are tomorrow's GHC/kWh by hour of day, for the tip (default:
+    the flat ENERGY_RATE_GHC_PER_KWH). Pure computation, so it can run in a worker process.
+    """
+    started = time.perf_counter()
+    df = pd.DataFrame(history, columns=["ds", "y"])
     df['ds'] = pd.to_datetime(df['ds'])
 
     m = Prophet(interval_width=0.95, yearly_seasonality=False, weekly_seasonality=True, daily_seasonality=True)
     m.fit(df)
+    fitted = time.perf_counter()
+    FORECAST_SECONDS.observe(fitted - started, stage="fit")
     
-    future = m.make_future_dataframe(periods=days * 24, freq='H')
+    future = m.make_future_dataframe(periods=days * 24, freq='h')
     forecast = m.predict(future)
     
     result = forecast[['ds', 'yhat']].tail(days * 24)
+    FORECAST_SECONDS.observe(time.perf_counter() - fitted, stage="predict")
     
     forecast_data = []
     for _, row in result.iterrows():
@@ -71,8 +77,13 @@ def generate_forecast(db: Session, days: int = 7):
         peak_reading = max(tomorrow_data, key=lambda x: x['predicted_energy'])
         peak_hour = datetime.strptime(peak_reading['date'], '%Y-%m-%d %H:%M').strftime('%I:%M %p')
         
+        rates = rates or [settings.ENERGY_RATE_GHC_PER_KWH] * 24
+        peak_rate = rates[datetime.strptime(peak_reading['date'], '%Y-%m-%d %H:%M').hour]
         if peak_reading['predicted_energy'] > 0.5: # Only warn if significant
-            tip = f"Heads up: Your peak usage tomorrow is predicted at {peak_hour}. Shifting heavy tasks away from this time can save you ~GHC {(peak_reading['predicted_energy'] * 0.3 * 2.2).toFixed(2) if hasattr(peak_reading['predicted_energy'], 'toFixed') else round(peak_reading['predicted_energy'] * 0.3 * 2.2, 2)}."
+            tip = f"Heads up: Your peak usage tomorrow is predicted at {peak_hour}. Shifting heavy tasks away from this time can save you ~GHC {round(peak_reading['predicted_energy'] * 0.3 * peak_rate, 2)}."
+            if peak_rate > min(rates):
+                # Time-of-use: moving load to the cheapest hours saves the rate difference
+                tip = f"Heads up: Your peak usage tomorrow is predicted at {peak_hour}, when power costs GHC {peak_rate:.2f}/kWh. Moving heavy tasks to off-peak hours (GHC {min(rates):.2f}/kWh) can save you ~GHC {round(peak_reading['predicted_energy'] * 0.3 * (peak_rate - min(rates)), 2)}."
 
     return {
         "forecast": forecast_data,
@@ -80,3 +91,129 @@ def generate_forecast(db: Session, days: int = 7):
         "tip": tip
     }
 
+# Precomputed forecasts: a scheduled job fits every series whose data has changed,
+# spread over worker processes, and the API serves the stored results.
+
+def fit_job(job):
+    """Worker process entry point: (key, history, through, rates) -> (key, through, forecast)."""
+    key, history, through, rates = job
+    return key, through, fit_forecast(history, settings.FORECAST_HORIZON_DAYS, rates)
+
+def due_forecasts(db: Session, force: bool = False):
+    """
+    (key, through) for every device with a complete hour of readings its stored forecast
+    hasn't seen, plus the house total if any device is due. `through` is the end of the
+    last complete hour with data: the hour after the device's last reading, or the
+    current hour while it is still reporting.
+    """
+    current_hour = tariff_service.current_hour()
+    last_seen = crud.get_last_seen(db)
+    fitted = crud.get_forecast_watermarks(db)
+    due = []
+    for key, seen in last_seen.items():
+        through = min(crud.time_floor_value(seen, "hour") + timedelta(hours=1), current_hour)
+        if force or fitted.get(key) is None or through > fitted[key]:
+            due.append((key, through))
+    if last_seen and (due or fitted.get(HOUSE) is None):
+        # The house total changes whenever any device's data does
+        due.append((HOUSE, min(crud.time_floor_value(max(last_seen.values()), "hour") + timedelta(hours=1), current_hour)))
+    return due
+
+def pool_context():
+    """
+    forkserver with this module preloaded: workers are forked from a clean single-threaded
+    server (forking the app, with its MQTT, scheduler and server threads, isn't safe) and
+    don't re-import Prophet and pandas every run. Falls back to spawn where unavailable.
+    """
+    if "forkserver" not in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("spawn")
+    context = multiprocessing.get_context("forkserver")
+    context.set_forkserver_preload([__name__])
+    return context
+
+def run_fits(jobs, workers: int):
+    """Runs fit_job over `jobs`, in a process pool when there is more than one worker. Yields results; failed fits are logged and skipped."""
+    if workers <= 1:
+        for job in jobs:
+            try:
+                yield fit_job(job)
+            except Exception as e:
+                logger.error("❌ Forecast for %s failed: %s", job[0], e)
+        return
+    with ProcessPoolExecutor(max_workers=workers, mp_context=pool_context()) as pool:
+        futures = {pool.submit(fit_job, job): job[0] for job in jobs}
+        for future, key in futures.items():
+            try:
+                yield future.result()
+            except Exception as e:
+                logger.error("❌ Forecast for %s failed: %s", key, e)
+
+def refresh_forecasts(force: bool = False, workers: int = None):
+    """Forecast job: refits every device (and the house total) with new data and stores the results. Returns the keys refit."""
+    started = time.perf_counter()
+    db = WriteSessionLocal()
+    try:
+        jobs, short = [], []
+        due = due_forecasts(db, force)
+        rates = tariff_service.rates_by_hour(db, date.today() + timedelta(days=1)) if due else None
+        for key, through in due:
+            history = crud.get_hourly_energy(db, None if key == HOUSE else key, end=through)
+            if len(history) >= MIN_HISTORY_HOURS:
+                jobs.append((key, history, through, rates))
+            else:
+                short.append((key, through, NO_FORECAST))
+    finally:
+        db.close()  # not held while fitting
+    if not jobs and not short:
+        return []
+
+    workers = max(min(workers or settings.FORECAST_WORKERS or os.cpu_count() or 1, len(jobs)), 1)
+    generated_at = datetime.utcnow()
+    # Too little history is stored too, so the watermark moves and it isn't retried until new data arrives
+    rows = [{
+        "device": key,
+        "generated_at": generated_at,
+        "data_through": through,
+        "points": forecast["forecast"],
+        "outlook": forecast["outlook"],
+        "tip": forecast["tip"],
+    } for key, through, forecast in [*run_fits(jobs, workers), *short]]
+
+    db = WriteSessionLocal()
+    try:
+        crud.save_forecasts(db, rows)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.error("❌ Storing forecasts failed: %s", e)
+        return []
+    finally:
+        db.close()
+    elapsed = time.perf_counter() - started
+    FORECAST_SECONDS.observe(elapsed, stage="refresh")
+    logger.info("🔮 Refit %d forecast(s) on %d worker(s) in %.1fs.", len(jobs), workers, elapsed)
+    return [row["device"] for row in rows]
+
+def get_stored_forecast(db: Session, device: str = HOUSE, days: int = 7):
+    """
+    The stored forecast for a device (or the house) from the current hour on, cut to
+    `days`. None if there isn't one yet. A device that stopped reporting keeps the
+    forecast fitted on its last data, whose first hours are in the past by now.
+    """
+    record = crud.get_forecast_record(db, device)
+    if record is None:
+        return None
+    current_hour = tariff_service.current_hour().strftime("%Y-%m-%d %H:%M")
+    points = [p for p in record.points if p["date"] >= current_hour]
+    return {
+        "forecast": points[:days * 24],
+        "outlook": record.outlook,
+        "tip": record.tip,
+        "generated_at": record.generated_at,
+        "data_through": record.data_through,
+    }
+
+def schedule_forecasts():
+    scheduler.add_job(refresh_forecasts, "interval", minutes=settings.FORECAST_REFRESH_MINUTES,
+                      id="refresh_forecasts", replace_existing=True)
+    scheduler.add_job(refresh_forecasts, id="refresh_forecasts_startup", replace_existing=True)
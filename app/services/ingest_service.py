@@ -0,0 +1,384 @@
+import json
+import logging
+import queue
+import threading
+import time
+from datetime import date, datetime
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.db import crud
+from app.db.database import SessionLocal, WriteSessionLocal, on_commit
+from app.db.models import Reading
+from app.services.anomaly_service import detector
+from app.services.dashboard_service import dashboard_snapshots
+from app.services.protection_service import check_and_trigger_cutoff, check_batch_and_trigger_cutoff
+from app.services.registry_service import summarize_devices
+from app.services.rollup_service import upsert_all_rollups
+from app.services.spool_service import SpoolReplayer, is_transient, spool_payloads
+from app.utils.batch_decoder import columns_from_object, validate_columns
+from app.utils.logging_config import LogSampler
+from app.utils.metrics import LatencyStats, registry
+
+logger = logging.getLogger(__name__)
+saved_log = LogSampler(logger)
+
+_STOP = object()
+
+INGEST_STAGE_SECONDS = registry.histogram(
+    "energy_ingest_stage_seconds", "Ingest latency per pipeline stage.", ("stage",))
+INGEST_DUPLICATES = registry.counter(
+    "energy_ingest_duplicates_total", "Readings ignored because their (device, timestamp) was already stored.")
+
+def store_readings(db: Session, payloads: list):
+    """
+    Inserts reading payloads and updates what is derived from them (rollups, device
+    registry, stale daily summaries, anomaly events) in the caller's transaction. Readings whose
+    (device, timestamp) is already stored are skipped. Returns the inserted
+    (id, device, timestamp, current, voltage) tuples. The caller commits.
+    """
+    rows = [{
+        "device": p["device"],
+        "timestamp": p["timestamp"] if isinstance(p["timestamp"], datetime) else datetime.fromisoformat(p["timestamp"]),
+        "current": p["current"],
+        "voltage": p["voltage"],
+    } for p in payloads]
+    inserted = crud.insert_readings(db, rows)
+    if len(inserted) < len(rows):
+        INGEST_DUPLICATES.inc(len(rows) - len(inserted))
+    if not inserted:
+        return inserted
+
+    upsert_all_rollups(db, [(device, ts, current, voltage) for _, device, ts, current, voltage in inserted])
+    crud.register_devices(db, summarize_devices([(device, ts) for _, device, ts, _, _ in inserted]))
+    events, baselines = detector.evaluate(
+        sorted(((device, ts, current, voltage) for _, device, ts, current, voltage in inserted), key=lambda r: r[1]))
+    crud.insert_anomaly_events(db, events)
+    # Baselines only move once the readings are in: a rolled-back batch may be replayed later
+    on_commit(db, lambda: detector.apply(baselines, events))
+    today = date.today()
+    late_days = {ts.date() for _, _, ts, _, _ in inserted if ts.date() < today}
+    if late_days:
+        # Late readings for finished days: their stored summaries are stale now
+        crud.invalidate_daily_summaries(db, late_days)
+    return inserted
+
+def write_batch(payloads: list):
+    """Stores a batch of readings in one transaction (used by the spool replayer). Raises on failure."""
+    db = WriteSessionLocal()
+    try:
+        inserted = store_readings(db, payloads)
+        db.commit()
+        if inserted:
+            dashboard_snapshots.notify()
+        return inserted
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+def save_reading(payload: dict, db: Session):
+    """
+    Saves a reading to the database, with the rollups, registry and summary invalidation
+    that go with it. A reading whose (device, timestamp) is already stored (e.g. a QoS
+    redelivery) is ignored and returns None. If the database is unavailable (see
+    is_transient), the reading is kept in the on-disk spool and replayed once it is back.
+    """
+    try:
+        inserted = store_readings(db, [payload])
+        db.commit()
+    except SQLAlchemyError as e:
+        db.rollback()
+        if not is_transient(e):
+            logger.error("Error saving reading: %s", e, extra={"device": payload.get("device")})
+            return None
+        logger.error("Error saving reading, spooling it: %s", e, extra={"device": payload.get("device")})
+        spool_payloads([payload], reason="db_error")
+        return None
+    except Exception as e:
+        db.rollback()
+        logger.error("Error saving reading: %s", e, extra={"device": payload.get("device")})
+        return None
+
+    if not inserted:
+        logger.debug("Duplicate reading for %s at %s ignored", payload["device"], payload["timestamp"])
+        return None
+    dashboard_snapshots.notify()
+    reading = Reading(**dict(zip(("id", "device", "timestamp", "current", "voltage"), inserted[0])))
+    saved_log.info("Saved reading for %s at %s", reading.device, reading.timestamp, device=reading.device)
+    return reading
+
+def protect(readings):
+    """
+    Runs protection on committed readings. It reads thresholds through a session of its
+    own on the shared engine, so the Firebase calls it may make never hold the writer
+    connection (see WriterPool).
+    """
+    db = SessionLocal()
+    try:
+        if len(readings) == 1:
+            check_and_trigger_cutoff(readings[0], db)
+        else:
+            check_batch_and_trigger_cutoff(readings, db)
+    finally:
+        db.close()
+
+def ingest_batch(db: Session, columns: dict, observe=None):
+    """
+    Validates a decoded batch (see batch_decoder), stores the valid rows in one
+    transaction on `db` (a writer session) and, once that is committed, runs protection
+    once per device.
+
+    Returns counts plus a per-row `status` list parallel to the input ("inserted",
+    "duplicate", "invalid", "spooled" or "dropped") and `errors` for invalid rows by
+    index. If the database is unavailable (see is_transient), the valid rows go to the
+    spool and are replayed later; other database errors drop them.
+    """
+    n = len(columns["device"])
+    rows, errors = validate_columns(columns)
+    status = ["invalid"] * n
+
+    start = time.perf_counter()
+    try:
+        inserted = store_readings(db, rows)
+        db.commit()
+        new = {(device, ts) for _, device, ts, _, _ in inserted}
+        for row in rows:
+            key = (row["device"], row["timestamp"])
+            status[row["index"]] = "inserted" if key in new else "duplicate"
+            new.discard(key)  # a repeat within the same batch is a duplicate too
+    except SQLAlchemyError as e:
+        db.rollback()
+        spooled = False
+        if is_transient(e):
+            logger.error("Error saving batch of %d readings, spooling it: %s", len(rows), e)
+            payloads = [{**{k: r[k] for k in ("device", "current", "voltage")}, "timestamp": r["timestamp"].isoformat()} for r in rows]
+            spooled = spool_payloads(payloads, reason="db_error") if payloads else True
+        else:
+            logger.error("Error saving batch of %d readings: %s", len(rows), e)
+        for row in rows:
+            status[row["index"]] = "spooled" if spooled else "dropped"
+        inserted = []
+    saved = time.perf_counter()
+
+    if inserted:
+        dashboard_snapshots.notify()
+        protect([r for r in rows if status[r["index"]] == "inserted"])
+    if observe:
+        observe("save", saved - start)
+        observe("protect", time.perf_counter() - saved)
+
+    counts = {state: status.count(state) for state in ("inserted", "duplicate", "invalid", "spooled", "dropped")}
+    return {"received": n, **counts, "status": status, "errors": errors}
+
+def process_batch(payloads: list, observe):
+    """Worker handler for array payloads from MQTT: one transaction per batch."""
+    db = WriteSessionLocal()
+    try:
+        result = ingest_batch(db, columns_from_object(payloads), observe)
+        if result["invalid"]:
+            logger.warning("⚠️ %d invalid reading(s) in MQTT batch: %s", result["invalid"], list(result["errors"].values())[:3])
+    finally:
+        db.close()
+
+def process_payload(payload: dict, observe):
+    """Default worker handler: persist the reading, then run protection logic on it."""
+    start = time.perf_counter()
+    db = WriteSessionLocal()
+    try:
+        save_reading(payload, db)
+    finally:
+        db.close()  # the writer is free again before protection talks to Firebase
+    saved = time.perf_counter()
+    observe("save", saved - start)
+
+    protect([payload])
+    observe("protect", time.perf_counter() - saved)
+
+class IngestPipeline:
+    """
+    Moves reading ingest off paho's network thread.
+
+    `submit` only timestamps the raw payload and puts it on a bounded intake queue, so
+    the MQTT callback returns immediately. A dispatcher thread decodes each payload and
+    routes it to one of `workers` shard queues by device, which keeps readings for the
+    same device in arrival order while different devices are processed in parallel.
+    """
+
+    STAGES = ("queue_wait", "parse", "save", "protect", "total")
+
+    def __init__(self, workers: int = None, queue_size: int = None, handler=None, overflow=None, batch_handler=None):
+        self.workers = max(1, workers or settings.INGEST_WORKERS)
+        self.queue_size = queue_size or settings.INGEST_QUEUE_SIZE
+        self.handler = handler or process_payload
+        # Array payloads (gateways batching samples) reach the workers as per-shard lists
+        self.batch_handler = batch_handler or process_batch
+        # Called with a raw payload the full intake queue can't take; returns True if it kept it
+        self.overflow = overflow
+        self.latency = {stage: LatencyStats() for stage in self.STAGES}
+        self.received = 0
+        self.processed = 0
+        self.spooled = 0
+        self.dropped = 0
+        self.errors = 0
+        self._intake = None
+        self._shards = []
+        self._threads = []
+        self._lock = threading.Lock()
+
+    @property
+    def running(self):
+        return bool(self._threads)
+
+    def start(self):
+        if self.running:
+            return
+        self._intake = queue.Queue(maxsize=self.queue_size)
+        self._shards = [queue.Queue(maxsize=self.queue_size) for _ in range(self.workers)]
+        self._threads = [threading.Thread(target=self._dispatch, name="ingest-dispatcher", daemon=True)]
+        for i, shard in enumerate(self._shards):
+            self._threads.append(threading.Thread(target=self._work, args=(shard,), name=f"ingest-worker-{i}", daemon=True))
+        for t in self._threads:
+            t.start()
+
+    def stop(self, timeout: float = 5.0):
+        """Stops accepting work and lets the threads drain what is already queued."""
+        if not self.running:
+            return
+        self._intake.put(_STOP)
+        for t in self._threads:
+            t.join(timeout)
+        self._threads = []
+
+    def submit(self, raw: bytes) -> bool:
+        """Receiver side, called from the MQTT network thread. Never blocks."""
+        with self._lock:
+            self.received += 1
+        try:
+            self._intake.put_nowait((time.perf_counter(), raw))
+            return True
+        except queue.Full:
+            if self.overflow is not None and self.overflow(raw):
+                with self._lock:
+                    self.spooled += 1
+                return True
+        except AttributeError:
+            pass  # not started
+        with self._lock:
+            self.dropped += 1
+        return False
+
+    def _dispatch(self):
+        while True:
+            item = self._intake.get()
+            if item is _STOP:
+                for shard in self._shards:
+                    shard.put(_STOP)
+                return
+
+            received_at, raw = item
+            start = time.perf_counter()
+            try:
+                if isinstance(raw, (bytes, bytearray)):
+                    raw = raw.decode()
+                payload = json.loads(raw)
+                if isinstance(payload, dict) and not any(isinstance(v, list) for v in payload.values()):
+                    device = payload["device"]
+                    if not isinstance(device, str):
+                        raise ValueError(f"device must be a string, got {type(device).__name__}")
+                    routed = {self._shard_index(device): payload}
+                else:
+                    # Batch: split by shard so per-device ordering still holds. Bad device
+                    # values are routed anyway; the batch handler reports them per row.
+                    columns = columns_from_object(payload)
+                    routed = {}
+                    for i, d in enumerate(columns["device"]):
+                        row = {field: columns[field][i] for field in columns}
+                        routed.setdefault(self._shard_index(str(d)), []).append(row)
+            except Exception as e:
+                logger.warning("⚠️ Error decoding message: %s", e)
+                with self._lock:
+                    self.errors += 1
+                continue
+            self._observe("parse", time.perf_counter() - start)
+
+            for index, item in routed.items():
+                self._shards[index].put((received_at, item))
+
+    def _shard_index(self, device: str) -> int:
+        return hash(device) % self.workers
+
+    def _work(self, shard: queue.Queue):
+        while True:
+            item = shard.get()
+            if item is _STOP:
+                return
+
+            received_at, payload = item
+            self._observe("queue_wait", time.perf_counter() - received_at)
+            batch = isinstance(payload, list)
+            try:
+                if batch:
+                    self.batch_handler(payload, self._observe)
+                else:
+                    self.handler(payload, self._observe)
+                with self._lock:
+                    self.processed += len(payload) if batch else 1
+            except Exception as e:
+                device = payload[0].get("device") if batch else payload.get("device")
+                logger.exception("⚠️ Error processing message: %s", e, extra={"device": device})
+                with self._lock:
+                    self.errors += 1
+            self._observe("total", time.perf_counter() - received_at)
+
+    def _observe(self, stage: str, seconds: float):
+        self.latency[stage].observe(seconds)
+        INGEST_STAGE_SECONDS.observe(seconds, stage=stage)
+
+    def queue_depths(self):
+        depths = {"intake": self._intake.qsize() if self._intake else 0}
+        for i, shard in enumerate(self._shards):
+            depths[f"shard_{i}"] = shard.qsize()
+        return depths
+
+    def stats(self):
+        depths = self.queue_depths()
+        return {
+            "running": self.running,
+            "workers": self.workers,
+            "received": self.received,
+            "processed": self.processed,
+            "spooled": self.spooled,
+            "dropped": self.dropped,
+            "errors": self.errors,
+            "queue_depth": {
+                "intake": depths.pop("intake"),
+                "shards": list(depths.values()),
+            },
+            "latency": {stage: stats.snapshot() for stage, stats in self.latency.items()},
+            "spool": spool_replayer.stats(),
+        }
+
+def spool_backlog(raw) -> bool:
+    """
+    Overflow handler: readings arriving faster than the database takes them wait on disk.
+    Array and columnar messages are spooled one reading per record, the shape the replayer
+    writes; a message that can't be decoded is kept as it is and dead-lettered on replay.
+    """
+    try:
+        payload = json.loads(raw)
+        columns = columns_from_object(payload)
+        records = [{field: columns[field][i] for field in columns} for i in range(len(columns["device"]))]
+    except Exception:
+        records = [raw]
+    return spool_payloads(records, reason="backlog") if records else True
+
+spool_replayer = SpoolReplayer(write_batch)
+ingest_pipeline = IngestPipeline(overflow=spool_backlog)
+
+# Counters and queue depths are read from the pipeline at scrape time
+registry.gauge("energy_ingest_messages", "Ingest pipeline message counters.", ("state",)).set_function(
+    lambda: {(state,): getattr(ingest_pipeline, state) for state in ("received", "processed", "spooled", "dropped", "errors")})
+registry.gauge("energy_ingest_queue_depth", "Messages waiting in ingest queues.", ("queue",)).set_function(
+    lambda: {(q,): depth for q, depth in ingest_pipeline.queue_depths().items()})
@@ -0,0 +1,217 @@
+import logging
+import os
+import tempfile
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import NullPool
+from app.config import settings
+from app.db.database import normalize_url
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+LEADER = "leader"
+FOLLOWER = "follower"
+
+# Advisory lock ids shared by every worker of a deployment (same database = same election)
+ADVISORY_LOCK_KEY = zlib.crc32(b"energy-meter-ingest-leader")
+STARTUP_LOCK_KEY = zlib.crc32(b"energy-meter-startup")
+
+class FileLeaderLock:
+    """Exclusive flock on a file next to the SQLite database; the OS drops it when the holder dies."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._fd = None
+
+    def acquire(self) -> bool:
+        if fcntl is None:
+            return True  # No flock: assume a single process
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        os.ftruncate(fd, 0)
+        os.write(fd, str(os.getpid()).encode())
+        self._fd = fd
+        return True
+
+    def held(self) -> bool:
+        return True
+
+    def release(self):
+        if self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+            self._fd = None
+
+class PostgresLeaderLock:
+    """
+    Session-level pg_try_advisory_lock on a dedicated connection. Postgres releases it as
+    soon as that connection ends, so a crashed leader frees the lock for the next worker.
+    """
+
+    def __init__(self, url: str, key: int = ADVISORY_LOCK_KEY):
+        self.key = key
+        self._engine = create_engine(url, poolclass=NullPool)
+        self._conn = None
+
+    def acquire(self) -> bool:
+        conn = self._engine.connect()
+        try:
+            acquired = conn.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": self.key}).scalar()
+            conn.commit()
+        except Exception:
+            conn.close()
+            raise
+        if not acquired:
+            conn.close()
+            return False
+        self._conn = conn
+        return True
+
+    def held(self) -> bool:
+        """A lost connection means a lost lock: another worker may already be leading."""
+        try:
+            self._conn.execute(text("SELECT 1"))
+            self._conn.commit()
+            return True
+        except Exception:
+            return False
+
+    def release(self):
+        if self._conn is None:
+            return
+        try:
+            self._conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": self.key})
+            self._conn.commit()
+        except Exception:
+            pass
+        finally:
+            self._conn.close()
+            self._conn = None
+
+def default_lock_path(database_url: str) -> str:
+    url = make_url(database_url)
+    if url.get_backend_name() == "sqlite" and url.database and url.database != ":memory:":
+        return os.path.abspath(url.database) + ".leader.lock"
+    return os.path.join(tempfile.gettempdir(), "energy-meter-leader.lock")
+
+def database_url() -> str:
+    """DATABASE_URL as the engines see it (hosted postgres:// URLs normalised)."""
+    return normalize_url(settings.DATABASE_URL)
+
+def is_postgres(url: str) -> bool:
+    return make_url(url).get_backend_name() == "postgresql"
+
+def make_leader_lock():
+    url = database_url()
+    if is_postgres(url):
+        return PostgresLeaderLock(url)
+    return FileLeaderLock(settings.LEADER_LOCK_FILE or default_lock_path(url))
+
+@contextmanager
+def startup_lock():
+    """
+    Blocking cross-worker lock for startup steps that must not run concurrently, such
+    as creating tables on a fresh database while several workers boot at once.
+    """
+    url = database_url()
+    if is_postgres(url):
+        engine = create_engine(url, poolclass=NullPool)
+        with engine.connect() as conn:
+            conn.execute(text("SELECT pg_advisory_lock(:key)"), {"key": STARTUP_LOCK_KEY})
+            try:
+                yield
+            finally:
+                conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": STARTUP_LOCK_KEY})
+        engine.dispose()
+        return
+    if fcntl is None:
+        yield
+        return
+    path = (settings.LEADER_LOCK_FILE or default_lock_path(url)) + ".startup"
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        yield
+    finally:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+        os.close(fd)
+
+class LeaderElector:
+    """
+    Makes exactly one process of a multi-worker deployment run the singleton services
+    (MQTT ingest, simulator, scheduled jobs) while every worker serves HTTP.
+
+    Each worker tries to take the leader lock at startup and then every `interval`
+    seconds; the winner runs `on_elected`. A leader that loses its lock (e.g. its
+    database connection dropped) runs `on_demoted` and goes back to trying.
+    """
+
+    def __init__(self, lock_factory=make_leader_lock, interval: float = None):
+        self.lock_factory = lock_factory
+        self.interval = interval if interval is not None else settings.LEADER_CHECK_SECONDS
+        self.role = FOLLOWER
+        self.since = None
+        self._lock = None
+        self._on_elected = None
+        self._on_demoted = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self, on_elected, on_demoted):
+        self._on_elected, self._on_demoted = on_elected, on_demoted
+        self._stop.clear()
+        self._lock = self.lock_factory()
+        # First attempt inline, so a single-worker deployment is leading before startup finishes
+        self._check()
+        self._thread = threading.Thread(target=self._run, name="leader-election", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(self.interval + 1)
+            self._thread = None
+        if self.role == LEADER:
+            self._demote()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._check()
+
+    def _check(self):
+        try:
+            if self.role == FOLLOWER:
+                if self._lock.acquire():
+                    self.role, self.since = LEADER, time.time()
+                    logger.info("👑 Worker %s elected leader: running ingest and background jobs.", os.getpid())
+                    self._on_elected()
+            elif not self._lock.held():
+                logger.warning("⚠️ Worker %s lost leadership.", os.getpid())
+                self._demote()
+        except Exception as e:
+            logger.error("❌ Leader election check failed: %s", e)
+
+    def _demote(self):
+        self.role, self.since = FOLLOWER, time.time()
+        try:
+            self._on_demoted()
+        finally:
+            self._lock.release()
+
+    def status(self):
+        return {"role": self.role, "pid": os.getpid(), "role_since": self.since}
+
+leader_elector = LeaderElector()
@@ -1,54 +1,31 @@
-import json
+import logging
 import paho.mqtt.client as mqtt
-from sqlalchemy.orm import Session
 from app.config import settings
-from app.db.database import SessionLocal
-from app.db.models import Reading
-from datetime import datetime
+from app.services.ingest_service import ingest_pipeline, save_reading, spool_replayer
 
-def save_reading(payload: dict, db: Session):
-    """Saves a reading to the database."""
-    try:
-        timestamp = datetime.fromisoformat(payload["timestamp"])
-        reading = Reading(
-            device=payload["device"],
-            timestamp=timestamp,
-            current=payload["current"],
-            voltage=payload["voltage"]
-        )
-        db.add(reading)
-        db.commit()
-        db.refresh(reading)
-        print(f"Saved reading for {reading.device} at {reading.timestamp}")
-    except Exception as e:
-        print(f"Error saving reading: {e}")
+logger = logging.getLogger(__name__)
+
+def subscription_topic(topic: str = None, group: str = None) -> str:
+    """
+    The topic filter to subscribe to. With a shared group the broker spreads messages
+    across all consumers in the group, so ingest scales out across processes and nodes.
+    """
+    topic = topic or settings.MQTT_TOPIC
+    group = settings.MQTT_SHARED_GROUP if group is None else group
+    return f"$share/{group}/{topic}" if group else topic
 
 def on_connect(client, userdata, flags, rc):
     if rc == 0:
-        print("✅ Connected to MQTT Broker!")
-        client.subscribe(settings.MQTT_TOPIC)
-        print(f"📡 Subscribed to topic: {settings.MQTT_TOPIC}")
+        logger.info("✅ Connected to MQTT Broker!")
+        client.subscribe(subscription_topic())
+        logger.info("📡 Subscribed to topic: %s", subscription_topic())
     else:
-        print(f"❌ Failed to connect, return code {rc}")
-
-from app.services.protection_service import check_and_trigger_cutoff
+        logger.error("❌ Failed to connect, return code %s", rc)
 
 def on_message(client, userdata, msg):
-    try:
-        topic = msg.topic
-        payload_raw = msg.payload.decode()
-        print(f"📩 Received message on {topic}: {payload_raw}")
-        payload = json.loads(payload_raw)
-        # Create a new database session for each message
-        db = SessionLocal()
-        try:
-            save_reading(payload, db)
-            # Run protection logic after saving the reading
-            check_and_trigger_cutoff(payload, db)
-        finally:
-            db.close()
-    except Exception as e:
-        print(f"⚠️ Error processing message: {e}")
+    # Runs on paho's network thread: only hand the raw payload to the ingest pipeline,
+    # decoding, persistence and protection happen on the pipeline's workers.
+    ingest_pipeline.submit(msg.payload)
 
 from paho.mqtt.client import CallbackAPIVersion
 
@@ -57,13 +34,17 @@ mqtt_client.on_connect = on_connect
 mqtt_client.on_message = on_message
 
 def start_mqtt_listener():
-    print(f"Connecting to MQTT Broker at {settings.MQTT_BROKER}...")
+    ingest_pipeline.start()
+    spool_replayer.start()
+    logger.info("Connecting to MQTT Broker at %s...", settings.MQTT_BROKER)
     try:
         mqtt_client.connect(settings.MQTT_BROKER, settings.MQTT_PORT, 60)
         mqtt_client.loop_start()
     except Exception as e:
-        print(f"Failed to start MQTT listener: {e}")
+        logger.error("Failed to start MQTT listener: %s", e)
 
 def stop_mqtt_listener():
     mqtt_client.loop_stop()
     mqtt_client.disconnect()
+    ingest_pipeline.stop()
+    spool_replayer.stop()
@@ -1,6 +1,14 @@
+import logging
 from sqlalchemy.orm import Session
 from app.db import crud
+from app.services.dashboard_service import dashboard_snapshots
+from app.services.relay_service import remember_relay_state
 from app.utils.firebase_init import db_ref
+from app.utils.logging_config import LogSampler
+
+logger = logging.getLogger(__name__)
+# A device stuck above its limit trips on every reading; don't flood the log
+exceeded_log = LogSampler(logger, every=100, interval=10)
 
 # DEVICE_TO_RELAY_MAP defines which Firebase relay(s) to turn off for each device
 DEVICE_TO_RELAY_MAP = {
@@ -27,19 +35,35 @@ def check_and_trigger_cutoff(payload: dict, db: Session):
         threshold = device_record.threshold if device_record else 2500.0
 
         if power >= threshold:
-            print(f"🚨 THRESHOLD EXCEEDED: {device_id} is consuming {power:.2f}W (Threshold: {threshold}W)")
+            exceeded_log.log(logging.WARNING, "🚨 THRESHOLD EXCEEDED: %s is consuming %.2fW (Threshold: %sW)",
+                             device_id, power, threshold, device=device_id, power=round(power, 2), threshold=threshold)
             
             relays_to_cut = DEVICE_TO_RELAY_MAP.get(device_id, [])
             if not relays_to_cut:
                 return
 
             if not db_ref:
-                print("⚠️ Cannot trigger cut-off: Firebase not initialized.")
+                logger.warning("⚠️ Cannot trigger cut-off: Firebase not initialized.")
                 return
 
             for relay in relays_to_cut:
-                print(f"🔌 Turning OFF {relay} for safety...")
+                logger.warning("🔌 Turning OFF %s for safety...", relay, extra={"device": device_id, "relay": relay})
                 db_ref.reference(relay).set(False)
+                remember_relay_state(relay, False)
+            dashboard_snapshots.notify()
 
     except Exception as e:
-        print(f"⚠️ Error in protection logic: {e}")
+        logger.error("⚠️ Error in protection logic: %s", e)
+
+def check_batch_and_trigger_cutoff(readings, db: Session):
+    """
+    Protection for a batch of readings: only each device's highest-power reading is
+    checked, so a batch costs one threshold lookup (and at most one cut-off) per device.
+    """
+    peaks = {}
+    for r in readings:
+        power = r["current"] * r["voltage"]
+        if r["device"] not in peaks or power > peaks[r["device"]][0]:
+            peaks[r["device"]] = (power, r)
+    for _, reading in peaks.values():
+        check_and_trigger_cutoff(reading, db)
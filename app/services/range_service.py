@@ -0,0 +1,68 @@
+from datetime import datetime, timedelta
+from sqlalchemy.orm import Session
+from app.db import crud
+from app.services import tariff_service
+
+GRANULARITIES = {"hour": 3600, "day": 86400, "week": 7 * 86400}
+
+def bucket_origin(start: datetime, granularity: str) -> datetime:
+    """Start of the hour, day or (Monday-based) week containing `start`."""
+    origin = start.replace(minute=0, second=0, microsecond=0)
+    if granularity in ("day", "week"):
+        origin = origin.replace(hour=0)
+    if granularity == "week":
+        origin -= timedelta(days=origin.weekday())
+    return origin
+
+def encode_cursor(bucket: int, device: str) -> str:
+    return f"{bucket}:{device}"
+
+def decode_cursor(cursor: str) -> tuple:
+    bucket, device = cursor.split(":", 1)
+    return int(bucket), device
+
+def get_range_usage(db: Session, start: datetime, end: datetime, granularity: str = "day",
+                    device: str = None, limit: int = 1000, cursor: str = None):
+    """
+    Per-device energy, averages, peak power and cost for every hour, day or week in a range.
+
+    Everything comes from one grouped query over the hourly rollups and their priced costs,
+    so a month costs about as much as a single day did over raw readings. Buckets are
+    aligned to whole hours/days/weeks. Results are paged by `limit`; `next_cursor` resumes
+    after the last row. Hours the pricing job hasn't reached yet are costed at the current rate.
+    """
+    bucket_seconds = GRANULARITIES[granularity]
+    origin = bucket_origin(start, granularity)
+    after = decode_cursor(cursor) if cursor else None
+    rate = tariff_service.current_rate(db)
+    rows = crud.get_range_usage(db, origin, end, bucket_seconds, device=device, after=after, limit=limit + 1,
+                                fallback_rate=rate)
+
+    buckets = []
+    for r in rows[:limit]:
+        # Same convention as crud.get_daily_usage: each reading stands for 10 seconds
+        energy_kwh = (r.power_sum * 10) / 3600000
+        buckets.append({
+            "start": origin + timedelta(seconds=r.bucket * bucket_seconds),
+            "device": r.device,
+            "samples": r.samples,
+            "total_energy": round(energy_kwh, 6),
+            "avg_voltage": round(r.voltage_sum / r.samples, 2),
+            "avg_current": round(r.current_sum / r.samples, 2),
+            "peak_power": round(r.peak_power, 2),
+            "cost": round(r.cost, 4),
+        })
+
+    next_cursor = None
+    if len(rows) > limit:
+        last = rows[limit - 1]
+        next_cursor = encode_cursor(last.bucket, last.device)
+    return {
+        "start": origin,
+        "end": end,
+        "granularity": granularity,
+        "tariff": tariff_service.get_active_tariff(db).name,
+        "rate_per_kwh": rate,
+        "buckets": buckets,
+        "next_cursor": next_cursor,
+    }
@@ -0,0 +1,43 @@
+import logging
+import threading
+from app.db import crud
+from app.db.database import WriteSessionLocal
+from app.db.models import Reading
+
+logger = logging.getLogger(__name__)
+
+def summarize_devices(readings):
+    """Folds (device, timestamp) tuples into registry rows for crud.register_devices."""
+    rows = {}
+    for device, timestamp in readings:
+        row = rows.get(device)
+        if row is None:
+            rows[device] = {"id": device, "first_seen": timestamp, "last_seen": timestamp, "sample_count": 1}
+            continue
+        row["first_seen"] = min(row["first_seen"], timestamp)
+        row["last_seen"] = max(row["last_seen"], timestamp)
+        row["sample_count"] += 1
+    return list(rows.values())
+
+def backfill_device_registry():
+    """
+    Registers devices from readings stored before the registry existed, once. Completion
+    is recorded in the backfills table, since ingest may register devices first.
+    """
+    db = WriteSessionLocal()
+    try:
+        if "device_registry" in crud.get_completed_backfills(db):
+            return
+        if db.query(Reading.id).first() is not None:
+            logger.info("📇 Building device registry from existing readings...")
+            crud.rebuild_device_registry(db)
+            logger.info("✅ Device registry built.")
+        crud.mark_backfilled(db, "device_registry")
+        db.commit()
+    except Exception as e:
+        logger.error("❌ Device registry backfill failed: %s", e)
+    finally:
+        db.close()
+
+def start_registry_backfill():
+    threading.Thread(target=backfill_device_registry, name="registry-backfill", daemon=True).start()
@@ -0,0 +1,39 @@
+import logging
+from app.config import settings
+from app.utils.firebase_init import db_ref
+from app.utils.ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+RELAYS = ("relay1", "relay2", "relay3", "relay4")
+
+# Relays change rarely and mostly through this process, so Firebase is read at most once per TTL
+relay_cache = TTLCache(maxsize=1, ttl=settings.RELAY_CACHE_TTL)
+
+def read_relay_states():
+    """Reads every relay's state from Firebase (unset relays count as off)."""
+    states = {}
+    for relay in RELAYS:
+        value = db_ref.reference(relay).get()
+        states[relay] = value if value is not None else False
+    relay_cache.set("states", states)
+    return states
+
+def get_relay_states():
+    """Relay states from the cache, refreshed from Firebase when stale. None if Firebase is not initialized."""
+    if not db_ref:
+        return None
+    states = relay_cache.get("states")
+    if states is None:
+        try:
+            states = read_relay_states()
+        except Exception as e:
+            logger.warning("⚠️ Could not read relay states: %s", e)
+            return None
+    return dict(states)
+
+def remember_relay_state(relay: str, state: bool):
+    """Records a relay write in the cache, so readers see it without a Firebase round trip."""
+    states = relay_cache.get("states")
+    if states is not None:
+        relay_cache.set("states", {**states, relay: state})
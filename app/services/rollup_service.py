@@ -0,0 +1,70 @@
+import logging
+import threading
+from app.db import crud
+from app.db.database import WriteSessionLocal
+from app.db.models import Reading
+from app.services import archive_service
+
+logger = logging.getLogger(__name__)
+
+def aggregate_readings(readings, unit: str = "minute"):
+    """Folds (device, timestamp, current, voltage) tuples into per-minute or per-hour rollup rows for crud.upsert_rollups."""
+    rows = {}
+    for device, timestamp, current, voltage in readings:
+        period = crud.time_floor_value(timestamp, unit)
+        power = current * voltage
+        row = rows.get((device, period))
+        if row is None:
+            rows[(device, period)] = {
+                "device": device, unit: period, "samples": 1,
+                "power_sum": power, "power_min": power, "power_max": power,
+                "current_sum": current, "current_min": current, "current_max": current,
+                "voltage_sum": voltage, "voltage_min": voltage, "voltage_max": voltage,
+            }
+            continue
+        row["samples"] += 1
+        row["power_sum"] += power
+        row["power_min"] = min(row["power_min"], power)
+        row["power_max"] = max(row["power_max"], power)
+        row["current_sum"] += current
+        row["current_min"] = min(row["current_min"], current)
+        row["current_max"] = max(row["current_max"], current)
+        row["voltage_sum"] += voltage
+        row["voltage_min"] = min(row["voltage_min"], voltage)
+        row["voltage_max"] = max(row["voltage_max"], voltage)
+    return list(rows.values())
+
+def upsert_all_rollups(db, readings):
+    """Adds (device, timestamp, current, voltage) tuples to every rollup tier. The caller commits."""
+    readings = list(readings)
+    for unit in crud.ROLLUP_TIERS:
+        crud.upsert_rollups(db, aggregate_readings(readings, unit), unit)
+
+def backfill_rollups():
+    """
+    Builds each rollup tier once from the readings stored before it existed. Completion is
+    recorded in the backfills table: ingest starts alongside this job, so a tier holding
+    rows doesn't mean its history has been rolled up.
+    """
+    db = WriteSessionLocal()
+    try:
+        done = crud.get_completed_backfills(db)
+        pending = [unit for unit in crud.ROLLUP_TIERS if f"rollups_{unit}" not in done]
+        if not pending:
+            return
+        if db.query(Reading.id).first() is not None or archive_service.get_archive().devices():
+            # A full rebuild also covers whatever ingest has added since startup
+            logger.info("🧮 Building %s rollups from existing readings...", "/".join(pending))
+            crud.rebuild_rollups(db, units=pending)
+            archive_service.add_archived_rollups(db, units=pending)
+            logger.info("✅ Rollups built.")
+        for unit in pending:
+            crud.mark_backfilled(db, f"rollups_{unit}")
+        db.commit()
+    except Exception as e:
+        logger.error("❌ Rollup backfill failed: %s", e)
+    finally:
+        db.close()
+
+def start_rollup_backfill():
+    threading.Thread(target=backfill_rollups, name="rollup-backfill", daemon=True).start()
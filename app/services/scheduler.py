@@ -0,0 +1,20 @@
+import logging
+from apscheduler.schedulers.background import BackgroundScheduler
+
+logger = logging.getLogger(__name__)
+
+# Shared background scheduler; services register their periodic jobs on it at startup
+scheduler = BackgroundScheduler(job_defaults={"coalesce": True, "max_instances": 1})
+
+def start_scheduler():
+    if not scheduler.running:
+        scheduler.start()
+    else:
+        scheduler.resume()
+    logger.info("⏰ Scheduler running with %d job(s).", len(scheduler.get_jobs()))
+
+def stop_scheduler():
+    # Paused rather than shut down: a shut-down scheduler can't run jobs again, and a
+    # worker that loses leadership may be re-elected later
+    if scheduler.running:
+        scheduler.pause()
@@ -0,0 +1,114 @@
+import math
+from datetime import datetime, timedelta
+import numpy as np
+from sqlalchemy.orm import Session
+from app.db import crud
+from app.services import archive_service
+
+AGGREGATIONS = ("avg", "minmax", "lttb")
+
+# LTTB runs on raw readings when the range holds at most this many; beyond that it picks
+# from SQL buckets LTTB_OVERSAMPLE times finer than the requested resolution
+LTTB_MAX_RAW = 50000
+LTTB_OVERSAMPLE = 4
+
+# Buckets at least this wide are computed from the per-minute rollups instead of raw readings
+ROLLUP_MIN_BUCKET = 300
+
+def lttb(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets downsampling. Returns the indices of the kept points.
+
+    The first and last points are always kept; for every bucket in between, the point
+    forming the largest triangle with the previously kept point and the next bucket's
+    average is selected. Each bucket is evaluated with vectorised NumPy.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    every = (n - 2) / (threshold - 2)
+    selected = np.empty(threshold, dtype=int)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        lo = int(i * every) + 1
+        hi = int((i + 1) * every) + 1
+        nxt_hi = min(int((i + 2) * every) + 1, n)
+        avg_x = x[hi:nxt_hi].mean()
+        avg_y = y[hi:nxt_hi].mean()
+        areas = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(np.argmax(areas))
+        selected[i + 1] = a
+    return selected
+
+def _lttb_raw(raw, points: int):
+    if not raw:
+        return []
+    timestamps = np.array([r[0] for r in raw], dtype="datetime64[us]")
+    current = np.fromiter((r[1] for r in raw), dtype=np.float64, count=len(raw))
+    voltage = np.fromiter((r[2] for r in raw), dtype=np.float64, count=len(raw))
+    power = current * voltage
+    x = (timestamps - timestamps[0]).astype(np.float64)
+
+    return [
+        {
+            "timestamp": raw[i][0],
+            "power": round(float(power[i]), 3),
+            "current": round(float(current[i]), 4),
+            "voltage": round(float(voltage[i]), 2),
+            "samples": 1,
+        }
+        for i in lttb(x, power, points).tolist()
+    ]
+
+def get_device_series(db: Session, device: str, start: datetime, end: datetime, points: int = 500, agg: str = "avg"):
+    """
+    Downsampled power/current/voltage series for one device between `start` and `end`.
+
+    Bucketing happens in SQL, so the database returns at most `points` rows (or
+    LTTB_OVERSAMPLE times that for LTTB) however many raw readings the range holds.
+    Wide buckets are read from the per-minute rollups, so a month costs a few tens of
+    thousands of rows per device instead of hundreds of thousands. LTTB over small
+    ranges works on the raw readings so single-sample spikes survive.
+    """
+    span = max((end - start).total_seconds(), 1.0)
+    target = points * LTTB_OVERSAMPLE if agg == "lttb" else points
+    bucket_seconds = max(1, math.ceil(span / target))
+
+    if bucket_seconds >= ROLLUP_MIN_BUCKET:
+        # Align buckets to whole minutes so each rollup row falls into exactly one bucket
+        bucket_seconds = math.ceil(bucket_seconds / 60) * 60
+        start = start.replace(second=0, microsecond=0)
+        rows = crud.get_bucketed_rollup_series(db, device, start, end, bucket_seconds)
+    else:
+        rows = archive_service.get_bucketed_series(db, device, start, end, bucket_seconds)
+    result = {"device": device, "start": start, "end": end, "bucket_seconds": bucket_seconds, "agg": agg, "points": []}
+
+    if agg == "lttb" and sum(r.count for r in rows) <= LTTB_MAX_RAW:
+        result["points"] = _lttb_raw(archive_service.get_raw_series(db, device, start, end), points)
+        return result
+    if agg == "lttb" and len(rows) > points:
+        x = np.fromiter((r.bucket for r in rows), dtype=np.float64, count=len(rows))
+        y = np.fromiter((r.power_avg for r in rows), dtype=np.float64, count=len(rows))
+        rows = [rows[i] for i in lttb(x, y, points)]
+
+    for r in rows:
+        point = {
+            "timestamp": start + timedelta(seconds=r.bucket * bucket_seconds),
+            "power": round(r.power_avg, 3),
+            "current": round(r.current_avg, 4),
+            "voltage": round(r.voltage_avg, 2),
+            "samples": r.count,
+        }
+        if agg == "minmax":
+            point.update({
+                "power_min": round(r.power_min, 3),
+                "power_max": round(r.power_max, 3),
+                "current_min": round(r.current_min, 4),
+                "current_max": round(r.current_max, 4),
+                "voltage_min": round(r.voltage_min, 2),
+                "voltage_max": round(r.voltage_max, 2),
+            })
+        result["points"].append(point)
+    return result
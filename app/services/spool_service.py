@@ -0,0 +1,166 @@
+import json
+import logging
+import threading
+import time
+from sqlalchemy.exc import DBAPIError, OperationalError
+from app.config import settings
+from app.utils.logging_config import LogSampler
+from app.utils.metrics import registry
+from app.utils.spool import Spool, claim_spool_dir
+
+logger = logging.getLogger(__name__)
+failure_log = LogSampler(logger, every=100, interval=10)
+
+SPOOLED = registry.counter("energy_spool_spooled_total", "Readings written to the on-disk spool.", ("reason",))
+REJECTED = registry.counter("energy_spool_rejected_total", "Readings lost because the spool was full.")
+REPLAYED = registry.counter("energy_spool_replayed_total", "Spooled readings replayed into the database.")
+DEAD_LETTERED = registry.counter("energy_spool_dead_lettered_total", "Spooled readings set aside because they can never be stored.")
+
+_spool = None
+_spool_lock = threading.Lock()
+
+def get_spool() -> Spool:
+    """This process's spool, created on first use in a free slot under SPOOL_DIR."""
+    global _spool
+    with _spool_lock:
+        if _spool is None:
+            directory, _owner = claim_spool_dir(settings.SPOOL_DIR)
+            _spool = Spool(
+                directory,
+                segment_bytes=settings.SPOOL_SEGMENT_MB * 1024 * 1024,
+                max_bytes=settings.SPOOL_MAX_MB * 1024 * 1024,
+                fsync=settings.SPOOL_FSYNC,
+            )
+            _spool.owner = _owner  # keeps the slot lock for the life of the process
+            logger.info("💾 Ingest spool at %s (%d pending).", directory, _spool.pending)
+        return _spool
+
+def is_transient(error: Exception) -> bool:
+    """
+    Whether a database error may go away on retry (lost connection, locked or
+    unreachable database), as opposed to one the same rows would hit again, such as a
+    constraint violation or bad data. Only readings that failed transiently are spooled.
+    """
+    if isinstance(error, OperationalError):
+        return True
+    return isinstance(error, DBAPIError) and error.connection_invalidated
+
+def spool_payloads(records, reason: str) -> bool:
+    """Keeps raw JSON payloads (bytes, str or dicts) on disk for the replayer. Returns False if the spool is full."""
+    records = [
+        r if isinstance(r, bytes) else (r.encode() if isinstance(r, str) else json.dumps(r).encode())
+        for r in records
+    ]
+    if get_spool().append(records):
+        SPOOLED.inc(len(records), reason=reason)
+        failure_log.warning("💾 Spooled %d reading(s) (%s).", len(records), reason)
+        return True
+    REJECTED.inc(len(records))
+    failure_log.error("❌ Spool full: %d reading(s) lost (%s).", len(records), reason)
+    return False
+
+class SpoolReplayer:
+    """
+    Drains the spool into the database in bulk batches.
+
+    `writer(payloads)` must store a list of reading dicts in one transaction and raise if
+    it couldn't. Batches are only marked consumed after the writer succeeds, so a crash
+    mid-batch replays it again; the readings' (device, timestamp) key makes that harmless.
+    While the database fails transiently (see is_transient), the replayer backs off for
+    SPOOL_RETRY_SECONDS. A batch failing for any other reason is split in halves until
+    the readings at fault are isolated; those go to the spool's dead-letter file so
+    they can't hold up the rest.
+    """
+
+    def __init__(self, writer, batch_size: int = None, retry_seconds: float = None, spool_getter=get_spool):
+        self.writer = writer
+        self.batch_size = batch_size or settings.SPOOL_REPLAY_BATCH
+        self.retry_seconds = settings.SPOOL_RETRY_SECONDS if retry_seconds is None else retry_seconds
+        self.spool_getter = spool_getter
+        self.replayed = 0
+        self.dead_lettered = 0
+        self.rate = 0.0  # readings/sec of the last replayed batch
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="spool-replayer", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(5)
+            self._thread = None
+
+    def _run(self):
+        spool = self.spool_getter()
+        while not self._stop.is_set():
+            if not spool.pending:
+                self._stop.wait(1.0)
+                continue
+            if not self.replay_batch(spool):
+                self._stop.wait(self.retry_seconds)
+
+    def replay_batch(self, spool) -> bool:
+        records, position = spool.read_batch(self.batch_size)
+        payloads, dead = [], []
+        for record in records:
+            try:
+                payloads.append(json.loads(record))
+            except ValueError as e:
+                dead.append({"record": record.decode(errors="replace"), "error": str(e)})
+        start = time.perf_counter()
+        try:
+            stored = self._write(payloads, dead)
+        except Exception as e:
+            failure_log.warning("⚠️ Spool replay failed, retrying in %ss: %s", self.retry_seconds, e)
+            return False
+        # Dead letters are only written once the batch is through, so a retried batch doesn't repeat them
+        if dead:
+            spool.dead_letter([json.dumps(d, default=str).encode() for d in dead])
+            self.dead_lettered += len(dead)
+            DEAD_LETTERED.inc(len(dead))
+            logger.error("❌ %d spooled reading(s) can't be stored; set aside in the dead-letter file: %s",
+                         len(dead), dead[0]["error"])
+        spool.commit(position, len(records))
+        self.replayed += stored
+        REPLAYED.inc(stored)
+        if stored:
+            self.rate = stored / max(time.perf_counter() - start, 1e-9)
+        return True
+
+    def _write(self, payloads: list, dead: list) -> int:
+        """Writes payloads, halving on non-transient failures; adds the rows at fault to `dead`. Returns the rows written."""
+        if not payloads:
+            return 0
+        try:
+            self.writer(payloads)
+            return len(payloads)
+        except Exception as e:
+            if is_transient(e):
+                raise
+            if len(payloads) == 1:
+                dead.append({"payload": payloads[0], "error": str(e).splitlines()[0] if str(e) else type(e).__name__})
+                return 0
+        middle = len(payloads) // 2
+        return self._write(payloads[:middle], dead) + self._write(payloads[middle:], dead)
+
+    def stats(self):
+        spool = _spool
+        return {
+            "pending": spool.pending if spool else 0,
+            "bytes": spool.bytes if spool else 0,
+            "corrupted": spool.corrupted if spool else 0,
+            "replayed": self.replayed,
+            "dead_lettered": self.dead_lettered,
+            "replay_rate": round(self.rate, 1),
+        }
+
+registry.gauge("energy_spool_pending", "Readings waiting in the on-disk spool.").set_function(
+    lambda: _spool.pending if _spool else 0)
+registry.gauge("energy_spool_bytes", "Size of the on-disk spool.").set_function(
+    lambda: _spool.bytes if _spool else 0)
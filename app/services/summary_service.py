@@ -0,0 +1,98 @@
+import logging
+from datetime import date, timedelta
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.db import async_crud, crud
+from app.db.database import WriteSessionLocal
+from app.services import archive_service
+from app.services.scheduler import scheduler
+from app.utils.ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# Today's summary changes with every reading, so it is only cached briefly
+today_cache = TTLCache(maxsize=8, ttl=settings.TODAY_SUMMARY_TTL)
+
+# Browser/proxy cache lifetime for finished days; late data can still change them, so not forever
+PAST_DAY_MAX_AGE = 3600
+
+def is_finished(day: date) -> bool:
+    return day < date.today()
+
+def max_age_for(day: date) -> int:
+    return PAST_DAY_MAX_AGE if is_finished(day) else int(settings.TODAY_SUMMARY_TTL)
+
+def finalize_day(db: Session, day: date):
+    """Computes a finished day's usage, including archived readings, and stores it in daily_summaries."""
+    device_stats = archive_service.get_daily_usage(db, day)
+    try:
+        crud.save_daily_summary(db, day, device_stats)
+    except Exception as e:
+        # Typically a concurrent request stored the same day first
+        db.rollback()
+        logger.warning("Could not store daily summary for %s: %s", day, e)
+    return device_stats
+
+def store_day(day: date):
+    """
+    finalize_day through the writer. Requests read on the replica, which may lag and
+    (on SQLite) sits outside the WriterPool, so a summary is never stored from there.
+    """
+    db = WriteSessionLocal()
+    try:
+        return finalize_day(db, day)
+    finally:
+        db.close()
+
+def get_day_usage(db: Session, day: date):
+    """
+    Per-device usage for `day` (see crud.get_daily_usage).
+
+    Finished days are served from daily_summaries, computed and stored (see store_day) on
+    first request if the rollover job has not stored them yet. Today and future days come from a short TTL cache.
+    """
+    if not is_finished(day):
+        device_stats = today_cache.get(day)
+        if device_stats is None:
+            device_stats = crud.get_daily_usage(db, day)
+            today_cache.set(day, device_stats)
+        return device_stats
+
+    record = crud.get_daily_summary_record(db, day)
+    if record is not None:
+        return record.device_breakdown
+    return store_day(day)
+
+async def get_day_usage_async(db: AsyncSession, day: date):
+    """get_day_usage for async endpoints."""
+    if not is_finished(day):
+        device_stats = today_cache.get(day)
+        if device_stats is None:
+            device_stats = await async_crud.get_daily_usage(db, day)
+            today_cache.set(day, device_stats)
+        return device_stats
+
+    record = await async_crud.get_daily_summary_record(db, day)
+    if record is not None:
+        return record.device_breakdown
+    return await run_in_threadpool(store_day, day)
+
+def finalize_previous_day():
+    """Day-rollover job: stores yesterday's summary once no more readings are expected for it."""
+    yesterday = date.today() - timedelta(days=1)
+    db = WriteSessionLocal()
+    try:
+        if crud.get_daily_summary_record(db, yesterday) is None:
+            finalize_day(db, yesterday)
+            logger.info("📅 Daily summary for %s finalised.", yesterday)
+    except Exception as e:
+        logger.error("❌ Finalising daily summary for %s failed: %s", yesterday, e)
+    finally:
+        db.close()
+
+def schedule_daily_summaries():
+    scheduler.add_job(finalize_previous_day, "cron", hour=0, minute=5, id="finalize_daily_summary", replace_existing=True)
+    # Catch up on a rollover missed while the server was down
+    scheduler.add_job(finalize_previous_day, id="finalize_daily_summary_startup", replace_existing=True)
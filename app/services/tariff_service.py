@@ -0,0 +1,269 @@
+import bisect
+import logging
+import time
+from datetime import date, datetime, timedelta
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.db import crud
+from app.db.database import WriteSessionLocal
+from app.db.models import Tariff
+from app.services.scheduler import scheduler
+from app.utils.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+KINDS = ("flat", "tiered", "tou")
+
+PRICED_HOURS = registry.counter("energy_tariff_priced_hours_total", "Device-hours priced by the pricing job.")
+
+# Rollups are stamped when a statement runs but only seen once it commits, possibly by
+# another host with a slightly different clock; each scan overlaps the last by this much
+PRICING_OVERLAP = timedelta(minutes=5)
+
+_priced_since = None  # rollup updated_at the next scan starts from; None: scan every hour
+
+def default_tariff() -> Tariff:
+    """The flat ENERGY_RATE_GHC_PER_KWH, in force before the first configured tariff (or without one)."""
+    return Tariff(id=None, name="Flat rate", kind="flat", rates={"rate": settings.ENERGY_RATE_GHC_PER_KWH},
+                  effective_from=datetime.min)
+
+def _rate(value, what: str) -> float:
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or value < 0:
+        raise ValueError(f"{what} must be a non-negative number")
+    return float(value)
+
+def _hour(value, what: str, low: int, high: int) -> int:
+    if isinstance(value, bool) or not isinstance(value, int) or not low <= value <= high:
+        raise ValueError(f"{what} must be a whole hour from {low} to {high}")
+    return value
+
+def validate_rates(kind: str, rates: dict) -> dict:
+    """
+    Checks a tariff's rates and returns them normalised. Raises ValueError.
+
+    flat:   {"rate": 2.2}
+    tiered: {"tiers": [{"up_to_kwh": 30, "rate": 0.9}, ..., {"up_to_kwh": null, "rate": 2.5}]}
+            Blocks of each calendar month's consumption, all devices together.
+    tou:    {"rate": 1.8, "periods": [{"start_hour": 18, "end_hour": 22, "rate": 3.1}]}
+            Hours on the readings' clock (UTC); a period may wrap past midnight, and
+            "rate" applies outside every period.
+    """
+    if kind not in KINDS:
+        raise ValueError(f"kind must be one of {', '.join(KINDS)}")
+    if not isinstance(rates, dict):
+        raise ValueError("rates must be an object")
+    if kind == "flat":
+        return {"rate": _rate(rates.get("rate"), "rate")}
+    if kind == "tou":
+        periods = []
+        for period in rates.get("periods") or []:
+            if not isinstance(period, dict):
+                raise ValueError("periods must be objects")
+            start = _hour(period.get("start_hour"), "start_hour", 0, 23)
+            end = _hour(period.get("end_hour"), "end_hour", 1, 24)
+            if start == end % 24:
+                raise ValueError("a period must not be empty or span the whole day")
+            periods.append({"start_hour": start, "end_hour": end, "rate": _rate(period.get("rate"), "period rate")})
+        if not periods:
+            raise ValueError("a tou tariff needs at least one period")
+        return {"rate": _rate(rates.get("rate"), "rate"), "periods": periods}
+
+    tiers, floor = [], 0.0
+    for i, tier in enumerate(rates.get("tiers") or []):
+        if not isinstance(tier, dict):
+            raise ValueError("tiers must be objects")
+        cap = tier.get("up_to_kwh")
+        last = i == len(rates["tiers"]) - 1
+        if (cap is None) != last:
+            raise ValueError("every tier but the last needs up_to_kwh, and the last must have none")
+        if cap is not None:
+            cap = _rate(cap, "up_to_kwh")
+            if cap <= floor:
+                raise ValueError("up_to_kwh must increase from tier to tier")
+            floor = cap
+        tiers.append({"up_to_kwh": cap, "rate": _rate(tier.get("rate"), "tier rate")})
+    if not tiers:
+        raise ValueError("a tiered tariff needs at least one tier")
+    return {"tiers": tiers}
+
+def tou_rates(rates: dict):
+    """The 24 hourly rates of a tou tariff, by hour of day."""
+    table = [rates["rate"]] * 24
+    for period in rates["periods"]:
+        hour = period["start_hour"]
+        while hour != period["end_hour"] % 24:
+            table[hour] = period["rate"]
+            hour = (hour + 1) % 24
+    return table
+
+def tiered_cost(tiers, kwh: float) -> float:
+    """Cost of a month's first `kwh` kWh under tiered blocks."""
+    cost, floor = 0.0, 0.0
+    for tier in tiers:
+        cap = tier["up_to_kwh"]
+        top = kwh if cap is None else min(kwh, cap)
+        if top > floor:
+            cost += (top - floor) * tier["rate"]
+        if cap is None or kwh <= cap:
+            break
+        floor = cap
+    return cost
+
+def hour_rate(tariff: Tariff, hour: datetime, used: float = 0.0, kwh: float = 0.0) -> float:
+    """Effective GHC/kWh of `kwh` used in `hour`, after `used` kWh earlier in the same month."""
+    if tariff.kind == "tou":
+        return tou_rates(tariff.rates)[hour.hour]
+    if tariff.kind == "tiered":
+        tiers = tariff.rates["tiers"]
+        if kwh > 0:
+            return (tiered_cost(tiers, used + kwh) - tiered_cost(tiers, used)) / kwh
+        return next(t["rate"] for t in tiers if t["up_to_kwh"] is None or used < t["up_to_kwh"])
+    return tariff.rates["rate"]
+
+class TariffSchedule:
+    """The tariffs in force over time: the one with the latest effective_from at or before an hour prices it."""
+
+    def __init__(self, tariffs):
+        self.tariffs = [default_tariff(), *tariffs]
+        self.starts = [t.effective_from for t in self.tariffs]
+
+    def for_hour(self, hour: datetime) -> Tariff:
+        return self.tariffs[bisect.bisect_right(self.starts, hour) - 1]
+
+    def hourly_rates(self, hours, month_to_date: float = 0.0):
+        """
+        Effective rates for (hour, house kWh) pairs in time order. `month_to_date` is the
+        kWh already used in the first hour's month; tiered blocks restart every month.
+        """
+        rates, month, used = [], None, month_to_date
+        for hour, kwh in hours:
+            if month is not None and (hour.year, hour.month) != month:
+                used = 0.0
+            month = (hour.year, hour.month)
+            rates.append(hour_rate(self.for_hour(hour), hour, used, kwh))
+            used += kwh
+        return rates
+
+def load_schedule(db: Session) -> TariffSchedule:
+    return TariffSchedule(crud.get_tariffs(db))
+
+def month_start(value: datetime) -> datetime:
+    return value.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+def next_month(value: datetime) -> datetime:
+    return (month_start(value) + timedelta(days=32)).replace(day=1)
+
+def current_hour() -> datetime:
+    # Readings, and so tariff hours, are naive UTC
+    return crud.time_floor_value(datetime.utcnow(), "hour")
+
+def get_active_tariff(db: Session) -> Tariff:
+    return load_schedule(db).for_hour(current_hour())
+
+def current_rate(db: Session) -> float:
+    """The rate in force now (for tiered: at the month's consumption so far)."""
+    hour = current_hour()
+    return hour_rate(load_schedule(db).for_hour(hour), hour, crud.get_month_energy(db, month_start(hour), hour))
+
+def create_tariff(db: Session, name: str, kind: str, rates: dict, effective_from: datetime = None) -> Tariff:
+    """Validates and stores a tariff, effective from the start of the hour (default: this one). Costs from its month on are repriced."""
+    rates = validate_rates(kind, rates)
+    effective_from = crud.time_floor_value(effective_from, "hour") if effective_from else current_hour()
+    return crud.create_tariff(db, name, kind, rates, effective_from, reprice_from=month_start(effective_from))
+
+def describe(tariff: Tariff) -> str:
+    rates = tariff.rates
+    if tariff.kind == "tiered":
+        blocks, floor = [], 0
+        for tier in rates["tiers"]:
+            cap = tier["up_to_kwh"]
+            span = f"{floor:g}-{cap:g} kWh" if cap is not None else f"above {floor:g} kWh"
+            blocks.append(f"{tier['rate']:.2f} GHC/kWh for {span}")
+            floor = cap
+        return f"{tariff.name} (tiered per month: {', '.join(blocks)})"
+    if tariff.kind == "tou":
+        periods = ", ".join(f"{p['rate']:.2f} GHC/kWh from {p['start_hour']:02d}:00 to {p['end_hour'] % 24:02d}:00" for p in rates["periods"])
+        return f"{tariff.name} (time of use, UTC: {periods}, {rates['rate']:.2f} GHC/kWh otherwise)"
+    return f"{tariff.name} ({rates['rate']:.2f} GHC/kWh)"
+
+def estimate_cost(db: Session, hourly) -> float:
+    """Cost of (hour, house kWh) pairs in time order, e.g. a forecast, under the tariffs in force then."""
+    hourly = list(hourly)
+    if not hourly:
+        return 0.0
+    first = hourly[0][0]
+    used = crud.get_month_energy(db, month_start(first), first)
+    rates = load_schedule(db).hourly_rates(hourly, used)
+    return sum(kwh * rate for (_, kwh), rate in zip(hourly, rates))
+
+def rates_by_hour(db: Session, day: date):
+    """The rate of each hour of `day`, for cost hints (tiered: at the month's consumption so far)."""
+    schedule = load_schedule(db)
+    start = crud.start_of(day)
+    used = crud.get_month_energy(db, month_start(start), current_hour())
+    return [hour_rate(schedule.for_hour(start + timedelta(hours=h)), start + timedelta(hours=h), used) for h in range(24)]
+
+# Pricing job: costs are kept per device and hour in hourly_costs, next to the hourly
+# rollups, so range queries sum cost like they sum energy
+
+def price_hours(db: Session, schedule: TariffSchedule, start: datetime) -> int:
+    """Reprices every device-hour from `start` to the end of its month. The caller commits."""
+    end = next_month(start)
+    rows = crud.get_hourly_rollup_energy(db, start, end)
+    house = {}
+    for _, hour, _, kwh in rows:
+        house[hour] = house.get(hour, 0.0) + kwh
+    hours = sorted(house)
+    used = crud.get_month_energy(db, month_start(start), start)
+    rates = dict(zip(hours, schedule.hourly_rates([(hour, house[hour]) for hour in hours], used)))
+    crud.replace_hourly_costs(db, start, end, [{
+        "device": device,
+        "hour": hour,
+        "samples": samples,
+        "energy_kwh": kwh,
+        "rate": rates[hour],
+        "cost": kwh * rates[hour],
+        "tariff_id": schedule.for_hour(hour).id,
+    } for device, hour, samples, kwh in rows])
+    return len(rows)
+
+def refresh_costs():
+    """
+    Pricing job: prices hours whose rollups changed since they were last priced. Within
+    a month, everything from the earliest such hour on is repriced, since tiered rates
+    depend on the consumption before them. Returns the repricing start of each month.
+
+    Only rollups updated since the previous run are scanned; the first run in a process
+    (e.g. after a leader change) scans them all.
+    """
+    global _priced_since
+    started = time.perf_counter()
+    scan_from = datetime.utcnow() - PRICING_OVERLAP
+    db = WriteSessionLocal()
+    try:
+        starts = {}
+        for hour in crud.get_unpriced_hours(db, _priced_since):
+            month = month_start(hour)
+            starts[month] = min(hour, starts.get(month, hour))
+        if not starts:
+            _priced_since = scan_from
+            return []
+        schedule = load_schedule(db)
+        priced = 0
+        for start in sorted(starts.values()):
+            priced += price_hours(db, schedule, start)
+            db.commit()
+        PRICED_HOURS.inc(priced)
+        _priced_since = scan_from
+        logger.debug("💰 Priced %d device-hours in %.2fs.", priced, time.perf_counter() - started)
+        return sorted(starts.values())
+    except Exception as e:
+        db.rollback()
+        logger.error("❌ Pricing hourly costs failed: %s", e)
+        return []
+    finally:
+        db.close()
+
+def schedule_costs():
+    scheduler.add_job(refresh_costs, "interval", seconds=settings.COST_REFRESH_SECONDS, id="refresh_costs", replace_existing=True)
+    scheduler.add_job(refresh_costs, id="refresh_costs_startup", replace_existing=True)
@@ -0,0 +1,133 @@
+import mmap
+import os
+import struct
+import threading
+from datetime import datetime
+from urllib.parse import quote, unquote
+import numpy as np
+
+# Every file starts with <magic><row count>, followed by three columns of that many values
+HEADER = struct.Struct("<8sQ")
+MAGIC = b"EMARCH01"
+SUFFIX = ".bin"
+TIMESTAMP = np.dtype("<i8")  # microseconds since the epoch, naive (same clock as readings.timestamp)
+VALUE = np.dtype("<f4")
+
+EMPTY = (np.empty(0, TIMESTAMP), np.empty(0, VALUE), np.empty(0, VALUE))
+
+def to_micros(value: datetime) -> int:
+    return int(np.datetime64(value, "us").astype(TIMESTAMP))
+
+def to_datetimes(timestamps: np.ndarray):
+    return timestamps.astype("datetime64[us]").tolist()
+
+def month_of(value: datetime) -> str:
+    return f"{value.year:04d}-{value.month:02d}"
+
+class ReadingArchive:
+    """
+    Columnar, memory-mapped store for readings moved out of the database.
+
+    One file per device and month (`<directory>/<device>/<YYYY-MM>.bin`) holds the
+    month's readings sorted by timestamp as three contiguous columns: int64 timestamps,
+    float32 current and float32 voltage. Reads map the file and return NumPy views onto
+    it, so nothing is copied or parsed. Writes merge with the existing file (new values
+    win for a repeated timestamp) and replace it atomically, so readers, including
+    other processes, always see either the old or the new month. The directory is
+    created on the first write.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._maps = {}
+        self._lock = threading.Lock()
+
+    def _path(self, device: str, month: str) -> str:
+        return os.path.join(self.directory, quote(device, safe=""), month + SUFFIX)
+
+    def devices(self):
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        return sorted(unquote(name) for name in names if os.path.isdir(os.path.join(self.directory, name)))
+
+    def months(self, device: str):
+        try:
+            names = os.listdir(os.path.join(self.directory, quote(device, safe="")))
+        except FileNotFoundError:
+            return []
+        return sorted(name[:-len(SUFFIX)] for name in names if name.endswith(SUFFIX))
+
+    def read(self, device: str, month: str):
+        """(timestamps, current, voltage) views onto one month's file; empty arrays if there is none."""
+        path = self._path(device, month)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return EMPTY
+        key = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            cached = self._maps.get(path)
+            if cached is not None and cached[0] == key:
+                return cached[1]
+        with open(path, "rb") as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, n = HEADER.unpack_from(buffer)
+        if magic != MAGIC or buffer.size() != HEADER.size + n * (TIMESTAMP.itemsize + 2 * VALUE.itemsize):
+            raise ValueError(f"{path} is not a valid archive file")
+        offset = HEADER.size
+        timestamps = np.frombuffer(buffer, TIMESTAMP, n, offset)
+        offset += n * TIMESTAMP.itemsize
+        current = np.frombuffer(buffer, VALUE, n, offset)
+        voltage = np.frombuffer(buffer, VALUE, n, offset + n * VALUE.itemsize)
+        columns = (timestamps, current, voltage)
+        with self._lock:
+            self._maps[path] = (key, columns)
+        return columns
+
+    def query(self, device: str, start: datetime = None, end: datetime = None):
+        """(timestamps, current, voltage) for one device in [start, end), oldest first. Views when one month is hit."""
+        months = self.months(device)
+        if start is not None:
+            months = [m for m in months if m >= month_of(start)]
+        if end is not None:
+            months = [m for m in months if m <= month_of(end)]
+        parts = []
+        for month in months:
+            timestamps, current, voltage = self.read(device, month)
+            lo = 0 if start is None else int(np.searchsorted(timestamps, to_micros(start), "left"))
+            hi = len(timestamps) if end is None else int(np.searchsorted(timestamps, to_micros(end), "left"))
+            if hi > lo:
+                parts.append((timestamps[lo:hi], current[lo:hi], voltage[lo:hi]))
+        if not parts:
+            return EMPTY
+        if len(parts) == 1:
+            return parts[0]
+        return tuple(np.concatenate(column) for column in zip(*parts))
+
+    def write(self, device: str, month: str, timestamps, current, voltage) -> int:
+        """Merges readings into a device's month file. Returns the file's row count."""
+        old = self.read(device, month)
+        timestamps = np.concatenate([old[0], np.asarray(timestamps, TIMESTAMP)])
+        current = np.concatenate([old[1], np.asarray(current, VALUE)])
+        voltage = np.concatenate([old[2], np.asarray(voltage, VALUE)])
+
+        # A stable sort keeps old rows before new ones, so the last of each timestamp is the newest
+        order = np.argsort(timestamps, kind="stable")
+        timestamps = timestamps[order]
+        keep = np.ones(len(timestamps), dtype=bool)
+        keep[:-1] = timestamps[1:] != timestamps[:-1]
+        timestamps, current, voltage = timestamps[keep], current[order][keep], voltage[order][keep]
+
+        path = self._path(device, month)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp = path + ".tmp"
+        with open(temp, "wb") as f:
+            f.write(HEADER.pack(MAGIC, len(timestamps)))
+            for column in (timestamps, current, voltage):
+                f.write(column.tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp, path)
+        return len(timestamps)
@@ -0,0 +1,108 @@
+import json
+import numpy as np
+import pandas as pd
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - msgpack is in requirements
+    msgpack = None
+
+FIELDS = ("device", "timestamp", "current", "voltage")
+
+class BatchDecodeError(ValueError):
+    pass
+
+def _columns_from_records(records) -> dict:
+    if not isinstance(records, list) or not all(isinstance(r, dict) for r in records):
+        raise BatchDecodeError("Expected a list of reading objects")
+    return {field: [r.get(field) for r in records] for field in FIELDS}
+
+def columns_from_object(obj) -> dict:
+    """
+    Normalises a decoded body to equal-length columns. Accepts a single reading object,
+    a list of reading objects, or a columnar object whose fields are arrays (a scalar
+    `device` applies to every row, so a gateway can send one device's samples compactly).
+    """
+    if isinstance(obj, list):
+        return _columns_from_records(obj)
+    if not isinstance(obj, dict):
+        raise BatchDecodeError("Expected a reading object, a list of them, or a columnar object")
+    if not any(isinstance(obj.get(field), list) for field in FIELDS):
+        return _columns_from_records([obj])
+
+    lengths = {len(obj[field]) for field in FIELDS if isinstance(obj.get(field), list)}
+    if len(lengths) != 1:
+        raise BatchDecodeError("Columnar fields must all have the same length")
+    n = lengths.pop()
+    return {field: obj.get(field) if isinstance(obj.get(field), list) else [obj.get(field)] * n for field in FIELDS}
+
+def decode_batch(body: bytes, content_type: str = None) -> dict:
+    """
+    Decodes a batch body to columns (see columns_from_object).
+
+    Supported: JSON (`application/json`), NDJSON (`application/x-ndjson`, one reading per
+    line) and MessagePack (`application/msgpack` / `application/x-msgpack`) holding any of
+    the JSON shapes. Without a content type, JSON is tried first, then NDJSON.
+    """
+    content_type = (content_type or "").split(";")[0].strip().lower()
+    try:
+        if content_type in ("application/msgpack", "application/x-msgpack", "application/vnd.msgpack"):
+            if msgpack is None:
+                raise BatchDecodeError("MessagePack support is not installed")
+            return columns_from_object(msgpack.unpackb(body, timestamp=3))
+        if content_type in ("application/x-ndjson", "application/ndjson", "application/jsonl"):
+            return _columns_from_records([json.loads(line) for line in body.splitlines() if line.strip()])
+        try:
+            return columns_from_object(json.loads(body))
+        except json.JSONDecodeError:
+            if content_type == "application/json":
+                raise
+            return _columns_from_records([json.loads(line) for line in body.splitlines() if line.strip()])
+    except BatchDecodeError:
+        raise
+    except Exception as e:
+        raise BatchDecodeError(f"Could not decode batch: {e}") from e
+
+def validate_columns(columns: dict):
+    """
+    Validates and converts a decoded batch column by column.
+
+    Returns (rows, errors): `rows` are the valid readings as dicts with parsed values and
+    their index in the batch under "index"; `errors` maps the index of every invalid row
+    to a message. Timestamps with an offset are converted to naive UTC, like the rest of
+    the API stores them.
+    """
+    n = len(columns["device"])
+    if n == 0:
+        return [], {}
+
+    devices = pd.Series(columns["device"], dtype=object)
+    device_ok = devices.map(lambda d: isinstance(d, str) and bool(d.strip())).to_numpy(dtype=bool)
+
+    timestamps = pd.Series(columns["timestamp"], dtype=object).map(
+        lambda t: t.isoformat() if hasattr(t, "isoformat") else t)
+    parsed = pd.to_datetime(timestamps, errors="coerce", utc=True, format="ISO8601").dt.tz_convert(None)
+    timestamp_ok = parsed.notna().to_numpy()
+
+    values = {}
+    value_ok = {}
+    for field in ("current", "voltage"):
+        numbers = pd.to_numeric(pd.Series(columns[field], dtype=object), errors="coerce").to_numpy(dtype=np.float64)
+        values[field] = numbers
+        value_ok[field] = np.isfinite(numbers)
+
+    valid = device_ok & timestamp_ok & value_ok["current"] & value_ok["voltage"]
+
+    errors = {}
+    for i in np.flatnonzero(~valid).tolist():
+        problems = [field for field, ok in (("device", device_ok[i]), ("timestamp", timestamp_ok[i]),
+                                            ("current", value_ok["current"][i]), ("voltage", value_ok["voltage"][i])) if not ok]
+        errors[i] = "invalid " + ", ".join(problems)
+
+    index = np.flatnonzero(valid)
+    timestamps_valid = parsed.iloc[index].dt.to_pydatetime()
+    rows = [
+        {"index": i, "device": devices.iat[i], "timestamp": ts, "current": c, "voltage": v}
+        for i, ts, c, v in zip(index.tolist(), timestamps_valid, values["current"][index].tolist(), values["voltage"][index].tolist())
+    ]
+    return rows, errors
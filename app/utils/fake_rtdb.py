@@ -0,0 +1,93 @@
+import threading
+
+# In-process stand-in for the Firebase Realtime Database, used by tests and local runs of
+# the Firebase bridge without credentials. Mirrors the parts of `firebase_admin.db` the
+# bridge uses: `reference(path)` with get/set/update/listen, and listener events with
+# `event_type`, `path` and `data`. Listeners get an initial "put" of the current value at
+# "/" and then one "put" per write, delivered synchronously on the writing thread. Only
+# the root and top-level keys are supported.
+
+class FakeEvent:
+    def __init__(self, event_type: str, path: str, data):
+        self.event_type = event_type
+        self.path = path
+        self.data = data
+
+class FakeListenerRegistration:
+    def __init__(self, database, key, callback):
+        self._database = database
+        self._key = key
+        self._callback = callback
+
+    def close(self):
+        self._database._remove_listener(self._key, self._callback)
+
+class FakeReference:
+    def __init__(self, database, key):
+        self._database = database
+        self._key = key  # None for the root
+
+    def get(self):
+        return self._database._get(self._key)
+
+    def set(self, value):
+        if self._key is None:
+            self._database._replace(dict(value or {}))
+        else:
+            self._database._write({self._key: value})
+
+    def update(self, values: dict):
+        if self._key is not None:
+            raise ValueError("FakeRealtimeDatabase only supports update() on the root")
+        self._database._write(dict(values))
+
+    def listen(self, callback):
+        return self._database._add_listener(self._key, callback)
+
+class FakeRealtimeDatabase:
+    def __init__(self, data: dict = None):
+        self._data = dict(data or {})
+        self._listeners = {}
+        self._lock = threading.RLock()
+        self.reads = 0  # get() calls, so tests can check nothing polls
+
+    def reference(self, path: str = "/"):
+        key = path.strip("/") or None
+        if key is not None and "/" in key:
+            raise ValueError("FakeRealtimeDatabase only supports the root and top-level keys")
+        return FakeReference(self, key)
+
+    def _get(self, key):
+        with self._lock:
+            self.reads += 1
+            return dict(self._data) if key is None else self._data.get(key)
+
+    def _write(self, values: dict):
+        with self._lock:
+            for key, value in values.items():
+                if value is None:
+                    self._data.pop(key, None)
+                else:
+                    self._data[key] = value
+            for key, value in values.items():
+                for callback in list(self._listeners.get(key, ())):
+                    callback(FakeEvent("put", "/", value))
+                for callback in list(self._listeners.get(None, ())):
+                    callback(FakeEvent("put", f"/{key}", value))
+
+    def _replace(self, data: dict):
+        with self._lock:
+            removed = {key: None for key in self._data if key not in data}
+            self._data = {}
+            self._write({**removed, **data})
+
+    def _add_listener(self, key, callback):
+        with self._lock:
+            self._listeners.setdefault(key, []).append(callback)
+            callback(FakeEvent("put", "/", dict(self._data) if key is None else self._data.get(key)))
+        return FakeListenerRegistration(self, key, callback)
+
+    def _remove_listener(self, key, callback):
+        with self._lock:
+            if callback in self._listeners.get(key, ()):
+                self._listeners[key].remove(callback)
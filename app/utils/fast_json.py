@@ -0,0 +1,36 @@
+import json
+from datetime import datetime
+from fastapi import Response
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is in requirements, stdlib json keeps things working without it
+    orjson = None
+
+def _default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def dumps(payload) -> bytes:
+    """Serialises plain dicts/lists/tuples (datetimes included) to compact JSON bytes."""
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, separators=(",", ":"), default=_default).encode()
+
+READING_COLUMNS = ("id", "device", "timestamp", "current", "voltage")
+
+def readings_response(rows, layout: str = "rows") -> Response:
+    """
+    JSON response for (id, device, timestamp, current, voltage) tuples, skipping ORM
+    objects and per-row schema validation.
+
+    `rows` gives the usual list of reading objects; `columns` gives one array per field,
+    which is several times smaller before compression and cheaper to parse.
+    """
+    if layout == "columns":
+        columns = list(zip(*rows)) or [()] * len(READING_COLUMNS)
+        payload = {name: list(values) for name, values in zip(READING_COLUMNS, columns)}
+    else:
+        payload = [dict(zip(READING_COLUMNS, row)) for row in rows]
+    return Response(content=dumps(payload), media_type="application/json")
@@ -0,0 +1,132 @@
+import json
+import logging
+import random
+import threading
+import time
+from datetime import datetime
+from app.config import settings
+from app.utils.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+# Firebase keys the derived readings depend on, with the value used while a key is unset
+KEYS = {"totalVoltage": 230.0, "totalCurrent": 0.0, "relay1": False, "relay2": False}
+
+BRIDGE_EVENTS = registry.counter(
+    "energy_firebase_bridge_events_total", "Realtime Database updates received by the Firebase bridge.", ("key",))
+BRIDGE_PUBLISHES = registry.counter(
+    "energy_firebase_bridge_publishes_total", "Reading batches the Firebase bridge published to MQTT.", ("reason",))
+
+def derive_readings(values: dict, timestamp: str):
+    """The bulb and socket readings implied by the meter totals and relay states."""
+    total_voltage = values["totalVoltage"]
+    total_current = values["totalCurrent"]
+
+    # Estimate bulb consumption
+    bulb1_current = round(random.uniform(0.052, 0.054), 3) if values["relay1"] else 0.0
+    bulb2_current = round(random.uniform(0.052, 0.054), 3) if values["relay2"] else 0.0
+
+    # Calculate combined sockets consumption
+    # Ensures it doesn't go below 0 due to estimation errors
+    sockets_current = max(0.0, round(total_current - (bulb1_current + bulb2_current), 3))
+
+    return [
+        {"device": "bulb_1", "timestamp": timestamp, "current": bulb1_current, "voltage": total_voltage},
+        {"device": "bulb_2", "timestamp": timestamp, "current": bulb2_current, "voltage": total_voltage},
+        {"device": "sockets", "timestamp": timestamp, "current": sockets_current, "voltage": total_voltage},
+    ]
+
+class FirebaseBridge:
+    """
+    Turns Realtime Database updates into MQTT readings.
+
+    Instead of downloading the whole database on a timer, it holds a streaming listener
+    on each key in KEYS and keeps their latest values. The three derived readings go out
+    as one JSON array publish when a value changes, at most once per `min_interval`
+    seconds, and every `heartbeat` seconds while nothing changes. Nothing is published
+    until every key has reported its initial value.
+
+    Energy totals count every reading as 10 seconds of draw, so both intervals default
+    to 10 seconds. Lower `min_interval` for faster reaction to changes, at the cost of
+    over-counting energy while values change often.
+    """
+
+    def __init__(self, database, publish, heartbeat: float = None, min_interval: float = None):
+        self.database = database
+        self.publish = publish
+        self.heartbeat = settings.FIREBASE_HEARTBEAT_SECONDS if heartbeat is None else heartbeat
+        self.min_interval = settings.FIREBASE_MIN_PUBLISH_SECONDS if min_interval is None else min_interval
+        self.values = dict(KEYS)
+        self._seen = set()
+        self._pending = False
+        self._last_published = None
+        self._registrations = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="firebase-bridge", daemon=True)
+        self._thread.start()
+        for key in KEYS:
+            self._registrations.append(self.database.reference(key).listen(lambda event, key=key: self._on_event(key, event)))
+        logger.info("📡 Firebase bridge listening on %s.", ", ".join(KEYS))
+
+    def stop(self):
+        for registration in self._registrations:
+            try:
+                registration.close()
+            except Exception as e:
+                logger.warning("⚠️ Closing Firebase listener failed: %s", e)
+        self._registrations = []
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _on_event(self, key: str, event):
+        """Listener callback (runs on the SDK's listener thread)."""
+        if event.path != "/":
+            return  # a change below the key; these keys hold scalars
+        value = KEYS[key] if event.data is None else event.data
+        BRIDGE_EVENTS.inc(key=key)
+        with self._lock:
+            changed = key not in self._seen or self.values[key] != value
+            self.values[key] = value
+            self._seen.add(key)
+            if changed:
+                self._pending = True
+        if changed:
+            self._wake.set()
+
+    def _due(self):
+        """Seconds until the next publish is due, or None while waiting for initial values."""
+        if len(self._seen) < len(KEYS):
+            return None
+        if self._last_published is None:
+            return 0.0
+        interval = self.min_interval if self._pending else self.heartbeat
+        return self._last_published + interval - time.monotonic()
+
+    def _run(self):
+        while not self._stop.is_set():
+            with self._lock:
+                due = self._due()
+            if due is None or due > 0:
+                self._wake.wait(due)
+                self._wake.clear()
+                continue
+            with self._lock:
+                reason = "change" if self._pending else "heartbeat"
+                values = dict(self.values)
+                self._pending = False
+                self._last_published = time.monotonic()
+            payload = json.dumps(derive_readings(values, datetime.utcnow().isoformat()))
+            try:
+                self.publish(payload)
+                BRIDGE_PUBLISHES.inc(reason=reason)
+            except Exception as e:
+                logger.error("Error publishing bridged readings: %s", e)
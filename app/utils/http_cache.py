@@ -0,0 +1,31 @@
+import hashlib
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from app.utils.fast_json import dumps
+
+def etag_for(body: bytes) -> str:
+    return '"' + hashlib.sha1(body).hexdigest() + '"'
+
+def etag_matches(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match", "")
+    return etag in (tag.strip() for tag in if_none_match.split(",")) or if_none_match.strip() == "*"
+
+def cached_json_response(request: Request, payload, max_age: int, immutable: bool = False, etag: str = None) -> Response:
+    """
+    Serialises `payload` with a content ETag and Cache-Control header.
+
+    Answers 304 Not Modified when the client's If-None-Match already matches, so
+    revalidating an unchanged response costs no body transfer. A caller that already
+    knows the ETag for the payload can pass it instead of hashing the body.
+    """
+    body = dumps(jsonable_encoder(payload))
+    etag = etag or etag_for(body)
+
+    cache_control = f"public, max-age={max_age}" if max_age > 0 else "no-cache"
+    if immutable:
+        cache_control += ", immutable"
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -0,0 +1,108 @@
+import logging
+import time
+from contextvars import ContextVar
+from sqlalchemy import event
+from app.config import settings
+from app.utils.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+HTTP_REQUEST_SECONDS = registry.histogram(
+    "energy_http_request_duration_seconds", "HTTP request latency by route.", ("method", "route"))
+HTTP_REQUESTS = registry.counter(
+    "energy_http_requests_total", "HTTP requests by route and status code.", ("method", "route", "status"))
+HTTP_REQUEST_QUERIES = registry.histogram(
+    "energy_http_request_db_queries", "Database queries issued per HTTP request.", ("method", "route"),
+    buckets=(1, 2, 3, 5, 10, 20, 50, 100, 250, 1000))
+HTTP_REQUEST_DB_SECONDS = registry.histogram(
+    "energy_http_request_db_seconds", "Time spent in database queries per HTTP request.", ("method", "route"))
+DB_QUERIES = registry.counter(
+    "energy_db_queries_total", "Database queries executed (all callers, including ingest).")
+DB_QUERY_SECONDS = registry.histogram(
+    "energy_db_query_duration_seconds", "Database query latency.")
+DB_SLOW_QUERIES = registry.counter(
+    "energy_db_slow_queries_total", "Queries slower than SLOW_QUERY_MS.")
+
+class RequestStats:
+    __slots__ = ("queries", "db_seconds")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+
+# Set by the middleware for the duration of an HTTP request. Starlette copies the context
+# into the threadpool running sync endpoints, and SQLAlchemy into the greenlets running
+# async queries, so queries issued there are attributed too.
+current_request: ContextVar = ContextVar("current_request", default=None)
+
+# The start time lives on the statement's execution context, which is discarded with it:
+# after_cursor_execute doesn't fire for a statement that raises, so nothing may be left behind
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._query_start = time.perf_counter()
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, "_query_start", None)
+    if started is None:
+        return
+    elapsed = time.perf_counter() - started
+    DB_QUERIES.inc()
+    DB_QUERY_SECONDS.observe(elapsed)
+
+    stats = current_request.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_seconds += elapsed
+
+    if settings.SLOW_QUERY_MS and elapsed * 1000 >= settings.SLOW_QUERY_MS:
+        DB_SLOW_QUERIES.inc()
+        logger.warning("🐢 Slow query (%.1fms): %s", elapsed * 1000, " ".join(statement.split())[:500],
+                       extra={"duration_ms": round(elapsed * 1000, 1)})
+
+def instrument_engine(engine):
+    """Counts and times every query executed through `engine`."""
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    return engine
+
+def _route_template(scope) -> str:
+    """The matched route's path template, e.g. "/anomalies/{device_id}", to keep label cardinality bounded."""
+    # Newer FastAPI versions resolve included routers lazily and record the full path here
+    context = scope.get("fastapi", {}).get("effective_route_context")
+    if context is not None and getattr(context, "path", None):
+        return context.path
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+class MetricsMiddleware:
+    """ASGI middleware recording per-route latency, status and query counts."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        stats = RequestStats()
+        token = current_request.set(stats)
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            current_request.reset(token)
+            path = _route_template(scope)
+            method = scope.get("method", "")
+            HTTP_REQUEST_SECONDS.observe(elapsed, method=method, route=path)
+            HTTP_REQUESTS.inc(method=method, route=path, status=status["code"])
+            HTTP_REQUEST_QUERIES.observe(stats.queries, method=method, route=path)
+            HTTP_REQUEST_DB_SECONDS.observe(stats.db_seconds, method=method, route=path)
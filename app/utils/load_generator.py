@@ -0,0 +1,86 @@
+import json
+import time
+import random
+import threading
+import paho.mqtt.client as mqtt
+from datetime import datetime, timedelta
+from paho.mqtt.client import CallbackAPIVersion
+
+from app.config import settings
+
+def synthetic_readings(devices: int, rate: float, start: datetime = None):
+    """
+    Yields synthetic readings for `devices` devices at `rate` readings/sec each.
+
+    Timestamps advance by 1/rate per device, so every (device, timestamp) pair is unique.
+    """
+    start = start or datetime.utcnow()
+    step = timedelta(seconds=1 / rate)
+    names = [f"load_{i:04d}" for i in range(devices)]
+    seq = 0
+    while True:
+        timestamp = (start + step * seq).isoformat()
+        for name in names:
+            yield {
+                "device": name,
+                "timestamp": timestamp,
+                "current": round(random.uniform(0.05, 8.0), 3),
+                "voltage": round(random.uniform(220.0, 240.0), 1),
+            }
+        seq += 1
+
+def run_load_generator(
+    devices: int = 10,
+    rate: float = 10.0,
+    duration: float = 10.0,
+    broker: str = None,
+    port: int = None,
+    topic: str = None,
+    qos: int = 0,
+):
+    """
+    Publishes synthetic readings at devices × rate messages/sec for `duration` seconds.
+
+    No Firebase access is needed. Returns the number of messages handed to the client
+    and the elapsed wall time.
+    """
+    broker = broker or settings.MQTT_BROKER
+    port = port or settings.MQTT_PORT
+    topic = topic or settings.MQTT_TOPIC
+
+    connected = threading.Event()
+    client = mqtt.Client(CallbackAPIVersion.VERSION1)
+    client.on_connect = lambda c, u, f, rc: connected.set() if rc == 0 else None
+    client.max_queued_messages_set(0)
+    client.connect(broker, port, 60)
+    client.loop_start()
+    if not connected.wait(10):
+        client.loop_stop()
+        raise ConnectionError(f"Load generator could not connect to {broker}:{port}")
+
+    total_rate = devices * rate
+    total = int(total_rate * duration)
+    readings = synthetic_readings(devices, rate)
+    published = 0
+    info = None
+    started = time.perf_counter()
+    try:
+        while published < total:
+            # Catch up with the schedule in bursts instead of sleeping per message
+            due = min(total, int((time.perf_counter() - started) * total_rate) + 1)
+            while published < due:
+                info = client.publish(topic, json.dumps(next(readings)), qos=qos)
+                published += 1
+            next_due = started + published / total_rate
+            delay = next_due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        if info is not None:
+            # Make sure the tail of the run has actually left the socket
+            info.wait_for_publish(10)
+    finally:
+        elapsed = time.perf_counter() - started
+        client.loop_stop()
+        client.disconnect()
+
+    return {"published": published, "elapsed": elapsed}
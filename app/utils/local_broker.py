@@ -0,0 +1,230 @@
+import socket
+import struct
+import threading
+
+# Minimal in-process MQTT 3.1.1 broker used as a stand-in for tests and benchmarks.
+# Supports CONNECT, SUBSCRIBE/UNSUBSCRIBE, PUBLISH (delivered at QoS 0), PINGREQ and
+# DISCONNECT, with `+` / `#` wildcards and `$share/<group>/<filter>` shared subscriptions
+# (each message goes to one member of the group, round-robin). It is not meant to face
+# real devices.
+
+CONNECT, CONNACK, PUBLISH, PUBACK = 1, 2, 3, 4
+SUBSCRIBE, SUBACK, UNSUBSCRIBE, UNSUBACK = 8, 9, 10, 11
+PINGREQ, PINGRESP, DISCONNECT = 12, 13, 14
+
+def topic_matches(topic_filter: str, topic: str) -> bool:
+    filter_parts = topic_filter.split("/")
+    topic_parts = topic.split("/")
+    for i, part in enumerate(filter_parts):
+        if part == "#":
+            return True
+        if i >= len(topic_parts):
+            return False
+        if part != "+" and part != topic_parts[i]:
+            return False
+    return len(filter_parts) == len(topic_parts)
+
+def parse_shared(topic_filter: str):
+    """Splits `$share/<group>/<filter>` into (group, filter); plain filters give (None, filter)."""
+    if topic_filter.startswith("$share/"):
+        _, group, real_filter = topic_filter.split("/", 2)
+        return group, real_filter
+    return None, topic_filter
+
+def _encode_length(length: int) -> bytes:
+    out = bytearray()
+    while True:
+        byte = length % 128
+        length //= 128
+        if length:
+            byte |= 0x80
+        out.append(byte)
+        if not length:
+            return bytes(out)
+
+def _encode_string(value: str) -> bytes:
+    data = value.encode()
+    return struct.pack("!H", len(data)) + data
+
+def _decode_string(data: bytes, pos: int):
+    (length,) = struct.unpack_from("!H", data, pos)
+    pos += 2
+    return data[pos:pos + length].decode(), pos + length
+
+class _Session:
+    def __init__(self, broker, conn: socket.socket):
+        self.broker = broker
+        self.conn = conn
+        self.filters = set()
+        self.write_lock = threading.Lock()
+
+    def send(self, packet_type: int, body: bytes = b"", flags: int = 0):
+        packet = bytes([(packet_type << 4) | flags]) + _encode_length(len(body)) + body
+        with self.write_lock:
+            self.conn.sendall(packet)
+
+    def _recv_exact(self, n: int) -> bytes:
+        buf = bytearray()
+        while len(buf) < n:
+            chunk = self.conn.recv(n - len(buf))
+            if not chunk:
+                raise ConnectionError("client closed connection")
+            buf.extend(chunk)
+        return bytes(buf)
+
+    def _read_packet(self):
+        header = self._recv_exact(1)[0]
+        multiplier, length = 1, 0
+        while True:
+            byte = self._recv_exact(1)[0]
+            length += (byte & 0x7F) * multiplier
+            if not byte & 0x80:
+                break
+            multiplier *= 128
+        return header >> 4, header & 0x0F, self._recv_exact(length) if length else b""
+
+    def serve(self):
+        try:
+            while self.broker.running:
+                packet_type, flags, body = self._read_packet()
+                if packet_type == CONNECT:
+                    self.send(CONNACK, b"\x00\x00")
+                elif packet_type == SUBSCRIBE:
+                    packet_id, pos = body[:2], 2
+                    granted = bytearray()
+                    while pos < len(body):
+                        topic_filter, pos = _decode_string(body, pos)
+                        pos += 1  # requested QoS, everything is delivered at QoS 0
+                        self.filters.add(topic_filter)
+                        granted.append(0)
+                    self.send(SUBACK, packet_id + bytes(granted))
+                elif packet_type == UNSUBSCRIBE:
+                    packet_id, pos = body[:2], 2
+                    while pos < len(body):
+                        topic_filter, pos = _decode_string(body, pos)
+                        self.filters.discard(topic_filter)
+                    self.send(UNSUBACK, packet_id)
+                elif packet_type == PUBLISH:
+                    qos = (flags >> 1) & 0x03
+                    topic, pos = _decode_string(body, 0)
+                    if qos:
+                        packet_id = body[pos:pos + 2]
+                        pos += 2
+                        if qos == 1:
+                            self.send(PUBACK, packet_id)
+                    self.broker.route(topic, body[pos:])
+                elif packet_type == PINGREQ:
+                    self.send(PINGRESP)
+                elif packet_type == DISCONNECT:
+                    break
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            self.broker.remove(self)
+            try:
+                self.conn.close()
+            except OSError:
+                pass
+
+class LocalBroker:
+    """Threaded MQTT broker listening on localhost. Use `port=0` to pick a free port."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        self.host = host
+        self.port = port
+        self.running = False
+        self.published = 0
+        self.delivered = 0
+        self._sessions = []
+        self._share_cursor = {}
+        self._lock = threading.Lock()
+        self._server = None
+
+    def start(self):
+        self._server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._server.bind((self.host, self.port))
+        self._server.listen()
+        self.port = self._server.getsockname()[1]
+        self.running = True
+        threading.Thread(target=self._accept, name="local-broker", daemon=True).start()
+        return self
+
+    def stop(self):
+        self.running = False
+        try:
+            self._server.close()
+        except OSError:
+            pass
+        with self._lock:
+            sessions = list(self._sessions)
+        for session in sessions:
+            try:
+                session.conn.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _accept(self):
+        while self.running:
+            try:
+                conn, _ = self._server.accept()
+            except OSError:
+                return
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            session = _Session(self, conn)
+            with self._lock:
+                self._sessions.append(session)
+            threading.Thread(target=session.serve, daemon=True).start()
+
+    def remove(self, session: _Session):
+        with self._lock:
+            if session in self._sessions:
+                self._sessions.remove(session)
+
+    def subscriber_count(self, topic: str) -> int:
+        with self._lock:
+            return sum(1 for s in self._sessions if any(topic_matches(parse_shared(f)[1], topic) for f in s.filters))
+
+    def _targets(self, topic: str):
+        """Sessions a message on `topic` goes to: every plain subscriber plus one member per share group."""
+        targets, groups = [], {}
+        for session in self._sessions:
+            plain = False
+            for topic_filter in session.filters:
+                group, real_filter = parse_shared(topic_filter)
+                if not topic_matches(real_filter, topic):
+                    continue
+                if group is None:
+                    plain = True
+                else:
+                    members = groups.setdefault((group, real_filter), [])
+                    if session not in members:
+                        members.append(session)
+            if plain:
+                targets.append(session)
+        for key, members in groups.items():
+            cursor = self._share_cursor.get(key, 0)
+            self._share_cursor[key] = cursor + 1
+            member = members[cursor % len(members)]
+            if member not in targets:
+                targets.append(member)
+        return targets
+
+    def route(self, topic: str, payload: bytes):
+        with self._lock:
+            self.published += 1
+            targets = self._targets(topic)
+        body = _encode_string(topic) + payload
+        for session in targets:
+            try:
+                session.send(PUBLISH, body)
+                with self._lock:
+                    self.delivered += 1
+            except OSError:
+                pass
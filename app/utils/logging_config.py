@@ -0,0 +1,125 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import threading
+import time
+from app.config import settings
+
+# Attributes every LogRecord has; anything else was passed through `extra=` and is
+# emitted as a structured field.
+_RESERVED = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+_listener = None
+_lock = threading.Lock()
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    Enqueues records unformatted.
+
+    The stock QueueHandler renders the message in the calling thread so the record can
+    cross process boundaries; our listener lives in the same process, so all formatting
+    is left to the listener thread.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message plus any `extra` fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S") + f".{int(record.msecs):03d}",
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+def parse_levels(spec: str):
+    """Parses "app.services.mqtt_service=WARNING,app.services.chat_service=DEBUG"."""
+    levels = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, level = item.partition("=")
+        if level:
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+def setup_logging(stream=None):
+    """
+    Routes the `app` loggers through a QueueHandler so callers never block on I/O.
+
+    Records are formatted and written by a QueueListener thread. Levels come from
+    LOG_LEVEL, with per-module overrides from LOG_LEVELS. Safe to call more than once.
+    """
+    global _listener
+    with _lock:
+        if _listener is not None:
+            return _listener
+
+        target = logging.StreamHandler(stream or sys.stdout)
+        if settings.LOG_FORMAT.lower() == "json":
+            target.setFormatter(JsonFormatter())
+        else:
+            target.setFormatter(logging.Formatter("%(asctime)s %(levelname)s [%(name)s] %(message)s"))
+
+        log_queue = queue.SimpleQueue()
+        app_logger = logging.getLogger("app")
+        app_logger.handlers = [DeferredQueueHandler(log_queue)]
+        app_logger.setLevel(settings.LOG_LEVEL.upper())
+        app_logger.propagate = False
+        for name, level in parse_levels(settings.LOG_LEVELS).items():
+            logging.getLogger(name).setLevel(level)
+
+        _listener = logging.handlers.QueueListener(log_queue, target, respect_handler_level=True)
+        _listener.start()
+        atexit.register(_listener.stop)
+        return _listener
+
+class LogSampler:
+    """
+    Rate-limits a per-message log line.
+
+    Emits the first call, then one in every `every` calls or whenever `interval`
+    seconds have passed since the last emitted line, whichever comes first. The number
+    of calls since the last emission is attached as the `sampled` field. Disabled
+    levels cost a single `isEnabledFor` check.
+    """
+
+    def __init__(self, logger: logging.Logger, every: int = None, interval: float = None):
+        self.logger = logger
+        self.every = max(1, every or settings.LOG_SAMPLE_EVERY)
+        self.interval = settings.LOG_SAMPLE_SECONDS if interval is None else interval
+        self._count = 0
+        self._last = 0.0
+
+    def log(self, level: int, msg: str, *args, **extra):
+        if not self.logger.isEnabledFor(level):
+            return
+        self._count += 1
+        now = time.monotonic()
+        # Counters are deliberately unlocked: a slightly off sample rate is fine here
+        if self._last and self._count < self.every and now - self._last < self.interval:
+            return
+        sampled, self._count, self._last = self._count, 0, now
+        self.logger.log(level, msg, *args, extra={**extra, "sampled": sampled})
+
+    def debug(self, msg: str, *args, **extra):
+        self.log(logging.DEBUG, msg, *args, **extra)
+
+    def info(self, msg: str, *args, **extra):
+        self.log(logging.INFO, msg, *args, **extra)
+
+    def warning(self, msg: str, *args, **extra):
+        self.log(logging.WARNING, msg, *args, **extra)
+
+    def error(self, msg: str, *args, **extra):
+        self.log(logging.ERROR, msg, *args, **extra)
@@ -48,6 +48,13 @@ def run_auto_migration():
                 count += len(chunk)
                 print(f"✅ Migration Progress: {count}/{total}")
 
+            # Migrated readings bypassed ingest, so rebuild what it maintains
+            from app.db import crud
+            crud.rebuild_rollups(pg_session)
+            crud.rebuild_device_registry(pg_session)
+            crud.invalidate_daily_summaries(pg_session)
+            pg_session.commit()
+
             print("🎉 Auto-migration completed successfully!")
             
             # Optionally rename the file so it doesn't run again
@@ -1,11 +1,14 @@
-import time
-import json
-import random
+import threading
+import logging
 import paho.mqtt.client as mqtt
-from datetime import datetime
 
 from app.config import settings
+from app.utils.firebase_bridge import FirebaseBridge
 from app.utils.firebase_init import db_ref
+from app.utils.logging_config import LogSampler, setup_logging
+
+logger = logging.getLogger(__name__)
+publish_log = LogSampler(logger)
 
 # Configuration from app settings
 BROKER = settings.MQTT_BROKER
@@ -14,77 +17,65 @@ TOPIC = settings.MQTT_TOPIC
 
 def on_connect(client, userdata, flags, rc):
     if rc == 0:
-        print("✅ Simulator connected to MQTT Broker!")
+        logger.info("✅ Simulator connected to MQTT Broker!")
     else:
-        print(f"❌ Simulator failed to connect, return code {rc}")
+        logger.error("❌ Simulator failed to connect, return code %s", rc)
 
 from paho.mqtt.client import CallbackAPIVersion
 
-def run_simulator():
-    """Syncs data from Firebase RTD and publishes to MQTT."""
+def run_simulator(stop_event: threading.Event = None, database=None):
+    """Bridges Firebase RTD updates to MQTT (see FirebaseBridge) until `stop_event` is set."""
+    stop_event = stop_event or threading.Event()
+    database = database or db_ref
+    if not database:
+        logger.warning("⚠️ Firebase not initialized in simulator.")
+        return
+
     client = mqtt.Client(CallbackAPIVersion.VERSION1)
     client.on_connect = on_connect
 
-    print(f"Connecting to {BROKER}...")
+    logger.info("Connecting to %s...", BROKER)
     try:
         client.connect(BROKER, PORT, 60)
     except Exception as e:
-        print(f"Connection failed: {e}")
+        logger.error("Connection failed: %s", e)
         return
 
     client.loop_start()
 
-    try:
-        while True:
-            if not db_ref:
-                print("⚠️ Firebase not initialized in simulator.")
-                time.sleep(10)
-                continue
-
-            try:
-                # Fetch current states and total consumption from Firebase
-                snapshot = db_ref.reference("/").get()
-                if not snapshot:
-                    print("⚠️ No data in Firebase RTD.")
-                    time.sleep(10)
-                    continue
-
-                total_voltage = snapshot.get("totalVoltage", 230.0)
-                total_current = snapshot.get("totalCurrent", 0.0)
-                relay1 = snapshot.get("relay1", False)
-                relay2 = snapshot.get("relay2", False)
-
-                # Estimate bulb consumption
-                bulb1_current = round(random.uniform(0.052, 0.054), 3) if relay1 else 0.0
-                bulb2_current = round(random.uniform(0.052, 0.054), 3) if relay2 else 0.0
-
-                # Calculate combined sockets consumption
-                # Ensures it doesn't go below 0 due to estimation errors
-                sockets_current = max(0.0, round(total_current - (bulb1_current + bulb2_current), 3))
-
-                # Prepare readings
-                timestamp = datetime.utcnow().isoformat()
-                
-                readings = [
-                    {"device": "bulb_1", "timestamp": timestamp, "current": bulb1_current, "voltage": total_voltage},
-                    {"device": "bulb_2", "timestamp": timestamp, "current": bulb2_current, "voltage": total_voltage},
-                    {"device": "sockets", "timestamp": timestamp, "current": sockets_current, "voltage": total_voltage},
-                ]
+    def publish(payload: str):
+        client.publish(TOPIC, payload)
+        publish_log.info("Published to %s: %s", TOPIC, payload)
 
-                for reading in readings:
-                    payload = json.dumps(reading)
-                    client.publish(TOPIC, payload)
-                    print(f"Published to {TOPIC}: {payload}")
-
-            except Exception as e:
-                print(f"Error fetching from Firebase: {e}")
-
-            time.sleep(10) # Sync every 10 seconds
+    bridge = FirebaseBridge(database, publish)
+    try:
+        bridge.start()
+        stop_event.wait()
     except KeyboardInterrupt:
-        print("Stopping sync...")
+        logger.info("Stopping sync...")
+    except Exception as e:
+        logger.error("Error listening to Firebase: %s", e)
     finally:
+        bridge.stop()
         client.loop_stop()
         client.disconnect()
 
+_simulator_stop = None
+
+def start_simulator():
+    """Runs the simulator on a background thread (see stop_simulator)."""
+    global _simulator_stop
+    if _simulator_stop is not None:
+        return
+    _simulator_stop = threading.Event()
+    threading.Thread(target=run_simulator, args=(_simulator_stop,), name="mqtt-simulator", daemon=True).start()
+
+def stop_simulator():
+    global _simulator_stop
+    if _simulator_stop is not None:
+        _simulator_stop.set()
+        _simulator_stop = None
+
 if __name__ == "__main__":
+    setup_logging()
     run_simulator()
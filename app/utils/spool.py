@@ -0,0 +1,209 @@
+import logging
+import os
+import struct
+import threading
+import zlib
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Every record is framed as <payload length><crc32 of payload><payload>
+RECORD_HEADER = struct.Struct("!II")
+SEGMENT_SUFFIX = ".seg"
+OFFSET_FILE = "offset"
+DEAD_LETTER_FILE = "dead-letter.jsonl"
+
+class Spool:
+    """
+    Append-only, segmented on-disk queue of byte records.
+
+    Records are appended to numbered segment files and flushed on every append, so a
+    crashed process loses nothing it acknowledged (with `fsync` they also survive power
+    loss). The reader's position lives in an offset file that is replaced atomically
+    after each committed batch; segments before it are deleted. A torn or corrupted
+    record (bad length or CRC) ends its segment for the reader instead of poisoning
+    the spool. Writers start a fresh segment on every open, so a torn tail left by a
+    crash is never appended to.
+
+    Total size is bounded by `max_bytes`: appends that would exceed it are refused.
+    Records that can never be stored are set aside in a dead-letter file next to the
+    segments, one line each, for an operator to inspect.
+    """
+
+    def __init__(self, directory: str, segment_bytes: int = 16 * 1024 * 1024,
+                 max_bytes: int = 1024 * 1024 * 1024, fsync: bool = False):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.max_bytes = max_bytes
+        self.fsync = fsync
+        self.corrupted = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+        self._read_seq, self._read_pos = self._load_offset()
+        segments = self._segments()
+        for seq in segments:
+            if seq < self._read_seq:
+                self._delete_segment(seq)
+        segments = self._segments()
+        self.bytes = sum(os.path.getsize(self._path(seq)) for seq in segments)
+        self.pending = self._count_pending(segments)
+
+        self._write_seq = max(segments[-1] + 1 if segments else 0, self._read_seq)
+        self._writer = open(self._path(self._write_seq), "ab")
+
+    def _path(self, seq: int) -> str:
+        return os.path.join(self.directory, f"{seq:012d}{SEGMENT_SUFFIX}")
+
+    def _segments(self):
+        return sorted(int(name[:-len(SEGMENT_SUFFIX)]) for name in os.listdir(self.directory) if name.endswith(SEGMENT_SUFFIX))
+
+    def _load_offset(self):
+        try:
+            with open(os.path.join(self.directory, OFFSET_FILE)) as f:
+                seq, pos = f.read().split()
+                return int(seq), int(pos)
+        except (FileNotFoundError, ValueError):
+            return 0, 0
+
+    def _save_offset(self, seq: int, pos: int):
+        path = os.path.join(self.directory, OFFSET_FILE)
+        tmp = path + ".tmp"
+        with open(tmp, "w") as f:
+            f.write(f"{seq} {pos}")
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+        os.replace(tmp, path)
+
+    def _delete_segment(self, seq: int):
+        try:
+            os.remove(self._path(seq))
+        except FileNotFoundError:
+            pass
+
+    def _scan(self, seq: int, pos: int, limit: int = None):
+        """Yields (record, end position) from a segment, stopping at its end or at a bad record."""
+        with open(self._path(seq), "rb") as f:
+            f.seek(pos)
+            while limit is None or limit > 0:
+                header = f.read(RECORD_HEADER.size)
+                if not header:
+                    return
+                if len(header) < RECORD_HEADER.size:
+                    self._bad_record(seq)
+                    return
+                length, crc = RECORD_HEADER.unpack(header)
+                data = f.read(length)
+                if len(data) < length or zlib.crc32(data) != crc:
+                    self._bad_record(seq)
+                    return
+                if limit is not None:
+                    limit -= 1
+                yield data, f.tell()
+
+    def _bad_record(self, seq: int):
+        # The active segment is only read under the lock after complete appends, so a
+        # bad record can only be a torn tail from a crash or on-disk corruption
+        if seq != getattr(self, "_write_seq", None):
+            self.corrupted += 1
+            logger.warning("⚠️ Spool segment %s ends in a torn or corrupted record; skipping the rest of it.", seq)
+
+    def _count_pending(self, segments) -> int:
+        count = 0
+        for seq in segments:
+            pos = self._read_pos if seq == self._read_seq else 0
+            count += sum(1 for _ in self._scan(seq, pos))
+        self.corrupted = 0  # counted again when the reader actually reaches them
+        return count
+
+    def append(self, records) -> bool:
+        """Appends byte records. Returns False (and writes nothing) if the spool is full."""
+        frames = b"".join(RECORD_HEADER.pack(len(r), zlib.crc32(r)) + r for r in records)
+        with self._lock:
+            if self.bytes + len(frames) > self.max_bytes:
+                return False
+            if self._writer.tell() >= self.segment_bytes:
+                self._writer.close()
+                self._write_seq += 1
+                self._writer = open(self._path(self._write_seq), "ab")
+            self._writer.write(frames)
+            self._writer.flush()
+            if self.fsync:
+                os.fsync(self._writer.fileno())
+            self.bytes += len(frames)
+            self.pending += len(records)
+            return True
+
+    def read_batch(self, max_records: int):
+        """
+        Returns up to `max_records` records from the reader position, plus the position
+        after them. Nothing is consumed until that position is passed to `commit`.
+        """
+        records = []
+        with self._lock:
+            seq, pos = self._read_seq, self._read_pos
+            for segment in self._segments():
+                if segment < seq:
+                    continue
+                if segment > seq:
+                    seq, pos = segment, 0
+                for data, end in self._scan(segment, pos, max_records - len(records)):
+                    records.append(data)
+                    pos = end
+                if len(records) >= max_records:
+                    break
+            if not records:
+                self.pending = 0  # whatever is left is unreadable
+        return records, (seq, pos)
+
+    def commit(self, position, count: int):
+        """Marks everything before `position` (from read_batch) as consumed."""
+        seq, pos = position
+        with self._lock:
+            self._save_offset(seq, pos)
+            self._read_seq, self._read_pos = seq, pos
+            for segment in self._segments():
+                if segment >= seq:
+                    break
+                self.bytes -= os.path.getsize(self._path(segment))
+                self._delete_segment(segment)
+            self.pending = max(0, self.pending - count)
+
+    def dead_letter(self, lines):
+        """Appends single-line byte records to the dead-letter file."""
+        data = b"".join(line.replace(b"\n", b" ") + b"\n" for line in lines)
+        with self._lock:
+            with open(os.path.join(self.directory, DEAD_LETTER_FILE), "ab") as f:
+                f.write(data)
+                f.flush()
+                if self.fsync:
+                    os.fsync(f.fileno())
+
+    def close(self):
+        with self._lock:
+            self._writer.close()
+
+def claim_spool_dir(base: str, slots: int = 64):
+    """
+    Gives each process its own spool directory under `base` (base/0, base/1, ...),
+    locked for the life of the process. A spool left behind by a dead process is
+    picked up by the next one to start. Returns (directory, lock file handle).
+    """
+    os.makedirs(base, exist_ok=True)
+    for slot in range(slots):
+        directory = os.path.join(base, str(slot))
+        os.makedirs(directory, exist_ok=True)
+        handle = open(os.path.join(directory, "owner.lock"), "a+")
+        if fcntl is None:
+            return directory, handle
+        try:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return directory, handle
+        except OSError:
+            handle.close()
+    raise RuntimeError(f"No free spool slot under {base}")
@@ -0,0 +1,133 @@
+"""
+HTTP API latency benchmark over a synthetic large database.
+
+Seeds SQLite (or the Postgres given with --database-url) with months x devices of
+readings, serves the app with uvicorn on a local port and hammers the read endpoints
+with concurrent clients. Per-endpoint p50/p95/p99 latency and throughput are emitted as
+JSON so runs can be compared across commits.
+
+    python -m benchmarks.api_benchmark --months 1 --devices 4 --clients 16
+"""
+import argparse
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+from benchmarks.common import emit, free_port, percentiles, seed_readings, use_database
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--months", type=float, default=1.0)
+    parser.add_argument("--devices", type=int, default=4)
+    parser.add_argument("--interval", type=int, default=60, help="Seconds between synthetic readings per device")
+    parser.add_argument("--clients", type=int, default=16, help="Concurrent clients")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per endpoint")
+    parser.add_argument("--endpoints", default=None, help="Comma-separated subset of endpoint names to run")
+    parser.add_argument("--database-url", default=None, help="Benchmark this database instead of a temp SQLite file")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default=None)
+    return parser.parse_args()
+
+def endpoints(yesterday: date):
+    return [
+        ("readings_latest", "GET", "/readings/latest"),
+        ("readings_all", "GET", "/readings/all?limit=1000"),
+        ("daily_summary", "GET", f"/analytics/daily-summary?day={yesterday}"),
+        ("highest_consumer", "GET", f"/analytics/highest-consumer?day={yesterday}"),
+        ("anomalies_device", "GET", "/anomalies/device_0"),
+        ("anomalies_devices", "GET", "/anomalies/devices"),
+        ("forecast", "POST", "/forecast/?days=7"),
+        ("forecast_device", "GET", "/forecast/device_0?days=7"),
+    ]
+
+def run_endpoint(base_url: str, method: str, path: str, total: int, clients: int):
+    import httpx
+
+    local = threading.local()
+
+    def call(_):
+        if not hasattr(local, "client"):
+            local.client = httpx.Client(base_url=base_url, timeout=300)
+        start = time.perf_counter()
+        response = local.client.request(method, path)
+        return time.perf_counter() - start, response.status_code
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        results = list(pool.map(call, range(total)))
+    wall = time.perf_counter() - started
+
+    latencies = [r[0] for r in results]
+    errors = sum(1 for r in results if r[1] >= 400)
+    return {
+        "method": method,
+        "path": path,
+        "errors": errors,
+        "throughput_rps": round(total / wall, 2),
+        **percentiles(latencies),
+    }
+
+def main():
+    args = parse_args()
+    tmpdir = use_database(args.database_url)
+
+    import uvicorn
+    from app.db.database import Base, engine, SessionLocal
+    from app.db.models import Reading
+    from app.main import app
+
+    Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        existing = db.query(Reading).count()
+
+    seed_started = time.perf_counter()
+    rows = existing or seed_readings(engine, months=args.months, devices=args.devices, interval=args.interval, seed=args.seed)
+    seed_seconds = time.perf_counter() - seed_started
+
+    # Forecasts are served precomputed; fit them as the scheduled job would
+    from app.services.forecast_service import refresh_forecasts
+    forecast_started = time.perf_counter()
+    refresh_forecasts()
+    forecast_seconds = time.perf_counter() - forecast_started
+
+    # The lifespan would start MQTT ingest and the simulator; tables already exist
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, lifespan="off", log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    base_url = f"http://127.0.0.1:{port}"
+
+    selected = set(args.endpoints.split(",")) if args.endpoints else None
+    results = {}
+    for name, method, path in endpoints(date.today() - timedelta(days=1)):
+        if selected and name not in selected:
+            continue
+        total = args.requests
+        clients = min(args.clients, total)
+        # One untimed warm-up call so lazy imports and caches don't skew the first sample
+        run_endpoint(base_url, method, path, 1, 1)
+        results[name] = run_endpoint(base_url, method, path, total, clients)
+
+    server.should_exit = True
+    emit({
+        "benchmark": "api",
+        "database": engine.dialect.name,
+        "rows": rows,
+        "seeded": not existing,
+        "seed_seconds": round(seed_seconds, 2),
+        "forecast_refresh_seconds": round(forecast_seconds, 2),
+        "months": args.months,
+        "devices": args.devices,
+        "interval": args.interval,
+        "clients": args.clients,
+        "endpoints": results,
+    }, args.output)
+
+    if tmpdir:
+        engine.dispose()
+        tmpdir.cleanup()
+
+if __name__ == "__main__":
+    main()
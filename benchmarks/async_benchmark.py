@@ -0,0 +1,152 @@
+"""
+Sync versus async read path under many concurrent clients.
+
+Seeds SQLite (or the Postgres given with --database-url) and serves, from a separate
+process, the same reads twice: through `def` handlers on the sync session (Starlette's
+threadpool, 40 threads) and through `async def` handlers on the async session. For every
+concurrency level, an asyncio client keeps that many requests in flight for --duration
+seconds and reports requests/sec and latency percentiles.
+
+    python -m benchmarks.async_benchmark --concurrency 50,100,250,500
+"""
+import argparse
+import asyncio
+import multiprocessing
+import time
+
+from benchmarks.common import emit, free_port, percentiles, seed_readings, use_database
+
+CASES = ("latest", "device")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--months", type=float, default=0.25)
+    parser.add_argument("--devices", type=int, default=4)
+    parser.add_argument("--concurrency", default="50,100,250,500", help="Comma-separated client counts")
+    parser.add_argument("--duration", type=float, default=5.0, help="Seconds per run")
+    parser.add_argument("--cases", default=",".join(CASES), help="latest (/readings/latest) and/or device (/readings/device/{id})")
+    parser.add_argument("--database-url", default=None, help="Benchmark this database instead of a temp SQLite file")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default=None)
+    return parser.parse_args()
+
+def build_app():
+    """The endpoints' queries, mounted once per path so both run in the same server."""
+    from typing import List
+    from fastapi import Depends, FastAPI
+    from sqlalchemy.ext.asyncio import AsyncSession
+    from sqlalchemy.orm import Session
+    from app.db import async_crud, crud
+    from app.db.database import get_async_db, get_db
+    from app.schemas.reading import Reading
+    from app.utils.fast_json import readings_response
+
+    app = FastAPI()
+
+    @app.get("/sync/latest", response_model=List[Reading])
+    def sync_latest(db: Session = Depends(get_db)):
+        return crud.get_latest_readings(db)
+
+    @app.get("/async/latest", response_model=List[Reading])
+    async def async_latest(db: AsyncSession = Depends(get_async_db)):
+        return await async_crud.get_latest_readings(db)
+
+    @app.get("/sync/device/{device_id}")
+    def sync_device(device_id: str, db: Session = Depends(get_db)):
+        return readings_response(crud.get_reading_rows(db, device=device_id, limit=100), "rows")
+
+    @app.get("/async/device/{device_id}")
+    async def async_device(device_id: str, db: AsyncSession = Depends(get_async_db)):
+        return readings_response(await async_crud.get_reading_rows(db, device=device_id, limit=100), "rows")
+
+    return app
+
+def serve(port: int):
+    import uvicorn
+    uvicorn.run(build_app(), host="127.0.0.1", port=port, log_level="warning", backlog=4096)
+
+async def load(base_url: str, path: str, concurrency: int, duration: float):
+    import httpx
+
+    latencies = []
+    errors = 0
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        await client.get(path)  # warm-up
+        deadline = time.perf_counter() + duration
+
+        async def worker():
+            nonlocal errors
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                try:
+                    response = await client.get(path)
+                    if response.status_code >= 400:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                latencies.append(time.perf_counter() - start)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        wall = time.perf_counter() - started
+
+    return {"requests": len(latencies), "errors": errors, "throughput_rps": round(len(latencies) / wall, 2), **percentiles(latencies)}
+
+def wait_for_server(base_url: str, timeout: float = 30.0):
+    import httpx
+
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            httpx.get(f"{base_url}/docs", timeout=1)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    raise RuntimeError("Benchmark server did not start")
+
+def main():
+    args = parse_args()
+    tmpdir = use_database(args.database_url)
+
+    from app.db.database import Base, engine, SessionLocal
+    from app.db.models import Reading
+
+    Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        existing = db.query(Reading).count()
+    rows = existing or seed_readings(engine, months=args.months, devices=args.devices, seed=args.seed)
+    engine.dispose()  # don't share pooled connections with the forked server
+
+    port = free_port()
+    server = multiprocessing.get_context("fork").Process(target=serve, args=(port,), daemon=True)
+    server.start()
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        wait_for_server(base_url)
+        results = {}
+        for case in args.cases.split(","):
+            path = "/latest" if case == "latest" else "/device/device_0"
+            for concurrency in (int(c) for c in args.concurrency.split(",")):
+                for mode in ("sync", "async"):
+                    results.setdefault(case, {}).setdefault(str(concurrency), {})[mode] = asyncio.run(
+                        load(base_url, f"/{mode}{path}", concurrency, args.duration))
+                run = results[case][str(concurrency)]
+                run["async_speedup"] = round(run["async"]["throughput_rps"] / max(run["sync"]["throughput_rps"], 1e-9), 2)
+    finally:
+        server.terminate()
+        server.join()
+
+    emit({
+        "benchmark": "async",
+        "database": engine.dialect.name,
+        "rows": rows,
+        "duration": args.duration,
+        "cases": results,
+    }, args.output)
+
+    if tmpdir:
+        tmpdir.cleanup()
+
+if __name__ == "__main__":
+    main()
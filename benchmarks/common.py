@@ -0,0 +1,93 @@
+import json
+import os
+import random
+import socket
+import tempfile
+from datetime import datetime, timedelta
+
+def use_database(database_url: str = None):
+    """
+    Points the app at `database_url`, or at a throwaway SQLite file when none is given.
+
+    Must run before any `app.*` import, since settings are read at import time.
+    Returns the TemporaryDirectory holding the SQLite file (or None) so the caller can
+    clean it up.
+    """
+    if database_url:
+        os.environ["DATABASE_URL"] = database_url
+        return None
+    tmpdir = tempfile.TemporaryDirectory()
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmpdir.name, 'bench.db')}"
+    return tmpdir
+
+def percentiles(samples):
+    """Latency summary in milliseconds for a list of durations in seconds."""
+    if not samples:
+        return {"count": 0, "mean_ms": 0.0, "p50_ms": 0.0, "p95_ms": 0.0, "p99_ms": 0.0, "max_ms": 0.0}
+    ordered = sorted(samples)
+
+    def pct(p):
+        return round(ordered[min(len(ordered) - 1, int(p * len(ordered)))] * 1000, 3)
+
+    return {
+        "count": len(ordered),
+        "mean_ms": round(sum(ordered) / len(ordered) * 1000, 3),
+        "p50_ms": pct(0.50),
+        "p95_ms": pct(0.95),
+        "p99_ms": pct(0.99),
+        "max_ms": round(ordered[-1] * 1000, 3),
+    }
+
+def emit(result: dict, output: str = None):
+    text = json.dumps(result, indent=2)
+    print(text)
+    if output:
+        with open(output, "w") as f:
+            f.write(text)
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def seed_readings(engine, months: float = 1, devices: int = 4, interval: int = 60, seed: int = 42, end: datetime = None):
+    """
+    Bulk-inserts a synthetic history ending at `end` (default: now).
+
+    Each device gets one reading every `interval` seconds with a daily load curve and
+    noise, so analytics, anomalies and forecasts all have something realistic to chew on.
+    Rollups and the device registry are rebuilt afterwards, as ingest would have kept them.
+    Returns the number of rows written.
+    """
+    from sqlalchemy.orm import Session
+    from app.db import crud
+    from app.db.models import Reading, Device
+
+    rng = random.Random(seed)
+    end = (end or datetime.now()).replace(microsecond=0)
+    start = end - timedelta(days=30 * months)
+    names = [f"device_{i}" for i in range(devices)]
+    steps = int((end - start).total_seconds() // interval)
+    table = Reading.__table__
+
+    written = 0
+    batch = []
+    with engine.begin() as conn:
+        conn.execute(Device.__table__.insert(), [{"id": name, "threshold": 1500.0} for name in names])
+        for step in range(steps):
+            ts = start + timedelta(seconds=step * interval)
+            daily = 1.0 + 0.8 * abs(12 - ts.hour) / 12
+            for i, name in enumerate(names):
+                current = max(0.0, rng.gauss(2.0 + i, 0.6) * daily)
+                batch.append({"device": name, "timestamp": ts, "current": round(current, 3), "voltage": round(rng.uniform(220, 240), 1)})
+            if len(batch) >= 20000:
+                conn.execute(table.insert(), batch)
+                written += len(batch)
+                batch = []
+        if batch:
+            conn.execute(table.insert(), batch)
+            written += len(batch)
+    with Session(engine) as db:
+        crud.rebuild_rollups(db)
+        crud.rebuild_device_registry(db)
+    return written
@@ -0,0 +1,162 @@
+"""
+Mixed read/write contention benchmark for the database engine profiles.
+
+Each profile runs in its own process against a fresh seeded database (temp SQLite, or
+--database-url). Writer threads store readings one transaction at a time through the
+ingest write path while reader threads load the latest readings and today's usage, as
+the dashboard does. Reports write throughput, read throughput and latency, and errors
+(e.g. "database is locked") per profile.
+
+- baseline: the engine as it was before profiles (rollback journal, synchronous=FULL,
+  default cache, writers on the shared pool; Postgres with SQLAlchemy's default pool)
+- tuned: the default settings (WAL, synchronous=NORMAL, mmap, larger cache, one
+  dedicated writer connection; Postgres with the DB_* pool and statement timeout)
+
+    python -m benchmarks.contention_benchmark --writers 4 --readers 8 --duration 10
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+from benchmarks.common import emit, percentiles, seed_readings, use_database
+
+PROFILES = {
+    "baseline": {
+        "SQLITE_JOURNAL_MODE": "DELETE",
+        "SQLITE_SYNCHRONOUS": "FULL",
+        "SQLITE_MMAP_MB": "0",
+        "SQLITE_CACHE_MB": "2",
+        "SQLITE_SINGLE_WRITER": "false",
+        "DB_POOL_SIZE": "5",
+        "DB_MAX_OVERFLOW": "10",
+        "DB_POOL_PRE_PING": "false",
+        "DB_STATEMENT_TIMEOUT_MS": "0",
+    },
+    "tuned": {},
+}
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per profile")
+    parser.add_argument("--months", type=float, default=0.25, help="History seeded before the run")
+    parser.add_argument("--devices", type=int, default=4)
+    parser.add_argument("--profiles", default=",".join(PROFILES))
+    parser.add_argument("--database-url", default=None, help="Benchmark this database instead of a temp SQLite file")
+    parser.add_argument("--run-profile", default=None, help=argparse.SUPPRESS)  # internal: one profile, in this process
+    parser.add_argument("--output", default=None)
+    return parser.parse_args()
+
+def run_profile(args):
+    tmpdir = use_database(args.database_url)
+    os.environ.setdefault("SPOOL_DIR", os.path.join(tmpdir.name if tmpdir else ".", "spool"))
+
+    from app.db import crud
+    from app.db.database import Base, engine, SessionLocal, write_engine
+    from app.db.models import Reading
+    from app.services.ingest_service import write_batch
+
+    Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        existing = db.query(Reading).count()
+    rows = existing or seed_readings(engine, months=args.months, devices=args.devices)
+    engine.dispose()
+
+    stop = threading.Event()
+    lock = threading.Lock()
+    writes, reads = [], []
+    errors = {"write": 0, "read": 0}
+    # Live timestamps after the seeded history, unique per writer
+    origin = datetime.now().replace(microsecond=0) + timedelta(days=1)
+
+    def writer(index):
+        n = 0
+        while not stop.is_set():
+            payload = {"device": f"device_{index % args.devices}", "timestamp": origin + timedelta(seconds=n * args.writers + index),
+                       "current": 1.5, "voltage": 230.0}
+            n += 1
+            start = time.perf_counter()
+            try:
+                write_batch([payload])
+                with lock:
+                    writes.append(time.perf_counter() - start)
+            except Exception:
+                with lock:
+                    errors["write"] += 1
+
+    def reader():
+        while not stop.is_set():
+            start = time.perf_counter()
+            try:
+                with SessionLocal() as db:
+                    crud.get_latest_readings(db)
+                    crud.get_daily_usage(db, date.today())
+                with lock:
+                    reads.append(time.perf_counter() - start)
+            except Exception:
+                with lock:
+                    errors["read"] += 1
+
+    threads = [threading.Thread(target=writer, args=(i,)) for i in range(args.writers)]
+    threads += [threading.Thread(target=reader) for _ in range(args.readers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(args.duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    with engine.connect() as conn:
+        journal_mode = conn.exec_driver_sql("PRAGMA journal_mode").scalar() if engine.dialect.name == "sqlite" else None
+
+    result = {
+        "database": engine.dialect.name,
+        "journal_mode": journal_mode,
+        "single_writer": write_engine is not engine,
+        "rows": rows,
+        "writes_per_sec": round(len(writes) / args.duration, 2),
+        "reads_per_sec": round(len(reads) / args.duration, 2),
+        "errors": errors,
+        "write_latency": percentiles(writes),
+        "read_latency": percentiles(reads),
+    }
+    engine.dispose()
+    write_engine.dispose()
+    if tmpdir:
+        tmpdir.cleanup()
+    return result
+
+def main():
+    args = parse_args()
+    if args.run_profile:
+        print(json.dumps(run_profile(args)))
+        return
+
+    results = {}
+    for profile in args.profiles.split(","):
+        command = [sys.executable, "-m", "benchmarks.contention_benchmark", "--run-profile", profile,
+                   "--writers", str(args.writers), "--readers", str(args.readers), "--duration", str(args.duration),
+                   "--months", str(args.months), "--devices", str(args.devices)]
+        if args.database_url:
+            command += ["--database-url", args.database_url]
+        # Settings are read at import time, so every profile gets a fresh interpreter
+        env = {**os.environ, **PROFILES[profile]}
+        output = subprocess.run(command, env=env, capture_output=True, text=True, check=True).stdout
+        results[profile] = json.loads(output.strip().splitlines()[-1])
+
+    emit({
+        "benchmark": "contention",
+        "writers": args.writers,
+        "readers": args.readers,
+        "duration": args.duration,
+        "profiles": results,
+    }, args.output)
+
+if __name__ == "__main__":
+    main()
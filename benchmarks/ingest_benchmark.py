@@ -0,0 +1,137 @@
+"""
+End-to-end MQTT ingest benchmark.
+
+Starts the in-process broker stand-in, points `mqtt_service` at it, drives it with the
+synthetic load generator and reports sustained readings/sec, receive-to-commit latency
+and the drop rate as JSON. Runs against a throwaway SQLite database unless
+--database-url is given.
+
+    python -m benchmarks.ingest_benchmark --devices 20 --rate 25 --duration 10
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--devices", type=int, default=20)
+    parser.add_argument("--rate", type=float, default=25.0, help="Readings/sec per device")
+    parser.add_argument("--duration", type=float, default=10.0, help="Publishing time in seconds")
+    parser.add_argument("--workers", type=int, default=None, help="Ingest workers (default: settings)")
+    parser.add_argument("--settle", type=float, default=30.0, help="Max seconds to wait for the backlog to drain")
+    parser.add_argument("--database-url", default=None)
+    parser.add_argument("--output", default=None, help="Write the JSON result to this file")
+    parser.add_argument("--min-throughput", type=float, default=None, help="Fail if readings/sec is below this")
+    parser.add_argument("--max-p99-ms", type=float, default=None, help="Fail if p99 latency exceeds this")
+    parser.add_argument("--max-drop-rate", type=float, default=None, help="Fail if the drop rate exceeds this")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    tmpdir = None
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+    else:
+        tmpdir = tempfile.TemporaryDirectory()
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmpdir.name, 'ingest_bench.db')}"
+
+    # App modules read settings at import time, so import them after the env is set
+    from app.config import settings
+    from app.db.database import Base, engine, SessionLocal
+    from app.db.models import Reading
+    from app.services import mqtt_service
+    from app.services.ingest_service import ingest_pipeline
+    from app.utils.load_generator import run_load_generator
+    from app.utils.local_broker import LocalBroker
+    from app.utils.logging_config import setup_logging
+    from app.utils.metrics import LatencyStats
+
+    setup_logging()
+    Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        baseline_rows = db.query(Reading).count()
+
+    broker = LocalBroker().start()
+    settings.MQTT_BROKER = broker.host
+    settings.MQTT_PORT = broker.port
+    if args.workers:
+        ingest_pipeline.workers = args.workers
+    ingest_pipeline.latency = {stage: LatencyStats(window=1_000_000) for stage in ingest_pipeline.STAGES}
+
+    mqtt_service.start_mqtt_listener()
+    deadline = time.time() + 10
+    while broker.subscriber_count(settings.MQTT_TOPIC) == 0:
+        if time.time() > deadline:
+            sys.exit("Ingest client never subscribed to the local broker")
+        time.sleep(0.05)
+
+    load = run_load_generator(
+        devices=args.devices,
+        rate=args.rate,
+        duration=args.duration,
+        broker=broker.host,
+        port=broker.port,
+    )
+
+    # Wait for the pipeline to finish everything that reached it
+    drain_started = time.perf_counter()
+    deadline = time.perf_counter() + args.settle
+    while time.perf_counter() < deadline:
+        stats = ingest_pipeline.stats()
+        done = stats["processed"] + stats["errors"] + stats["dropped"]
+        if stats["received"] >= load["published"] and done >= stats["received"]:
+            break
+        time.sleep(0.05)
+    elapsed = load["elapsed"] + (time.perf_counter() - drain_started)
+
+    mqtt_service.stop_mqtt_listener()
+    broker.stop()
+
+    with SessionLocal() as db:
+        committed = db.query(Reading).count() - baseline_rows
+
+    stats = ingest_pipeline.stats()
+    published = load["published"]
+    result = {
+        "benchmark": "ingest",
+        "devices": args.devices,
+        "rate_per_device": args.rate,
+        "offered_rate": args.devices * args.rate,
+        "duration": args.duration,
+        "workers": ingest_pipeline.workers,
+        "database": engine.dialect.name,
+        "published": published,
+        "received": stats["received"],
+        "committed": committed,
+        "readings_per_sec": round(committed / elapsed, 1) if elapsed else 0.0,
+        "drop_rate": round(1 - committed / published, 6) if published else 0.0,
+        "latency_ms": {
+            "ingest_to_commit": {k: v for k, v in stats["latency"]["total"].items() if k != "count"},
+            "save": {k: v for k, v in stats["latency"]["save"].items() if k != "count"},
+        },
+    }
+
+    output = json.dumps(result, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    if tmpdir:
+        engine.dispose()
+        tmpdir.cleanup()
+
+    failures = []
+    if args.min_throughput is not None and result["readings_per_sec"] < args.min_throughput:
+        failures.append(f"throughput {result['readings_per_sec']} < {args.min_throughput}")
+    if args.max_p99_ms is not None and result["latency_ms"]["ingest_to_commit"]["p99_ms"] > args.max_p99_ms:
+        failures.append(f"p99 {result['latency_ms']['ingest_to_commit']['p99_ms']}ms > {args.max_p99_ms}ms")
+    if args.max_drop_rate is not None and result["drop_rate"] > args.max_drop_rate:
+        failures.append(f"drop rate {result['drop_rate']} > {args.max_drop_rate}")
+    if failures:
+        sys.exit("Regression: " + "; ".join(failures))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Per-message logging overhead on the ingest hot path, before and after structured logging.
+
+"print" reproduces the old behaviour: two synchronous prints per message (received and
+saved) to a line-buffered pipe, like an unbuffered container stdout. "queued" sends the
+same two lines through the QueueHandler, and "sampled" is what ingest does now: one
+sampled line per message. Times are measured on the calling thread, which is what the
+ingest workers pay. Every path runs twice: against a fast reader, and against a slow
+one (--slow-sink-us per 4 KiB read) that makes the pipe fill up, the way a congested
+log collector or terminal does.
+
+    python -m benchmarks.logging_benchmark --messages 100000
+"""
+import argparse
+import logging
+import os
+import threading
+import time
+
+from benchmarks.common import emit
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=100000)
+    parser.add_argument("--slow-sink-us", type=float, default=2000.0, help="Reader delay per 4 KiB in the slow scenario")
+    parser.add_argument("--output", default=None)
+    return parser.parse_args()
+
+def drained_pipe(sink: dict):
+    """A line-buffered text stream whose reader discards everything, like a log collector."""
+    read_fd, write_fd = os.pipe()
+
+    def drain():
+        with open(read_fd, "rb", buffering=0) as reader:
+            while reader.read(4096):
+                if sink["delay"]:
+                    time.sleep(sink["delay"])
+
+    threading.Thread(target=drain, daemon=True).start()
+    return open(write_fd, "w", buffering=1, encoding="utf-8")
+
+def measure(fn, messages: int):
+    payload = '{"device": "bulb_1", "timestamp": "2024-01-01T00:00:00", "current": 0.053, "voltage": 231.4}'
+    start = time.perf_counter()
+    for i in range(messages):
+        fn(i, payload)
+    elapsed = time.perf_counter() - start
+    return {"total_seconds": round(elapsed, 4), "per_message_us": round(elapsed / messages * 1e6, 3)}
+
+def main():
+    args = parse_args()
+    sink = {"delay": 0.0}
+    stream = drained_pipe(sink)
+
+    from app.utils.logging_config import LogSampler, setup_logging
+    listener = setup_logging(stream=stream)
+
+    def run(fn):
+        result = measure(fn, args.messages)
+        # Let the listener thread catch up so it doesn't steal time from the next phase
+        while not listener.queue.empty():
+            time.sleep(0.01)
+        return result
+
+    def print_path(i, payload):
+        print(f"📩 Received message on sensor/energy: {payload}", file=stream)
+        print(f"Saved reading for bulb_1 at 2024-01-01 00:00:{i % 60:02d}", file=stream)
+
+    queued_logger = logging.getLogger("app.bench.queued")
+    queued_logger.setLevel(logging.INFO)
+
+    def queued_path(i, payload):
+        queued_logger.info("📩 Received message on %s: %s", "sensor/energy", payload)
+        queued_logger.info("Saved reading for %s at %s", "bulb_1", f"2024-01-01 00:00:{i % 60:02d}")
+
+    sampled_logger = logging.getLogger("app.bench.sampled")
+    sampled_logger.setLevel(logging.INFO)
+    sampler = LogSampler(sampled_logger)
+
+    def sampled_path(i, payload):
+        sampler.info("Saved reading for %s at %s", "bulb_1", f"2024-01-01 00:00:{i % 60:02d}", device="bulb_1")
+
+    def baseline(i, payload):
+        pass
+
+    paths = {"baseline": baseline, "print": print_path, "queued": queued_path, "sampled": sampled_path}
+    fast = {name: run(fn) for name, fn in paths.items()}
+    sink["delay"] = args.slow_sink_us / 1e6
+    slow = {name: run(fn) for name, fn in paths.items()}
+
+    def speedup(results):
+        after = results["sampled"]["per_message_us"]
+        return round(results["print"]["per_message_us"] / after, 1) if after else None
+
+    emit({
+        "benchmark": "logging",
+        "messages": args.messages,
+        "fast_sink": fast,
+        "slow_sink": slow,
+        "speedup": {"fast_sink": speedup(fast), "slow_sink": speedup(slow)},
+    }, args.output)
+
+if __name__ == "__main__":
+    main()
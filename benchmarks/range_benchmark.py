@@ -0,0 +1,89 @@
+"""
+Range analytics benchmark: one 31-day /analytics/range request versus single days.
+
+Seeds a synthetic history (temp SQLite, or --database-url), then times in-process:
+
+- single_day: crud.get_daily_usage for one day over raw readings (what a daily-summary miss costs)
+- daily_loop: 31 of those, i.e. a monthly view built from per-day requests
+- range_day / range_hour: range_service.get_range_usage over 31 days from the rollups
+
+    python -m benchmarks.range_benchmark --months 2 --devices 4 --interval 10
+
+--max-ratio makes it exit non-zero when the 31-day range p50 exceeds that multiple of the
+single-day p50 (1.0 = "a month within a single-day budget").
+"""
+import argparse
+import sys
+import time
+from datetime import datetime, timedelta
+
+from benchmarks.common import emit, percentiles, seed_readings, use_database
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--months", type=float, default=2.0)
+    parser.add_argument("--devices", type=int, default=4)
+    parser.add_argument("--interval", type=int, default=10, help="Seconds between synthetic readings per device")
+    parser.add_argument("--repeat", type=int, default=20, help="Timed runs per case")
+    parser.add_argument("--days", type=int, default=31, help="Length of the range")
+    parser.add_argument("--database-url", default=None, help="Benchmark this database instead of a temp SQLite file")
+    parser.add_argument("--max-ratio", type=float, default=None, help="Fail if range p50 / single-day p50 exceeds this")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default=None)
+    return parser.parse_args()
+
+def timed(fn, repeat: int):
+    fn()  # warm-up
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return percentiles(samples)
+
+def main():
+    args = parse_args()
+    tmpdir = use_database(args.database_url)
+
+    from app.db import crud
+    from app.db.database import Base, engine, SessionLocal
+    from app.db.models import Reading
+    from app.services.range_service import get_range_usage
+
+    Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        existing = db.query(Reading).count()
+    end = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    rows = existing or seed_readings(engine, months=args.months, devices=args.devices, interval=args.interval, seed=args.seed, end=end)
+
+    start = end - timedelta(days=args.days)
+    results = {}
+    with SessionLocal() as db:
+        results["single_day"] = timed(lambda: crud.get_daily_usage(db, end - timedelta(days=1)), args.repeat)
+        results["daily_loop"] = timed(
+            lambda: [crud.get_daily_usage(db, start + timedelta(days=d)) for d in range(args.days)],
+            max(1, args.repeat // 5))
+        results["range_day"] = timed(lambda: get_range_usage(db, start, end, "day", limit=10000), args.repeat)
+        results["range_hour"] = timed(lambda: get_range_usage(db, start, end, "hour", limit=10000), args.repeat)
+
+    ratio = results["range_day"]["p50_ms"] / max(results["single_day"]["p50_ms"], 1e-9)
+    emit({
+        "benchmark": "range",
+        "database": engine.dialect.name,
+        "rows": rows,
+        "days": args.days,
+        "devices": args.devices,
+        "interval": args.interval,
+        "range_to_single_day_ratio": round(ratio, 3),
+        "cases": results,
+    }, args.output)
+
+    if tmpdir:
+        engine.dispose()
+        tmpdir.cleanup()
+    if args.max_ratio is not None and ratio > args.max_ratio:
+        print(f"❌ 31-day range p50 is {ratio:.2f}x the single-day p50 (limit {args.max_ratio})", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
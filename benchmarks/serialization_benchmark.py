@@ -0,0 +1,101 @@
+"""
+Bulk readings serialization benchmark: ORM + Pydantic path versus the tuple fast path.
+
+Seeds a synthetic history (temp SQLite, or --database-url) and times, in-process, what
+/readings/all?limit=N costs with:
+
+- orm_pydantic: ORM objects validated through the Reading schema and jsonable_encoder,
+  as FastAPI did for response_model=List[Reading]
+- tuples_rows: column tuples encoded by app.utils.fast_json (the current default layout)
+- tuples_columns: the same tuples as parallel arrays (layout=columns)
+
+Payload sizes are reported raw and gzip-compressed.
+
+    python -m benchmarks.serialization_benchmark --limit 10000
+"""
+import argparse
+import gzip
+import json
+import time
+from typing import List
+
+from benchmarks.common import emit, percentiles, seed_readings, use_database
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--limit", type=int, default=10000, help="Readings per response")
+    parser.add_argument("--repeat", type=int, default=20, help="Timed runs per case")
+    parser.add_argument("--devices", type=int, default=4)
+    parser.add_argument("--database-url", default=None, help="Benchmark this database instead of a temp SQLite file")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default=None)
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    tmpdir = use_database(args.database_url)
+
+    from fastapi.encoders import jsonable_encoder
+    from pydantic import TypeAdapter
+    from app.db import crud
+    from app.db.database import Base, engine, SessionLocal
+    from app.db.models import Reading
+    from app.schemas.reading import Reading as ReadingSchema
+    from app.utils.fast_json import readings_response
+
+    Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        existing = db.query(Reading).count()
+    # Just enough history for `limit` rows
+    months = max(args.limit * 2 * 60 / args.devices / (30 * 86400), 0.01)
+    rows = existing or seed_readings(engine, months=months, devices=args.devices, interval=60, seed=args.seed)
+
+    adapter = TypeAdapter(List[ReadingSchema])
+
+    def orm_pydantic(db):
+        readings = crud.get_readings(db, limit=args.limit)
+        validated = adapter.validate_python(readings, from_attributes=True)
+        return json.dumps(jsonable_encoder(validated), separators=(",", ":")).encode()
+
+    def tuples_rows(db):
+        return readings_response(crud.get_reading_rows(db, limit=args.limit), "rows").body
+
+    def tuples_columns(db):
+        return readings_response(crud.get_reading_rows(db, limit=args.limit), "columns").body
+
+    results = {}
+    with SessionLocal() as db:
+        for name, fn in (("orm_pydantic", orm_pydantic), ("tuples_rows", tuples_rows), ("tuples_columns", tuples_columns)):
+            body = fn(db)  # warm-up
+            samples = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                fn(db)
+                samples.append(time.perf_counter() - start)
+            compress_start = time.perf_counter()
+            compressed = gzip.compress(body, compresslevel=9)
+            results[name] = {
+                "bytes": len(body),
+                "gzip_bytes": len(compressed),
+                "gzip_ms": round((time.perf_counter() - compress_start) * 1000, 3),
+                **percentiles(samples),
+            }
+
+    baseline = results["orm_pydantic"]["p50_ms"]
+    for result in results.values():
+        result["speedup"] = round(baseline / max(result["p50_ms"], 1e-9), 2)
+
+    emit({
+        "benchmark": "serialization",
+        "database": engine.dialect.name,
+        "rows": rows,
+        "limit": args.limit,
+        "cases": results,
+    }, args.output)
+
+    if tmpdir:
+        engine.dispose()
+        tmpdir.cleanup()
+
+if __name__ == "__main__":
+    main()
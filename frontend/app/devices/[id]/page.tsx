@@ -21,7 +21,7 @@ import {
 } from 'lucide-react';
 import Link from 'next/link';
 import { energyApi } from '@/services/api';
-import { Reading, Device } from '@/types';
+import { SeriesPoint, Device } from '@/types';
 import ReactMarkdown from 'react-markdown';
 
 
@@ -29,7 +29,7 @@ export default function DeviceDetailsPage({ params }: { params: Promise<{ id: st
     const resolvedParams = use(params);
     const deviceId = resolvedParams.id;
 
-    const [readings, setReadings] = useState<Reading[]>([]);
+    const [readings, setReadings] = useState<SeriesPoint[]>([]);
     const [deviceInfo, setDeviceInfo] = useState<Device | null>(null);
     const [loading, setLoading] = useState(true);
     const [isEditingThreshold, setIsEditingThreshold] = useState(false);
@@ -37,12 +37,12 @@ export default function DeviceDetailsPage({ params }: { params: Promise<{ id: st
 
     const fetchData = async () => {
         try {
-            const [history, info] = await Promise.all([
-                energyApi.getDeviceReadings(deviceId, 30),
+            const [series, info] = await Promise.all([
+                energyApi.getDeviceSeries(deviceId),
                 energyApi.getDeviceThreshold(deviceId)
             ]);
-            // Reverse history for chart (oldest to newest)
-            setReadings([...history].reverse());
+            // Already downsampled and ordered oldest to newest by the server
+            setReadings(series.points);
             setDeviceInfo(info);
 
             // Set input value only if not currently editing
@@ -75,7 +75,7 @@ export default function DeviceDetailsPage({ params }: { params: Promise<{ id: st
 
 
     const latestReading = readings[readings.length - 1];
-    const currentPower = latestReading ? (latestReading.current * latestReading.voltage) : 0;
+    const currentPower = latestReading ? latestReading.power : 0;
     const isAnomaly = deviceInfo && currentPower > deviceInfo.threshold;
 
     if (loading) {
@@ -123,7 +123,7 @@ export default function DeviceDetailsPage({ params }: { params: Promise<{ id: st
 
                         <div className="h-[350px] w-full">
                             <ResponsiveContainer width="100%" height="100%">
-                                <LineChart data={readings.map(r => ({ ...r, power: r.current * r.voltage }))}>
+                                <LineChart data={readings}>
                                     <CartesianGrid strokeDasharray="3 3" vertical={false} stroke="#f1f5f9" />
                                     <XAxis
                                         dataKey="timestamp"
@@ -23,26 +23,32 @@ export default function Home() {
   const [loading, setLoading] = useState(true);
 
   useEffect(() => {
-    const fetchData = async () => {
-      try {
-        const [readings, summary, deviceList] = await Promise.all([
-          energyApi.getLatestReadings(),
-          energyApi.getDailySummary(new Date().toISOString().split('T')[0]),
-          energyApi.getAllDevices()
-        ]);
-        setLatestReadings(readings);
-        setDailySummary(summary);
-        setDevices(deviceList);
-      } catch (error) {
-        console.error('Error fetching dashboard data:', error);
-      } finally {
-        setLoading(false);
+    let cancelled = false;
+    let etag: string | undefined;
+
+    // One snapshot request replaces separate readings/summary/devices polls; the server
+    // holds it open until something changes, so updates arrive as they happen
+    const poll = async () => {
+      while (!cancelled) {
+        try {
+          const result = await energyApi.getDashboardSnapshot(etag);
+          if (result && !cancelled) {
+            etag = result.etag;
+            setLatestReadings(result.snapshot.readings);
+            setDailySummary(result.snapshot.daily_summary);
+            setDevices(result.snapshot.devices);
+          }
+        } catch (error) {
+          console.error('Error fetching dashboard data:', error);
+          await new Promise((resolve) => setTimeout(resolve, 10000)); // Back off before retrying
+        } finally {
+          if (!cancelled) setLoading(false);
+        }
       }
     };
 
-    fetchData();
-    const interval = setInterval(fetchData, 10000); // Update every 10 seconds
-    return () => clearInterval(interval);
+    poll();
+    return () => { cancelled = true; };
   }, []);
 
   const liveReadings = latestReadings.filter(r => !r.device.startsWith('socket_'));
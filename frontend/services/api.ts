@@ -4,7 +4,10 @@ import {
     AnomalyResponse,
     DailySummary,
     ForecastResponse,
-    RelayStates
+    DeviceForecastResponse,
+    RelayStates,
+    SeriesResponse,
+    DashboardSnapshot
 } from '../types';
 
 const getApiBaseUrl = () => {
@@ -42,11 +45,34 @@ async function fetchApi<T>(endpoint: string, options?: RequestInit): Promise<T>
     return response.json();
 }
 
+// Long-polls the dashboard snapshot: with the previous ETag the server answers once something
+// changed, or with 304 (returned as null) after `wait` seconds
+async function fetchDashboardSnapshot(etag?: string, wait = 30): Promise<{ snapshot: DashboardSnapshot; etag: string } | null> {
+    const params = etag ? `?wait=${wait}` : '';
+    const response = await fetch(`${API_BASE_URL}/dashboard/snapshot${params}`, {
+        headers: etag ? { 'If-None-Match': etag } : {},
+        cache: 'no-store',
+    });
+    if (response.status === 304) return null;
+    if (!response.ok) throw new Error(response.statusText);
+    return { snapshot: await response.json(), etag: response.headers.get('ETag') || '' };
+}
+
 export const energyApi = {
+    // Dashboard
+    getDashboardSnapshot: fetchDashboardSnapshot,
+
     // Readings
     getLatestReadings: () => fetchApi<Reading[]>('/readings/latest'),
     getDeviceReadings: (device: string, limit = 100) =>
         fetchApi<Reading[]>(`/readings/device/${device}?limit=${limit}`),
+    // Server-side downsampled chart data; without start/end the server returns the last hour
+    getDeviceSeries: (device: string, points = 360, agg: SeriesResponse['agg'] = 'avg', start?: string, end?: string) => {
+        const params = new URLSearchParams({ points: String(points), agg });
+        if (start) params.set('start', start);
+        if (end) params.set('end', end);
+        return fetchApi<SeriesResponse>(`/readings/device/${device}/series?${params}`);
+    },
 
     // Analytics
     getDailySummary: (date: string) =>
@@ -70,6 +96,8 @@ export const energyApi = {
 
     getForecast: (days = 7) =>
         fetchApi<ForecastResponse>(`/forecast/?days=${days}`, { method: 'POST' }),
+    getDeviceForecast: (device: string, days = 7) =>
+        fetchApi<DeviceForecastResponse>(`/forecast/${device}?days=${days}`),
 
     // Chatbot
     queryChat: (question: string, sessionId: string) =>
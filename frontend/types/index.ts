@@ -6,9 +6,31 @@ export interface Reading {
     voltage: number;
 }
 
+export interface SeriesPoint {
+    timestamp: string;
+    power: number;
+    current: number;
+    voltage: number;
+    samples: number;
+    power_min?: number;
+    power_max?: number;
+}
+
+export interface SeriesResponse {
+    device: string;
+    start: string;
+    end: string;
+    bucket_seconds: number;
+    agg: 'avg' | 'minmax' | 'lttb';
+    points: SeriesPoint[];
+}
+
 export interface Device {
     id: string; // device name
     threshold: number;
+    first_seen?: string | null;
+    last_seen?: string | null;
+    sample_count?: number | null;
 }
 
 export interface RelayStates {
@@ -44,6 +66,27 @@ export interface ForecastResponse {
     forecast: ForecastItem[];
     outlook: string;
     tip: string;
+    generated_at?: string | null;
+    data_through?: string | null;
+}
+
+export interface DeviceForecastResponse extends ForecastResponse {
+    device: string;
+}
+
+export interface ActiveAnomaly {
+    device: string;
+    power: number;
+    threshold: number;
+}
+
+export interface DashboardSnapshot {
+    version: number;
+    readings: Reading[];
+    devices: Device[];
+    relays: RelayStates | null;
+    daily_summary: DailySummary;
+    anomalies: ActiveAnomaly[];
 }
 
 export interface ChatMessage {
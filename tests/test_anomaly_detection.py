@@ -0,0 +1,64 @@
+import random
+from datetime import datetime, timedelta
+from app.services.anomaly_service import StreamingDetector, detector
+from app.services.ingest_service import store_readings
+from test_api import client, TestingSessionLocal
+
+START = datetime(2024, 10, 1, 12, 0, 0)
+
+def feed(detector, powers, device="fridge", start=START):
+    return [detector.observe(device, start + timedelta(seconds=10 * i), p) for i, p in enumerate(powers)]
+
+def noisy(n, mean=200.0, std=5.0, seed=1):
+    rng = random.Random(seed)
+    return [rng.gauss(mean, std) for _ in range(n)]
+
+def test_steady_noise_raises_nothing():
+    detector = StreamingDetector(warmup=30)
+    assert [e for e in feed(detector, noisy(2000)) if e] == []
+
+def test_spike_is_flagged_once():
+    detector = StreamingDetector(warmup=30)
+    events = [e for e in feed(detector, noisy(200) + [900.0] + noisy(50, seed=2)) if e]
+    assert [e["kind"] for e in events] == ["spike"]
+    assert events[0]["power"] == 900.0 and events[0]["score"] > 4
+
+def test_step_change_is_flagged_once_then_absorbed():
+    detector = StreamingDetector(warmup=30)
+    events = [e for e in feed(detector, noisy(200) + noisy(600, mean=800.0, seed=2)) if e]
+    assert [e["kind"] for e in events] == ["spike", "step"]
+    assert events[1]["score"] > 0
+    assert not detector.baselines()["fridge"]["shifted"]
+
+def test_late_readings_do_not_rewind_the_baseline():
+    detector = StreamingDetector(warmup=0)
+    feed(detector, [200.0] * 10)
+    assert detector.observe("fridge", START, 5000.0) is None
+    assert detector.baselines()["fridge"]["samples"] == 10
+
+def test_ingested_outliers_are_stored_and_served():
+    rng = random.Random(3)
+    powers = [rng.gauss(230.0, 10.0) for _ in range(100)] + [3000.0]
+    rows = [{"device": "anomaly_stream", "timestamp": (START + timedelta(seconds=10 * i)).isoformat(),
+             "current": p / 230.0, "voltage": 230.0} for i, p in enumerate(powers)]
+    assert client.post("/readings/batch", json=rows).json()["inserted"] == len(rows)
+
+    events = client.get("/anomalies/events", params={"device": "anomaly_stream"}).json()
+    assert [(e["kind"], e["timestamp"]) for e in events] == [("spike", rows[-1]["timestamp"])]
+    assert round(events[0]["power"]) == 3000
+    assert client.get("/anomalies/events", params={"device": "anomaly_stream", "kind": "step"}).json() == []
+    assert client.get("/anomalies/baselines").json()["anomaly_stream"]["samples"] == len(rows)
+
+def test_baselines_move_only_for_committed_readings():
+    rows = [{"device": "anomaly_rollback", "timestamp": START + timedelta(seconds=10 * i), "current": 1.0, "voltage": 230.0}
+            for i in range(5)]
+    db = TestingSessionLocal()
+    try:
+        store_readings(db, rows)
+        db.rollback()  # e.g. the commit failed and the batch went to the spool
+        assert "anomaly_rollback" not in detector.baselines()
+        store_readings(db, rows)
+        db.commit()
+        assert detector.baselines()["anomaly_rollback"]["samples"] == 5
+    finally:
+        db.close()
@@ -1,20 +1,29 @@
+import os
+import tempfile
 from fastapi.testclient import TestClient
 from app.main import app
-from app.db.database import Base, engine, get_db, SessionLocal
+from app.services import ingest_service, summary_service
+from app.db.database import Base, engine, get_db, get_async_db, get_async_read_db, get_read_db, get_write_db, async_url, tune_engine, SessionLocal
 import pytest
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.pool import StaticPool
+from sqlalchemy.pool import NullPool
 
-# Setup in-memory database for testing
-SQLALCHEMY_DATABASE_URL = "sqlite://"
+# Throwaway SQLite file for testing: sync and async endpoints must see the same data,
+# which two separate in-memory databases wouldn't
+test_dir = tempfile.TemporaryDirectory()
+SQLALCHEMY_DATABASE_URL = f"sqlite:///{os.path.join(test_dir.name, 'test.db')}"
 
-engine_test = create_engine(
+engine_test = tune_engine(create_engine(
     SQLALCHEMY_DATABASE_URL,
     connect_args={"check_same_thread": False},
-    poolclass=StaticPool,
-)
+))
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine_test)
+# TestClient may run each request on a new event loop, so async connections aren't pooled
+async_engine_test = create_async_engine(async_url(SQLALCHEMY_DATABASE_URL), poolclass=NullPool)
+tune_engine(async_engine_test.sync_engine)
+AsyncTestingSessionLocal = async_sessionmaker(async_engine_test, autoflush=False, expire_on_commit=False)
 
 Base.metadata.create_all(bind=engine_test)
 
@@ -25,7 +34,19 @@ def override_get_db():
     finally:
         db.close()
 
+async def override_get_async_db():
+    async with AsyncTestingSessionLocal() as db:
+        yield db
+
 app.dependency_overrides[get_db] = override_get_db
+app.dependency_overrides[get_write_db] = override_get_db
+app.dependency_overrides[get_read_db] = override_get_db
+app.dependency_overrides[get_async_db] = override_get_async_db
+app.dependency_overrides[get_async_read_db] = override_get_async_db
+# Protection opens its own session after ingest commits, outside the request's dependencies
+ingest_service.SessionLocal = TestingSessionLocal
+# Summaries of finished days are stored through the writer, not the request's read session
+summary_service.WriteSessionLocal = TestingSessionLocal
 
 client = TestClient(app)
 
@@ -37,7 +58,9 @@ def test_read_main():
 def test_health_check():
     response = client.get("/health/")
     assert response.status_code == 200
-    assert response.json() == {"status": "ok"}
+    data = response.json()
+    assert data["status"] == "ok"
+    assert data["role"] in ("leader", "follower")
 
 def test_create_and_read_readings():
     # We can't easily test MQTT ingestion here without mocking, 
@@ -76,3 +99,13 @@ def test_chatbot():
     session_id_2 = "test_session_2"
     response = client.post("/chatbot/query", json={"question": "Hello", "session_id": session_id_2})
     assert response.status_code == 200
+
+def test_metrics_endpoint():
+    client.get("/readings/latest")
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    body = response.text
+    assert 'energy_http_request_duration_seconds_count{method="GET",route="/readings/latest"}' in body
+    assert "energy_http_request_db_queries_bucket" in body
+    assert 'energy_ingest_messages{state="received"}' in body
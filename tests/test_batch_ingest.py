@@ -0,0 +1,64 @@
+import json
+import msgpack
+from app.db.models import Device, Reading
+from app.services.ingest_service import IngestPipeline, ingest_batch
+from app.utils.batch_decoder import columns_from_object, decode_batch
+from test_api import client, TestingSessionLocal
+
+def test_batch_json_reports_per_row_status():
+    rows = [
+        {"device": "batch_json", "timestamp": "2024-09-01T10:00:00", "current": 1.0, "voltage": 230.0},
+        {"device": "batch_json", "timestamp": "2024-09-01T10:00:10", "current": "oops", "voltage": 230.0},
+        {"device": "batch_json", "timestamp": "2024-09-01T10:00:00", "current": 1.0, "voltage": 230.0},
+        {"device": "batch_json", "timestamp": "2024-09-01T12:00:20+02:00", "current": 2.0, "voltage": 231.0},
+    ]
+    response = client.post("/readings/batch", json=rows)
+    assert response.status_code == 200
+    body = response.json()
+    assert body["status"] == ["inserted", "invalid", "duplicate", "inserted"]
+    assert body["errors"] == {"1": "invalid current"}
+    assert (body["inserted"], body["duplicate"], body["invalid"]) == (2, 1, 1)
+
+    db = TestingSessionLocal()
+    try:
+        timestamps = [r.timestamp.isoformat() for r in db.query(Reading).filter(Reading.device == "batch_json").order_by(Reading.timestamp)]
+        assert timestamps == ["2024-09-01T10:00:00", "2024-09-01T10:00:20"]
+        assert db.query(Device).filter(Device.id == "batch_json").one().sample_count == 2
+    finally:
+        db.close()
+
+def test_batch_ndjson_columnar_and_msgpack():
+    ndjson = "\n".join(json.dumps({"device": "batch_nd", "timestamp": f"2024-09-01T10:00:{s:02d}", "current": 1.0, "voltage": 230.0}) for s in (0, 10))
+    response = client.post("/readings/batch", content=ndjson, headers={"content-type": "application/x-ndjson"})
+    assert response.json()["inserted"] == 2
+
+    columnar = {"device": "batch_col", "timestamp": ["2024-09-01T10:00:00", "2024-09-01T10:00:10"], "current": [1.0, 1.5], "voltage": [230.0, 229.0]}
+    response = client.post("/readings/batch", content=msgpack.packb(columnar), headers={"content-type": "application/msgpack"})
+    assert response.json()["status"] == ["inserted", "inserted"]
+
+    response = client.post("/readings/batch", content=b"not a batch", headers={"content-type": "application/json"})
+    assert response.status_code == 400
+
+def test_mqtt_array_payload_goes_through_batch_handler():
+    results = []
+
+    def handle(rows, observe):
+        db = TestingSessionLocal()
+        try:
+            results.append(ingest_batch(db, columns_from_object(rows)))
+        finally:
+            db.close()
+
+    pipeline = IngestPipeline(workers=2, queue_size=10, batch_handler=handle)
+    pipeline.start()
+    try:
+        payload = [{"device": f"batch_mqtt_{i % 2}", "timestamp": "2024-09-01T10:00:00", "current": 1.0, "voltage": 230.0} for i in range(2)]
+        pipeline.submit(json.dumps(payload).encode())
+    finally:
+        pipeline.stop()
+    assert sum(r["inserted"] for r in results) == 2
+    assert pipeline.stats()["processed"] == 2
+
+def test_decode_batch_sniffs_ndjson():
+    columns = decode_batch(b'{"device": "a", "timestamp": "2024-09-01T10:00:00", "current": 1, "voltage": 2}\n{"device": "b"}\n')
+    assert columns["device"] == ["a", "b"]
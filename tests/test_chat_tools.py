@@ -0,0 +1,96 @@
+import json
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from app.config import settings
+from app.db.models import Device
+from app.services import chat_service
+from test_api import client, TestingSessionLocal
+
+def message(content=None, tool_calls=None):
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content, tool_calls=tool_calls))])
+
+def tool_call(name, arguments):
+    return SimpleNamespace(id=f"call_{name}", function=SimpleNamespace(name=name, arguments=json.dumps(arguments)))
+
+class FakeCompletions:
+    """Asks for the given tool calls first, then answers; records every request."""
+
+    def __init__(self, calls):
+        self.calls = list(calls)
+        self.requests = []
+
+    def create(self, messages, model, **kwargs):
+        self.requests.append(list(messages))
+        if self.calls:
+            return message(tool_calls=[self.calls.pop(0)])
+        return message(content="done")
+
+def test_chatbot_fetches_only_what_the_model_asks_for(monkeypatch):
+    now = datetime.now().replace(microsecond=0)
+    rows = [{"device": "chat_tools", "timestamp": (now - timedelta(seconds=10 * i)).isoformat(), "current": 4.0, "voltage": 230.0}
+            for i in range(3)]
+    client.post("/readings/batch", json=rows)
+
+    completions = FakeCompletions([tool_call("get_current_status", {}),
+                                   tool_call("get_usage", {"device": "chat_tools", "start_date": (now - timedelta(days=1)).date().isoformat()})])
+    monkeypatch.setattr(chat_service, "client", SimpleNamespace(chat=SimpleNamespace(completions=completions)))
+    monkeypatch.setattr(settings, "GROQ_API_KEY", "test")
+
+    response = client.post("/chatbot/query", json={"question": "How am I doing?", "session_id": "chat_tools"})
+    assert response.json()["answer"] == "done"
+
+    system_prompt = completions.requests[0][0]["content"]
+    assert "chat_tools" in system_prompt and "kWh\n" not in system_prompt
+
+    tool_results = {m["name"]: json.loads(m["content"]) for m in completions.requests[-1] if isinstance(m, dict) and m["role"] == "tool"}
+    status = {d["device"]: d for d in tool_results["get_current_status"]["devices"]}
+    assert status["chat_tools"]["power_w"] == 920.0 and status["chat_tools"]["status"] == "NORMAL"
+    assert tool_results["get_usage"]["by_device_kwh"] == {"chat_tools": round(3 * 920 * 10 / 3600000, 3)}
+
+def test_tool_errors_are_returned_to_the_model():
+    db = TestingSessionLocal()
+    try:
+        assert chat_service.run_tool("get_usage", json.dumps({"start_date": "not a date"}), db).startswith("Error:")
+        assert chat_service.run_tool("drop_tables", "{}", db) == "Error: Unknown tool."
+        anomalies = json.loads(chat_service.run_tool("get_anomalies", json.dumps({"hours": 1}), db))
+        assert anomalies["hours"] == 1 and "threshold_crossings" in anomalies
+    finally:
+        db.close()
+
+def test_repeated_questions_are_answered_from_the_cache(monkeypatch):
+    completions = FakeCompletions([tool_call("get_current_status", {})])
+    monkeypatch.setattr(chat_service, "client", SimpleNamespace(chat=SimpleNamespace(completions=completions)))
+    monkeypatch.setattr(settings, "GROQ_API_KEY", "test")
+    monkeypatch.setattr(chat_service, "WriteSessionLocal", TestingSessionLocal)
+    chat_service.answer_cache.clear()
+
+    def ask(question, session_id):
+        return client.post("/chatbot/query", json={"question": question, "session_id": session_id}).json()["answer"]
+
+    assert ask("What's my status?", "cache_a") == "done"
+    llm_calls = len(completions.requests)
+    assert ask("what's my status", "cache_b") == "done"
+    assert len(completions.requests) == llm_calls  # same question, same data: no LLM call
+
+    # A threshold change is a new data version
+    client.post("/anomalies/devices/chat_cache/threshold", json={"threshold": 1234.0})
+    ask("what's my status", "cache_c")
+    assert len(completions.requests) == llm_calls + 1
+
+    # So is a relay switching, e.g. a cut-off since the answer was cached
+    monkeypatch.setattr(chat_service, "get_relay_states", lambda: {"relay1": False})
+    ask("what's my status", "cache_f")
+    assert len(completions.requests) == llm_calls + 2
+
+    # Answers that changed something are never cached
+    completions.calls = [tool_call("set_device_threshold", {"device_id": "chat_cache", "threshold": 999.0})]
+    ask("Lower the chat_cache limit", "cache_d")
+    completions.calls = [tool_call("set_device_threshold", {"device_id": "chat_cache", "threshold": 999.0})]
+    before = len(completions.requests)
+    ask("Lower the chat_cache limit", "cache_e")
+    assert len(completions.requests) == before + 2
+    db = TestingSessionLocal()
+    try:
+        assert db.get(Device, "chat_cache").threshold == 999.0
+    finally:
+        db.close()
@@ -0,0 +1,45 @@
+import asyncio
+import time
+from app.services.dashboard_service import DashboardSnapshots
+from test_api import client
+
+def test_snapshot_etag_and_version_follow_changes():
+    first = client.get("/dashboard/snapshot")
+    assert first.status_code == 200
+    body = first.json()
+    assert {"version", "readings", "devices", "relays", "daily_summary", "anomalies"} <= body.keys()
+
+    etag = first.headers["etag"]
+    assert client.get("/dashboard/snapshot", headers={"If-None-Match": etag}).status_code == 304
+
+    client.post("/readings/batch", json=[{"device": "dash_dev", "timestamp": "2024-09-02T10:00:00", "current": 20.0, "voltage": 230.0}])
+    changed = client.get("/dashboard/snapshot", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.json()["version"] > body["version"]
+    assert {"device": "dash_dev", "power": 4600.0, "threshold": 2500.0} in changed.json()["anomalies"]
+
+def test_long_poll_wakes_on_notify():
+    content = {"n": 0}
+    snapshots = DashboardSnapshots(builder=lambda db: dict(content), refresh_seconds=60)
+
+    async def scenario():
+        snapshot, etag = snapshots.get(None)
+        loop = asyncio.get_running_loop()
+        waiter = loop.create_task(snapshots.wait(10))
+        await asyncio.sleep(0.05)
+        content["n"] = 1
+        started = time.monotonic()
+        await loop.run_in_executor(None, snapshots.notify)
+        await waiter
+        assert time.monotonic() - started < 1
+        updated, new_etag = snapshots.get(None)
+        assert new_etag != etag and updated["version"] == snapshot["version"] + 1 and updated["n"] == 1
+
+    asyncio.run(scenario())
+
+def test_long_poll_times_out_with_304():
+    etag = client.get("/dashboard/snapshot").headers["etag"]
+    started = time.monotonic()
+    response = client.get("/dashboard/snapshot?wait=0.3", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert time.monotonic() - started >= 0.3
@@ -0,0 +1,73 @@
+import asyncio
+import threading
+import time
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+from app.db.database import async_url, engine_options, is_sqlite_file
+from app.db.pool import FairGate
+from app.utils.instrumentation import DB_QUERY_SECONDS, instrument_engine
+from test_api import engine_test, async_engine_test
+
+def test_sqlite_connections_are_tuned():
+    with engine_test.connect() as conn:
+        assert conn.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+        assert conn.execute(text("PRAGMA synchronous")).scalar() == 1  # NORMAL
+        assert conn.execute(text("PRAGMA busy_timeout")).scalar() == 5000
+
+    async def async_journal_mode():
+        async with async_engine_test.connect() as conn:
+            return (await conn.execute(text("PRAGMA journal_mode"))).scalar()
+
+    assert asyncio.run(async_journal_mode()) == "wal"
+
+def test_postgres_profile():
+    url = "postgresql://user:pw@db.example.com/energy?sslmode=require"
+    options = engine_options(url)
+    assert options["pool_pre_ping"] and options["pool_size"] == 10 and options["pool_recycle"] == 1800
+    assert options["connect_args"] == {"options": "-c statement_timeout=30000"}
+    assert engine_options(url, for_async=True)["connect_args"] == {"server_settings": {"statement_timeout": "30000"}}
+    assert async_url(url).render_as_string(hide_password=False) == "postgresql+asyncpg://user:pw@db.example.com/energy?ssl=require"
+
+def test_single_writer_only_for_sqlite_files():
+    assert is_sqlite_file("sqlite:///./energy_meter.db")
+    assert not is_sqlite_file("sqlite://")
+    assert not is_sqlite_file("postgresql://db/energy")
+
+def test_writer_gate_serves_waiters_in_order():
+    gate = FairGate()
+    order = []
+    assert gate.acquire()
+
+    def waiter(name):
+        gate.acquire()
+        order.append(name)
+        gate.release()
+
+    threads = []
+    for name in ("first", "second"):
+        thread = threading.Thread(target=waiter, args=(name,))
+        thread.start()
+        threads.append(thread)
+        time.sleep(0.05)  # let it queue
+    gate.release()
+    # The releasing thread can't take the gate back ahead of the queue
+    assert gate.acquire(timeout=2)
+    order.append("releaser")
+    gate.release()
+    for thread in threads:
+        thread.join()
+    assert order == ["first", "second", "releaser"]
+
+def test_failed_queries_leave_no_timing_state(monkeypatch):
+    observed = []
+    monkeypatch.setattr(DB_QUERY_SECONDS, "observe", lambda seconds, **labels: observed.append(seconds))
+    engine = instrument_engine(create_engine("sqlite://"))
+    with engine.connect() as conn:
+        for _ in range(3):
+            with pytest.raises(OperationalError):
+                conn.execute(text("SELECT * FROM no_such_table"))
+        time.sleep(0.05)
+        conn.execute(text("SELECT 1"))
+        assert "query_start" not in conn.info
+    assert len(observed) == 1 and observed[0] < 0.05  # timed from its own start, not a failed query's
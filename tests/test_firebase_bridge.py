@@ -0,0 +1,74 @@
+import json
+import threading
+import time
+from app.utils import mqtt_simulator
+from app.utils.fake_rtdb import FakeRealtimeDatabase
+from app.utils.firebase_bridge import FirebaseBridge
+from app.utils.local_broker import LocalBroker
+from test_shared_ingest import TOPIC, connect_consumer, wait_for
+
+def sockets_current(payload):
+    return {r["device"]: r for r in json.loads(payload)}["sockets"]["current"]
+
+def test_bridge_publishes_on_change_only():
+    database = FakeRealtimeDatabase({"totalVoltage": 231.0, "totalCurrent": 2.0, "relay1": False, "relay2": False})
+    published = []
+    bridge = FirebaseBridge(database, published.append, heartbeat=60, min_interval=0)
+    bridge.start()
+    try:
+        assert wait_for(lambda: len(published) == 1)
+        readings = json.loads(published[0])
+        assert [r["device"] for r in readings] == ["bulb_1", "bulb_2", "sockets"]
+        assert {r["voltage"] for r in readings} == {231.0} and sockets_current(published[0]) == 2.0
+
+        database.reference("totalCurrent").set(3.5)
+        assert wait_for(lambda: len(published) == 2)
+        assert sockets_current(published[1]) == 3.5
+
+        database.reference("totalCurrent").set(3.5)  # no change
+        database.reference("relay3").set(True)  # not a key the readings depend on
+        time.sleep(0.2)
+        assert len(published) == 2
+        assert database.reads == 0  # streamed, never polled
+    finally:
+        bridge.stop()
+
+def test_bridge_heartbeat_and_rate_limit():
+    database = FakeRealtimeDatabase({"totalVoltage": 230.0, "totalCurrent": 1.0})
+    published = []
+    bridge = FirebaseBridge(database, published.append, heartbeat=0.1, min_interval=0.3)
+    bridge.start()
+    try:
+        assert wait_for(lambda: len(published) >= 3)  # heartbeats while nothing changes
+
+        # A burst of changes within min_interval goes out as one publish, with the last value
+        count = len(published)
+        for current in (4.0, 5.0, 6.0):
+            database.reference("totalCurrent").set(current)
+        assert wait_for(lambda: any(sockets_current(p) == 6.0 for p in published[count:]))
+        assert all(sockets_current(p) in (1.0, 6.0) for p in published[count:])
+    finally:
+        bridge.stop()
+
+def test_simulator_bridges_firebase_to_mqtt(monkeypatch):
+    database = FakeRealtimeDatabase({"totalVoltage": 229.0, "totalCurrent": 1.0, "relay1": True, "relay2": True})
+    with LocalBroker() as broker:
+        received = []
+        consumer = connect_consumer(broker, TOPIC, received.append)
+        assert wait_for(lambda: broker.subscriber_count(TOPIC) == 1)
+        monkeypatch.setattr(mqtt_simulator, "BROKER", "127.0.0.1")
+        monkeypatch.setattr(mqtt_simulator, "PORT", broker.port)
+        monkeypatch.setattr(mqtt_simulator, "TOPIC", TOPIC)
+
+        stop = threading.Event()
+        simulator = threading.Thread(target=mqtt_simulator.run_simulator, args=(stop, database))
+        simulator.start()
+        try:
+            assert wait_for(lambda: len(received) == 1)
+            readings = {r["device"]: r for r in json.loads(received[0])}
+            assert readings["bulb_1"]["current"] > 0 and readings["sockets"]["current"] < 1.0
+        finally:
+            stop.set()
+            simulator.join(timeout=10)
+            consumer.disconnect()
+            consumer.loop_stop()
@@ -0,0 +1,61 @@
+from datetime import datetime, timedelta
+from app.services import forecast_service
+from test_api import client, TestingSessionLocal
+
+START = datetime(2024, 11, 4, 0, 0, 0)
+
+def post_hours(device, hours, start=START):
+    rows = [{"device": device, "timestamp": (start + timedelta(hours=h, minutes=m)).isoformat(), "current": 1.0 + h % 3, "voltage": 230.0}
+            for h in range(hours) for m in (0, 30)]
+    assert client.post("/readings/batch", json=rows).json()["inserted"] == len(rows)
+
+def current_hour():
+    return datetime.utcnow().replace(minute=0, second=0, microsecond=0)
+
+def fake_fit(fitted, start=None):
+    def fit(history, days, rates=None):
+        fitted.append(len(history))
+        first = start or current_hour()
+        return {"forecast": [{"date": (first + timedelta(hours=h)).strftime("%Y-%m-%d %H:%M"), "predicted_energy": 0.1}
+                             for h in range(days * 24)],
+                "outlook": f"fitted on {len(history)} hours", "tip": "tip"}
+    return fit
+
+def test_forecast_job_refits_only_changed_devices(monkeypatch):
+    fitted = []
+    monkeypatch.setattr(forecast_service, "fit_forecast", fake_fit(fitted))
+    monkeypatch.setattr(forecast_service, "WriteSessionLocal", TestingSessionLocal)
+    post_hours("forecast_a", 8)
+    post_hours("forecast_b", 6)
+
+    refit = forecast_service.refresh_forecasts(workers=1)
+    assert {"forecast_a", "forecast_b", forecast_service.HOUSE} <= set(refit)
+    assert forecast_service.refresh_forecasts(workers=1) == []
+
+    # A new hour for one device refits that device and the house total only
+    post_hours("forecast_b", 1, start=START + timedelta(hours=6))
+    assert sorted(forecast_service.refresh_forecasts(workers=1)) == sorted(["forecast_b", forecast_service.HOUSE])
+
+    response = client.get("/forecast/forecast_b", params={"days": 2})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["device"] == "forecast_b" and body["outlook"] == "fitted on 7 hours"
+    assert len(body["forecast"]) == 48
+    assert body["data_through"] == (START + timedelta(hours=7)).isoformat()
+
+    house = client.post("/forecast/?days=1").json()
+    assert len(house["forecast"]) == 24 and house["generated_at"] is not None
+
+def test_device_forecast_unknown_device():
+    assert client.get("/forecast/no_such_forecast_device").status_code == 404
+
+def test_stale_forecast_starts_at_the_current_hour(monkeypatch):
+    # Fitted two days ago, when the device last reported
+    monkeypatch.setattr(forecast_service, "fit_forecast", fake_fit([], start=current_hour() - timedelta(hours=48)))
+    monkeypatch.setattr(forecast_service, "WriteSessionLocal", TestingSessionLocal)
+    post_hours("forecast_stale", 6, start=START + timedelta(days=3))
+    assert "forecast_stale" in forecast_service.refresh_forecasts(workers=1)
+
+    points = client.get("/forecast/forecast_stale", params={"days": 7}).json()["forecast"]
+    assert points[0]["date"] == current_hour().strftime("%Y-%m-%d %H:%M")
+    assert len(points) == 7 * 24
@@ -0,0 +1,63 @@
+from datetime import datetime, timedelta
+from app.db import crud
+from app.db.models import Reading
+from test_api import client, TestingSessionLocal
+
+START = datetime(2024, 6, 3)  # a Monday
+
+def seed_range():
+    db = TestingSessionLocal()
+    try:
+        db.add_all([
+            Reading(device=device, timestamp=START + timedelta(hours=h), current=1.0, voltage=360.0 * (i + 1))
+            for h in range(24 * 9)
+            for i, device in enumerate(["range_a", "range_b"])
+        ])
+        db.commit()
+        crud.rebuild_rollups(db, START, START + timedelta(days=9))
+    finally:
+        db.close()
+
+def test_range_daily_buckets_and_paging():
+    seed_range()
+    end = START + timedelta(days=9)
+    url = f"/analytics/range?start={START.isoformat()}&end={end.isoformat()}&granularity=day"
+
+    response = client.get(url + "&device=range_a")
+    assert response.status_code == 200
+    data = response.json()
+    assert len(data["buckets"]) == 9
+    day = data["buckets"][0]
+    assert (day["samples"], day["total_energy"], day["peak_power"]) == (24, 0.024, 360.0)
+    assert day["cost"] == round(0.024 * data["rate_per_kwh"], 4)
+
+    pages, cursor = [], None
+    while True:
+        page = client.get(url + "&limit=5" + (f"&cursor={cursor}" if cursor else "")).json()
+        pages.extend((b["start"], b["device"]) for b in page["buckets"])
+        cursor = page["next_cursor"]
+        if not cursor:
+            break
+    assert len(pages) == 18 and len(set(pages)) == 18
+
+    weekly = client.get(f"/analytics/range?start={START.isoformat()}&end={end.isoformat()}&granularity=week&device=range_b").json()
+    assert [b["samples"] for b in weekly["buckets"]] == [168, 48]
+
+def test_range_hourly_buckets_on_the_hour():
+    # julianday() float error once put 01:00, 04:00, ... at 3599.9999 s and into the previous hour
+    start = datetime(2024, 6, 20)
+    db = TestingSessionLocal()
+    try:
+        db.add_all([Reading(device="range_hourly", timestamp=start + timedelta(hours=h), current=1.0, voltage=360.0) for h in range(24)])
+        db.commit()
+        crud.rebuild_rollups(db, start, start + timedelta(days=1))
+    finally:
+        db.close()
+    end = start + timedelta(days=1)
+    hourly = client.get(f"/analytics/range?start={start.isoformat()}&end={end.isoformat()}&granularity=hour&device=range_hourly").json()
+    assert [b["start"][11:13] for b in hourly["buckets"]] == [f"{h:02d}" for h in range(24)]
+    assert all(b["samples"] == 1 for b in hourly["buckets"])
+
+def test_range_rejects_unknown_granularity():
+    response = client.get(f"/analytics/range?start={START.isoformat()}&granularity=month")
+    assert response.status_code == 422
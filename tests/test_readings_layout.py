@@ -0,0 +1,29 @@
+from datetime import datetime, timedelta
+from app.db.models import Reading
+from app.schemas.reading import Reading as ReadingSchema
+from test_api import client, TestingSessionLocal
+
+START = datetime(2024, 7, 1, 0, 0, 0, 250000)
+
+def test_fast_readings_match_schema_and_columns_layout():
+    db = TestingSessionLocal()
+    try:
+        db.add_all([
+            Reading(device="layout_dev", timestamp=START + timedelta(seconds=10 * i), current=1.5, voltage=230.0)
+            for i in range(200)
+        ])
+        db.commit()
+        orm = db.query(Reading).filter(Reading.device == "layout_dev").order_by(Reading.timestamp.desc()).limit(200).all()
+        expected = [ReadingSchema.model_validate(r).model_dump(mode="json") for r in orm]
+    finally:
+        db.close()
+
+    rows = client.get("/readings/device/layout_dev?limit=200")
+    assert rows.json() == expected
+    assert rows.headers.get("content-encoding") == "gzip"
+
+    columns = client.get("/readings/device/layout_dev?limit=200&layout=columns").json()
+    assert columns["timestamp"] == [r["timestamp"] for r in expected]
+    assert columns["current"] == [1.5] * 200
+
+    assert client.get("/readings/device/layout_dev?layout=csv").status_code == 422
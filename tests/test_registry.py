@@ -0,0 +1,69 @@
+from datetime import datetime, timedelta
+from app.db import crud
+from app.db.models import Device, Reading
+from app.services.ingest_service import save_reading
+from test_api import client, TestingSessionLocal
+
+START = datetime(2024, 4, 1)
+
+def test_save_reading_registers_device():
+    db = TestingSessionLocal()
+    try:
+        crud.create_or_update_device(db, "registry_known", 900.0)
+        for device, second in [("registry_new", 20), ("registry_new", 10), ("registry_known", 30)]:
+            save_reading({
+                "device": device,
+                "timestamp": (START + timedelta(seconds=second)).isoformat(),
+                "current": 1.0,
+                "voltage": 230.0,
+            }, db)
+
+        new = crud.get_device(db, "registry_new")
+        assert (new.first_seen, new.last_seen) == (START + timedelta(seconds=10), START + timedelta(seconds=20))
+        assert new.sample_count == 2
+        assert new.threshold == crud.DEFAULT_THRESHOLD
+        known = crud.get_device(db, "registry_known")
+        assert (known.threshold, known.sample_count) == (900.0, 1)
+
+        latest = {r.device: r for r in crud.get_latest_readings(db)}
+        assert latest["registry_new"].timestamp == START + timedelta(seconds=20)
+    finally:
+        db.close()
+
+    devices = {d["id"]: d for d in client.get("/anomalies/devices").json()}
+    assert devices["registry_new"]["sample_count"] == 2
+    assert devices["registry_known"]["threshold"] == 900.0
+
+def test_rebuild_device_registry_from_readings():
+    db = TestingSessionLocal()
+    try:
+        db.add_all([
+            Reading(device="registry_legacy", timestamp=START + timedelta(minutes=i), current=1.0, voltage=230.0)
+            for i in range(5)
+        ])
+        db.commit()
+        crud.rebuild_device_registry(db)
+        legacy = db.query(Device).filter(Device.id == "registry_legacy").one()
+        assert legacy.sample_count == 5
+        assert legacy.last_seen == START + timedelta(minutes=4)
+    finally:
+        db.close()
+
+def test_registry_backfill_runs_once_even_after_ingest_started(monkeypatch):
+    from app.db.models import Backfill
+    from app.services import registry_service
+
+    monkeypatch.setattr(registry_service, "WriteSessionLocal", TestingSessionLocal)
+    db = TestingSessionLocal()
+    try:
+        db.query(Backfill).delete()
+        db.add(Reading(device="registry_quiet", timestamp=START, current=1.0, voltage=230.0))
+        db.commit()
+        # A device reporting during startup is registered before the backfill gets going
+        save_reading({"device": "registry_chatty", "timestamp": START.isoformat(), "current": 1.0, "voltage": 230.0}, db)
+
+        registry_service.backfill_device_registry()
+        assert crud.get_device(db, "registry_quiet").last_seen == START
+        assert "device_registry" in crud.get_completed_backfills(db)
+    finally:
+        db.close()
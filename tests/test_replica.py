@@ -0,0 +1,61 @@
+import os
+import tempfile
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.db.database import Base, tune_engine
+from app.db.models import Device, Reading
+from app.db.replica import ReplicaMonitor, RoutingSession
+
+def make_instances():
+    directory = tempfile.TemporaryDirectory()
+    engines = []
+    for name in ("primary", "replica"):
+        engine = tune_engine(create_engine(f"sqlite:///{os.path.join(directory.name, name)}.db"))
+        Base.metadata.create_all(bind=engine)
+        engines.append(engine)
+    return directory, *engines
+
+def add_reading(engine, device, timestamp):
+    with sessionmaker(bind=engine)() as db:
+        db.add(Reading(device=device, timestamp=timestamp, current=1.0, voltage=230.0))
+        db.commit()
+
+def test_reads_follow_replica_health():
+    directory, primary, replica = make_instances()
+    monitor = ReplicaMonitor(primary, replica, max_lag=30, interval=60)
+    Session = sessionmaker(class_=RoutingSession, primary=primary, replica=replica, monitor=monitor)
+    now = datetime(2024, 10, 1, 12, 0)
+
+    add_reading(primary, "shared", now)
+    add_reading(replica, "shared", now)
+    add_reading(replica, "replica_only", now - timedelta(minutes=1))
+    assert monitor.check() and monitor.lag_seconds == 0
+    with Session() as db:
+        assert db.query(Reading).filter(Reading.device == "replica_only").count() == 1
+        # Writes always land on the primary
+        db.add(Device(id="written", threshold=100.0))
+        db.commit()
+    assert sessionmaker(bind=primary)().get(Device, "written") is not None
+    assert sessionmaker(bind=replica)().get(Device, "written") is None
+
+    # The replica falls behind: reads move to the primary
+    add_reading(primary, "shared", now + timedelta(minutes=2))
+    assert not monitor.check() and monitor.lag_seconds == 120
+    with Session() as db:
+        assert db.query(Reading).filter(Reading.device == "replica_only").count() == 0
+
+    # ...and back once it catches up
+    add_reading(replica, "shared", now + timedelta(minutes=2))
+    assert monitor.check()
+    directory.cleanup()
+
+def test_unreachable_replica_falls_back_to_primary():
+    directory, primary, _ = make_instances()
+    missing = create_engine(f"sqlite:///{os.path.join(directory.name, 'nowhere', 'replica.db')}")
+    monitor = ReplicaMonitor(primary, missing, max_lag=30, interval=60)
+    assert not monitor.check()
+    assert monitor.status()["error"]
+    with sessionmaker(class_=RoutingSession, primary=primary, replica=missing, monitor=monitor)() as db:
+        assert db.query(Reading).count() == 0
+    directory.cleanup()
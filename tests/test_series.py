@@ -0,0 +1,122 @@
+import numpy as np
+from datetime import datetime, timedelta
+from app.db.models import Reading
+from app.services.series_service import lttb
+from test_api import client, TestingSessionLocal
+
+START = datetime(2024, 3, 1)
+
+def seed_series(device, count, step_seconds=10):
+    db = TestingSessionLocal()
+    try:
+        db.add_all([
+            Reading(
+                device=device,
+                timestamp=START + timedelta(seconds=i * step_seconds),
+                current=10.0 if i == count // 2 else 1.0,
+                voltage=230.0,
+            )
+            for i in range(count)
+        ])
+        db.commit()
+    finally:
+        db.close()
+
+def test_lttb_keeps_endpoints_and_spike():
+    x = np.arange(1000, dtype=float)
+    y = np.zeros(1000)
+    y[437] = 50.0
+    keep = lttb(x, y, 20)
+    assert len(keep) == 20
+    assert keep[0] == 0 and keep[-1] == 999
+    assert 437 in keep
+    assert list(keep) == sorted(keep)
+
+def test_series_buckets_and_caching():
+    seed_series("series_dev", 360)  # one hour at 10s
+    end = START + timedelta(hours=1)
+    url = f"/readings/device/series_dev/series?start={START.isoformat()}&end={end.isoformat()}&points=60&agg=minmax"
+
+    response = client.get(url)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["bucket_seconds"] == 60
+    assert len(data["points"]) == 60
+    assert sum(p["samples"] for p in data["points"]) == 360
+    assert max(p["power_max"] for p in data["points"]) == 2300.0
+    assert "max-age=86400" in response.headers["cache-control"]
+
+    cached = client.get(url, headers={"If-None-Match": response.headers["etag"]})
+    assert cached.status_code == 304
+
+def test_series_lttb_limits_points():
+    seed_series("series_lttb", 2000, step_seconds=1)
+    end = START + timedelta(seconds=2000)
+    response = client.get(f"/readings/device/series_lttb/series?start={START.isoformat()}&end={end.isoformat()}&points=50&agg=lttb")
+    assert response.status_code == 200
+    points = response.json()["points"]
+    assert len(points) == 50
+    assert max(p["power"] for p in points) == 2300.0
+
+def test_series_rejects_unknown_aggregation():
+    response = client.get("/readings/device/series_dev/series?agg=median")
+    assert response.status_code == 422
+
+def test_save_reading_maintains_minute_rollups():
+    from app.db.models import ReadingRollup
+    from app.services.ingest_service import save_reading
+
+    db = TestingSessionLocal()
+    try:
+        for second, current in [(5, 1.0), (25, 3.0), (65, 2.0)]:
+            save_reading({
+                "device": "rollup_dev",
+                "timestamp": (START + timedelta(seconds=second)).isoformat(),
+                "current": current,
+                "voltage": 200.0,
+            }, db)
+        rollups = db.query(ReadingRollup).filter(ReadingRollup.device == "rollup_dev").order_by(ReadingRollup.minute).all()
+        assert [r.samples for r in rollups] == [2, 1]
+        assert rollups[0].power_sum == 800.0
+        assert (rollups[0].power_min, rollups[0].power_max) == (200.0, 600.0)
+    finally:
+        db.close()
+
+def test_wide_series_reads_rollups():
+    from app.db import crud
+
+    seed_series("rollup_series", 8640, step_seconds=20)  # two days
+    db = TestingSessionLocal()
+    try:
+        crud.rebuild_rollups(db)
+    finally:
+        db.close()
+
+    end = START + timedelta(days=2)
+    response = client.get(f"/readings/device/rollup_series/series?start={START.isoformat()}&end={end.isoformat()}&points=96&agg=minmax")
+    data = response.json()
+    assert data["bucket_seconds"] == 1800
+    assert sum(p["samples"] for p in data["points"]) == 8640
+    assert max(p["power_max"] for p in data["points"]) == 2300.0
+
+def test_rollup_backfill_runs_once_even_after_ingest_started(monkeypatch):
+    from app.db import crud
+    from app.db.models import Backfill, ReadingRollup
+    from app.services import rollup_service
+    from app.services.ingest_service import save_reading
+
+    monkeypatch.setattr(rollup_service, "WriteSessionLocal", TestingSessionLocal)
+    db = TestingSessionLocal()
+    try:
+        db.query(Backfill).delete()
+        # History from before rollups existed, then a reading ingested before the backfill got going
+        db.add_all([Reading(device="backfill_legacy", timestamp=START + timedelta(minutes=i), current=1.0, voltage=230.0)
+                    for i in range(3)])
+        db.commit()
+        save_reading({"device": "backfill_live", "timestamp": START.isoformat(), "current": 1.0, "voltage": 230.0}, db)
+
+        rollup_service.backfill_rollups()
+        assert db.query(ReadingRollup).filter(ReadingRollup.device == "backfill_legacy").count() == 3
+        assert {"rollups_minute", "rollups_hour"} <= crud.get_completed_backfills(db)
+    finally:
+        db.close()
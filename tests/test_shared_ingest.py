@@ -0,0 +1,93 @@
+import json
+import threading
+import time
+import paho.mqtt.client as mqtt
+from paho.mqtt.client import CallbackAPIVersion
+from app.db.models import Device, ReadingRollup
+from app.services.ingest_service import IngestPipeline, save_reading
+from app.services.mqtt_service import subscription_topic
+from app.utils.local_broker import LocalBroker
+from test_api import TestingSessionLocal
+
+TOPIC = "sensor/energy"
+
+def connect_consumer(broker, topic_filter, on_payload):
+    client = mqtt.Client(CallbackAPIVersion.VERSION1)
+    client.on_connect = lambda c, u, f, rc: c.subscribe(topic_filter)
+    client.on_message = lambda c, u, msg: on_payload(msg.payload)
+    client.connect("127.0.0.1", broker.port, 60)
+    client.loop_start()
+    return client
+
+def wait_for(condition, timeout=10.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline and not condition():
+        time.sleep(0.01)
+    return condition()
+
+def test_duplicate_readings_are_ignored():
+    payload = {"device": "dup_dev", "timestamp": "2024-08-01T10:00:05", "current": 1.0, "voltage": 230.0}
+    db = TestingSessionLocal()
+    try:
+        assert save_reading(payload, db) is not None
+        assert save_reading(dict(payload), db) is None
+        assert db.query(ReadingRollup).filter(ReadingRollup.device == "dup_dev").one().samples == 1
+        assert db.query(Device).filter(Device.id == "dup_dev").one().sample_count == 1
+    finally:
+        db.close()
+
+def test_shared_subscription_round_robin():
+    assert subscription_topic(TOPIC, "ingest") == f"$share/ingest/{TOPIC}"
+    with LocalBroker() as broker:
+        received = [[] for _ in range(4)]
+        clients = [connect_consumer(broker, f"$share/ingest/{TOPIC}", received[i].append) for i in range(3)]
+        clients.append(connect_consumer(broker, TOPIC, received[3].append))
+        assert wait_for(lambda: broker.subscriber_count(TOPIC) == 4)
+
+        for i in range(30):
+            broker.route(TOPIC, str(i).encode())
+        assert wait_for(lambda: sum(len(r) for r in received) == 60)
+        assert [len(r) for r in received] == [10, 10, 10, 30]
+        for client in clients:
+            client.disconnect()
+            client.loop_stop()
+
+def consume(consumers: int, messages: int, cost: float) -> list:
+    """Sequence numbers each of N shared-subscription consumers, handling one message at a time, persisted."""
+    done = threading.Semaphore(0)
+    received = [[] for _ in range(consumers)]
+
+    def handler_for(seen):
+        def handler(payload, observe):
+            time.sleep(cost)  # stands in for a consumer's per-message persistence work
+            seen.append(payload["seq"])
+            done.release()
+        return handler
+
+    with LocalBroker() as broker:
+        pipelines = [IngestPipeline(workers=1, queue_size=messages, handler=handler_for(seen)) for seen in received]
+        clients = []
+        for pipeline in pipelines:
+            pipeline.start()
+            clients.append(connect_consumer(broker, f"$share/ingest/{TOPIC}", pipeline.submit))
+        assert wait_for(lambda: broker.subscriber_count(TOPIC) == consumers)
+
+        for i in range(messages):
+            broker.route(TOPIC, json.dumps({"device": f"dev_{i % 8}", "seq": i}).encode())
+        for _ in range(messages):
+            assert done.acquire(timeout=30)
+
+        for client, pipeline in zip(clients, pipelines):
+            client.disconnect()
+            client.loop_stop()
+            pipeline.stop()
+    return received
+
+def test_ingest_is_spread_across_consumers():
+    messages = 240
+    received = consume(4, messages, 0.001)
+    # Every consumer takes a share of the work, and each message is persisted exactly once
+    assert all(received), [len(seen) for seen in received]
+    delivered = [seq for seen in received for seq in seen]
+    assert len(delivered) == len(set(delivered))
+    assert set(delivered) == set(range(messages))
@@ -0,0 +1,127 @@
+import json
+import os
+from sqlalchemy import create_engine
+from sqlalchemy.exc import IntegrityError, OperationalError
+from sqlalchemy.orm import sessionmaker
+from app.db.models import Reading
+from app.services import spool_service
+from app.services.ingest_service import save_reading, spool_backlog, store_readings
+from app.services.spool_service import SpoolReplayer
+from app.utils.spool import DEAD_LETTER_FILE, Spool
+from test_api import TestingSessionLocal
+
+def records(n, start=0):
+    return [json.dumps({"device": "spool_dev", "timestamp": f"2024-09-01T00:{(start + i) // 60:02d}:{(start + i) % 60:02d}",
+                        "current": 1.0, "voltage": 230.0}).encode() for i in range(n)]
+
+def test_spool_segments_offsets_and_reopen(tmp_path):
+    spool = Spool(str(tmp_path), segment_bytes=500)
+    assert spool.append(records(50))
+    for batch in (records(10, 50), records(10, 60)):
+        spool.append(batch)  # small segments: these roll over
+    assert spool.pending == 70
+
+    batch, position = spool.read_batch(25)
+    assert batch == records(25)
+    spool.commit(position, len(batch))
+    spool.close()
+
+    # A crash after commit: the reopened spool resumes from the committed offset
+    spool = Spool(str(tmp_path), segment_bytes=500)
+    assert spool.pending == 45
+    batch, position = spool.read_batch(1000)
+    assert batch == records(45, 25)
+    spool.commit(position, len(batch))
+    assert spool.pending == 0
+    assert len([f for f in os.listdir(tmp_path) if f.endswith(".seg")]) <= 2
+
+def test_spool_skips_torn_tail_and_respects_budget(tmp_path):
+    spool = Spool(str(tmp_path))
+    spool.append(records(3))
+    spool.close()
+    segment = sorted(f for f in os.listdir(tmp_path) if f.endswith(".seg"))[-1]
+    with open(tmp_path / segment, "ab") as f:
+        f.write(b"\x00\x00\x01\x00garbage")  # torn record from a crash mid-append
+
+    spool = Spool(str(tmp_path), max_bytes=1000)
+    spool.append(records(1, 3))
+    batch, position = spool.read_batch(100)
+    assert batch == records(4)
+    assert spool.corrupted == 1
+    assert not spool.append(records(100))  # over the disk budget
+
+def store(payloads):
+    db = TestingSessionLocal()
+    try:
+        store_readings(db, payloads)
+        db.commit()
+    finally:
+        db.close()
+
+def test_replayer_retries_until_database_is_back(tmp_path):
+    spool = Spool(str(tmp_path))
+    spool.append(records(20, 200))
+    outage = {"down": True}
+
+    def writer(payloads):
+        if outage["down"]:
+            raise OperationalError("INSERT INTO readings", {}, Exception("database unavailable"))
+        store(payloads)
+
+    replayer = SpoolReplayer(writer, batch_size=8, retry_seconds=0, spool_getter=lambda: spool)
+    assert not replayer.replay_batch(spool)
+    assert spool.pending == 20
+
+    outage["down"] = False
+    while spool.pending:
+        assert replayer.replay_batch(spool)
+    assert replayer.replayed == 20
+    db = TestingSessionLocal()
+    try:
+        assert db.query(Reading).filter(Reading.device == "spool_dev").count() == 20
+    finally:
+        db.close()
+
+def test_save_reading_spools_on_database_error(tmp_path, monkeypatch):
+    spool = Spool(str(tmp_path))
+    monkeypatch.setattr(spool_service, "_spool", spool)
+    broken = sessionmaker(bind=create_engine("sqlite://"))()  # no tables: every write fails
+    payload = {"device": "spool_dev", "timestamp": "2024-09-02T00:00:00", "current": 1.0, "voltage": 230.0}
+    try:
+        assert save_reading(payload, broken) is None
+    finally:
+        broken.close()
+    batch, _ = spool.read_batch(10)
+    assert [json.loads(r) for r in batch] == [payload]
+
+def test_replayer_dead_letters_rows_that_can_never_be_stored(tmp_path):
+    spool = Spool(str(tmp_path))
+    good = records(6, 300)
+    poison = json.dumps({"device": "spool_dev", "timestamp": "2024-09-01T09:00:00", "current": None, "voltage": 230.0}).encode()
+    spool.append(good[:3] + [poison, b"not json"] + good[3:])
+
+    def writer(payloads):
+        if any(p["current"] is None for p in payloads):
+            raise IntegrityError("INSERT INTO readings", {}, Exception("NOT NULL constraint failed: readings.current"))
+        store(payloads)
+
+    replayer = SpoolReplayer(writer, batch_size=100, retry_seconds=0, spool_getter=lambda: spool)
+    assert replayer.replay_batch(spool)
+    assert spool.pending == 0 and replayer.replayed == 6 and replayer.dead_lettered == 2
+    with open(tmp_path / DEAD_LETTER_FILE) as f:
+        dead = [json.loads(line) for line in f]
+    assert dead[0]["record"] == "not json" and dead[1]["payload"]["timestamp"] == "2024-09-01T09:00:00"
+
+def test_backlogged_array_payloads_replay(tmp_path, monkeypatch):
+    spool = Spool(str(tmp_path))
+    monkeypatch.setattr(spool_service, "_spool", spool)
+    rows = json.loads(b"[" + b",".join(records(3, 400)) + b"]")
+    columnar = {"device": "spool_dev", "timestamp": [f"2024-09-01T07:{i:02d}:00" for i in range(2)],
+                "current": [1.0, 1.5], "voltage": [230.0, 231.0]}
+    assert spool_backlog(json.dumps(rows).encode())
+    assert spool_backlog(json.dumps(columnar).encode())
+    assert spool.pending == 5  # one record per reading
+
+    replayer = SpoolReplayer(store, retry_seconds=0, spool_getter=lambda: spool)
+    assert replayer.replay_batch(spool)
+    assert replayer.replayed == 5 and replayer.dead_lettered == 0
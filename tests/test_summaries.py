@@ -0,0 +1,34 @@
+from datetime import date, datetime, timedelta
+from app.db import crud
+from app.db.models import Reading
+from app.services.ingest_service import save_reading
+from test_api import client, TestingSessionLocal
+
+DAY = date(2024, 5, 1)
+START = datetime.combine(DAY, datetime.min.time())
+
+def test_past_day_summary_is_stored_and_invalidated_by_late_data():
+    db = TestingSessionLocal()
+    try:
+        db.add_all([
+            Reading(device="summary_dev", timestamp=START + timedelta(minutes=i), current=1.0, voltage=360.0)
+            for i in range(10)
+        ])
+        db.commit()
+
+        response = client.get(f"/analytics/daily-summary?day={DAY}")
+        assert response.status_code == 200
+        assert response.json()["total_energy"] == 0.01
+        assert "max-age=3600" in response.headers["cache-control"]
+        assert client.get(f"/analytics/daily-summary?day={DAY}", headers={"If-None-Match": response.headers["etag"]}).status_code == 304
+        assert crud.get_daily_summary_record(db, DAY).total_energy == 0.01
+
+        save_reading({"device": "summary_dev", "timestamp": (START + timedelta(hours=12)).isoformat(), "current": 1.0, "voltage": 360.0}, db)
+        db.expire_all()
+        assert crud.get_daily_summary_record(db, DAY) is None
+    finally:
+        db.close()
+
+    highest = client.get(f"/analytics/highest-consumer?day={DAY}").json()
+    assert highest["highest_consumer"]["device"] == "summary_dev"
+    assert highest["highest_consumer"]["total_energy"] == 0.011
@@ -0,0 +1,71 @@
+from datetime import datetime, timedelta
+import pytest
+from app.db.models import HourlyCost, HourlyRollup, Tariff
+from app.services import tariff_service
+from test_api import client, TestingSessionLocal
+
+START = datetime(2022, 2, 1)
+TIERED = {"tiers": [{"up_to_kwh": 1, "rate": 1.0}, {"up_to_kwh": None, "rate": 3.0}]}
+
+def post_readings(*timestamps):
+    # 750 A at 240 V for 10 seconds is 0.5 kWh
+    rows = [{"device": "tariff_dev", "timestamp": t.isoformat(), "current": 750.0, "voltage": 240.0} for t in timestamps]
+    assert client.post("/readings/batch", json=rows).json()["inserted"] == len(rows)
+
+def test_tariff_rates():
+    tou = tariff_service.validate_rates("tou", {"rate": 1.0, "periods": [{"start_hour": 22, "end_hour": 2, "rate": 0.5}]})
+    assert tariff_service.tou_rates(tou)[21:24] + tariff_service.tou_rates(tou)[0:3] == [1.0, 0.5, 0.5, 0.5, 0.5, 1.0]
+    tiers = tariff_service.validate_rates("tiered", TIERED)["tiers"]
+    assert tariff_service.tiered_cost(tiers, 0.5) == 0.5 and tariff_service.tiered_cost(tiers, 2.0) == 4.0
+
+    # Tiered blocks restart with every month
+    schedule = tariff_service.TariffSchedule([Tariff(id=1, name="t", kind="tiered", rates={"tiers": tiers}, effective_from=START)])
+    hours = [(START, 0.5), (START + timedelta(hours=1), 1.0), (datetime(2022, 3, 1), 1.0)]
+    assert schedule.hourly_rates(hours) == [1.0, 2.0, 1.0]
+    assert schedule.for_hour(START - timedelta(hours=1)).kind == "flat"
+
+    for kind, rates in (("tiered", {"tiers": [{"up_to_kwh": 5, "rate": 1.0}]}), ("flat", {"rate": -1}),
+                        ("tou", {"rate": 1.0, "periods": [{"start_hour": 3, "end_hour": 3, "rate": 2.0}]})):
+        with pytest.raises(ValueError):
+            tariff_service.validate_rates(kind, rates)
+
+def test_pricing_job_costs_hours_and_reprices_late_data(monkeypatch):
+    monkeypatch.setattr(tariff_service, "WriteSessionLocal", TestingSessionLocal)
+    monkeypatch.setattr(tariff_service, "_priced_since", None)
+    try:
+        response = client.post("/tariffs/", json={"name": "Residential", "kind": "tiered", "rates": TIERED,
+                                                  "effective_from": START.isoformat()})
+        assert response.status_code == 200 and response.json()["effective_from"] == START.isoformat()
+        assert client.post("/tariffs/", json={"name": "Bad", "kind": "flat", "rates": {}}).status_code == 422
+
+        post_readings(START, START + timedelta(hours=1), START + timedelta(hours=1, minutes=30))
+        assert START in tariff_service.refresh_costs()
+        assert tariff_service.refresh_costs() == []
+
+        url = f"/analytics/range?start={START.isoformat()}&end={(START + timedelta(days=1)).isoformat()}&device=tariff_dev"
+        day = client.get(url).json()["buckets"][0]
+        assert (day["total_energy"], day["cost"]) == (1.5, 2.5)  # 1 kWh at 1.0, then 0.5 kWh at 3.0
+
+        # A late reading in the first hour pushes the second hour wholly into the upper block
+        post_readings(START + timedelta(minutes=30))
+        assert tariff_service.refresh_costs() == [START]
+        day = client.get(url + "&granularity=hour").json()["buckets"]
+        assert [b["cost"] for b in day] == [1.0, 3.0]
+
+        # Later runs only scan rollups updated since the last one (less an overlap)
+        db = TestingSessionLocal()
+        try:
+            db.query(HourlyRollup).filter(HourlyRollup.device == "tariff_dev").update({"updated_at": datetime.utcnow() - timedelta(hours=1)})
+            db.query(HourlyCost).filter(HourlyCost.hour == START).delete()
+            db.commit()
+        finally:
+            db.close()
+        assert tariff_service.refresh_costs() == []
+        monkeypatch.setattr(tariff_service, "_priced_since", None)
+        assert tariff_service.refresh_costs() == [START]
+    finally:
+        db = TestingSessionLocal()
+        db.query(Tariff).delete()
+        db.query(HourlyCost).delete()
+        db.commit()
+        db.close()